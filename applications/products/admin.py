@@ -1,8 +1,59 @@
 from django.contrib import admin
 
+from applications.utils.pagination import EstimatedCountPaginator
+
 from . import models
 
+
 # Register your models here.
-admin.site.register(models.Category)
-admin.site.register(models.Product)
-admin.site.register(models.Item)
+@admin.register(models.Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('path', 'code', 'name')
+    # name__istartswith usa el índice funcional UPPER(name) de PostgreSQL (migración 0011)
+    search_fields = ('code__exact', 'name__istartswith')
+    autocomplete_fields = ('parent',)
+
+
+@admin.register(models.Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sku', 'category', 'price_fake', 'price_real', 'stock')
+    list_select_related = ('category',)
+    # name__istartswith usa el índice funcional UPPER(name) de PostgreSQL (migración 0011)
+    search_fields = ('sku__exact', 'name__istartswith')
+    autocomplete_fields = ('category',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_queryset(self, request):
+        # El autocompletado no aplica list_select_related y __str__ muestra la categoría
+        return super().get_queryset(request).select_related('category')
+
+
+@admin.register(models.Item)
+class ItemAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'sku', 'size', 'color', 'price_fake', 'price_real', 'stock')
+    list_select_related = ('product__category',)
+    search_fields = ('search_document',)
+    autocomplete_fields = ('product',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_queryset(self, request):
+        # El autocompletado no aplica list_select_related y __str__ muestra el producto y su categoría
+        return super().get_queryset(request).select_related('product__category')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Búsqueda de texto completo y por trigramas sobre el documento de cada item
+        if not search_term.strip():
+            return queryset, False
+        return queryset.search(search_term), False
+
+
+@admin.register(models.CategoryFacet)
+class CategoryFacetAdmin(admin.ModelAdmin):
+    list_display = ('category', 'key', 'value', 'count')
+    list_select_related = ('category',)
+    search_fields = ('key__exact',)
+    raw_id_fields = ('category',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
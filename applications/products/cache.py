@@ -0,0 +1,304 @@
+"""Read-through cache for catalog reads.
+
+Payloads are stored under versioned keys: every Product and Category has a version counter, and all keys also carry a
+global catalog generation. Invalidating an object only bumps its counter, so stale payloads are never read again and
+simply expire. Counters start at the current time in microseconds, so one evicted by the cache restarts above its
+last value instead of going back to a key that may still hold an old payload. Only one process rebuilds a missing
+payload at a time; the others wait briefly for it.
+"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+
+from .managers import PATH_SEPARATOR
+from .models import Category, Item, Product
+from .pricing import discount_percentage, price_text
+
+GENERATION_KEY = 'catalog:generation'
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters of the catalog cache for the current process."""
+
+    FIELDS = ('hits', 'misses', 'builds', 'lock_waits')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field):
+        with self._lock:
+            self._counts[field] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_ratio'] = counts['hits'] / lookups if lookups else 0
+        return counts
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _version_key(kind, pk) -> str:
+    return f'catalog:{kind}:{pk}:version'
+
+
+def _version_seed() -> int:
+    # Microsegundos: un contador desalojado vuelve con un valor mayor que el que tenía, nunca con uno ya usado
+    return time.time_ns() // 1000
+
+
+def _versioned_key(kind, pk, versions, seed) -> str:
+    generation = versions.get(GENERATION_KEY, seed)
+    return f'catalog:{kind}:{pk}:g{generation}:v{versions.get(_version_key(kind, pk), seed)}'
+
+
+def _data_key(kind, pk) -> str:
+    cache = get_cache()
+    keys = [GENERATION_KEY, _version_key(kind, pk)]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    seed = _version_seed()
+    if missing:
+        # add y no set: si otro proceso ya sembró o incrementó el contador, se usa su valor
+        for key in missing:
+            cache.add(key, seed, timeout=None)
+        versions.update(cache.get_many(missing))
+    return _versioned_key(kind, pk, versions, seed)
+
+
+async def _adata_key(kind, pk) -> str:
+    cache = get_cache()
+    keys = [GENERATION_KEY, _version_key(kind, pk)]
+    versions = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in versions]
+    seed = _version_seed()
+    if missing:
+        for key in missing:
+            await cache.aadd(key, seed, timeout=None)
+        versions.update(await cache.aget_many(missing))
+    return _versioned_key(kind, pk, versions, seed)
+
+
+def _bump(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # El contador no existe (nunca se leyó o fue desalojado): se siembra igual que al leerlo
+        cache.set(key, _version_seed(), timeout=None)
+
+
+def get_or_build(key, builder, timeout=None):
+    """Return the cached value of ``key``, building it with ``builder`` on a miss.
+
+    A lock key makes concurrent misses wait for the first builder instead of all hitting the database.
+    """
+    cache = get_cache()
+    timeout = settings.CATALOG_CACHE_TIMEOUT if timeout is None else timeout
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        stats.incr('hits')
+        return value
+    stats.incr('misses')
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            stats.incr('builds')
+            value = builder()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    stats.incr('lock_waits')
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    stats.incr('builds')
+    return builder()
+
+
+async def aget_or_build(key, builder, timeout=None):
+    """``get_or_build`` for async code: ``builder`` is a coroutine function and waiting never blocks the loop."""
+    cache = get_cache()
+    timeout = settings.CATALOG_CACHE_TIMEOUT if timeout is None else timeout
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        stats.incr('hits')
+        return value
+    stats.incr('misses')
+
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            stats.incr('builds')
+            value = await builder()
+            await cache.aset(key, value, timeout)
+        finally:
+            await cache.adelete(lock_key)
+        return value
+
+    stats.incr('lock_waits')
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        value = await cache.aget(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    stats.incr('builds')
+    return await builder()
+
+
+def _primary() -> str:
+    # Los payloads se leen del primario: una réplica atrasada dejaría en caché datos viejos hasta el próximo cambio
+    return router.db_for_write(Product)
+
+
+def _product_items(product_id):
+    items = Item.objects.using(_primary()).alive().filter(product_id=product_id).order_by('pk')
+    return items.values('pk', 'sku', 'size', 'color', 'other_attributes', 'stock', 'price_fake', 'price_real')
+
+
+def build_product_payload(product_id) -> dict:
+    product = Product.objects.using(_primary()).alive().get(pk=product_id)
+    return _product_payload(product, _product_items(product_id))
+
+
+async def abuild_product_payload(product_id) -> dict:
+    # Las consultas async del ORM corren una tras otra en el hilo sync de Django: lo que se gana es no bloquear el loop
+    product = await Product.objects.using(_primary()).alive().aget(pk=product_id)
+    items = await _product_items(product_id).alist()
+    return _product_payload(product, items)
+
+
+def _product_payload(product, items) -> dict:
+    return {
+        'id': product.pk,
+        'sku': product.sku,
+        'name': product.name,
+        'description': product.description,
+        'category_id': product.category_id,
+        'purchase_urls': product.purchase_urls,
+        'stock': product.stock,
+        'price_fake': price_text(product.price_fake),
+        'price_real': price_text(product.price_real),
+        'discount_percentage': float(product.discount_percentage),
+        'items': [
+            {
+                'id': item['pk'],
+                'sku': item['sku'],
+                'size': item['size'],
+                'color': item['color'],
+                'other_attributes': item['other_attributes'],
+                'stock': item['stock'],
+                'price_fake': price_text(item['price_fake']),
+                'price_real': price_text(item['price_real']),
+                'discount_percentage': float(discount_percentage(item['price_fake'], item['price_real'])),
+            }
+            for item in items
+        ],
+    }
+
+
+def build_category_payload(category_id) -> dict:
+    using = _primary()
+    category = Category.objects.using(using).alive().get(pk=category_id)
+    descendants = category.get_descendants().using(using).alive().order_by('path')
+    descendants = descendants.values('pk', 'code', 'name', 'path', 'parent')
+    products = category.get_products().using(using).alive().order_by('pk')
+    products = products.values('pk', 'sku', 'name', 'category', 'price_fake', 'price_real')
+    return {
+        'id': category.pk,
+        'code': category.code,
+        'name': category.name,
+        'path': category.path,
+        'descendants': [
+            {'id': row['pk'], 'code': row['code'], 'name': row['name'], 'path': row['path'], 'parent_id': row['parent']}
+            for row in descendants
+        ],
+        'products': [
+            {
+                'id': row['pk'],
+                'sku': row['sku'],
+                'name': row['name'],
+                'category_id': row['category'],
+                'price_fake': price_text(row['price_fake']),
+                'price_real': price_text(row['price_real']),
+                'discount_percentage': float(discount_percentage(row['price_fake'], row['price_real'])),
+            }
+            for row in products
+        ],
+    }
+
+
+def get_product_payload(product_id) -> dict:
+    """Product with its items, prices and discounts, served from the cache when possible."""
+    return get_or_build(_data_key('product', product_id), lambda: build_product_payload(product_id))
+
+
+async def aget_product_payload(product_id) -> dict:
+    """Async ``get_product_payload``, sharing its cache entries."""
+    key = await _adata_key('product', product_id)
+    return await aget_or_build(key, lambda: abuild_product_payload(product_id))
+
+
+def get_category_payload(category_id) -> dict:
+    """Category with its subtree and the products in it, served from the cache when possible."""
+    return get_or_build(_data_key('category', category_id), lambda: build_category_payload(category_id))
+
+
+def invalidate_products(product_ids):
+    for pk in set(product_ids):
+        _bump(_version_key('product', pk))
+
+
+def invalidate_categories(category_ids):
+    for pk in set(category_ids):
+        _bump(_version_key('category', pk))
+
+
+def path_prefixes(path) -> list:
+    """Paths of ``path`` and of every one of its ancestors, root first."""
+    parts = path.split(PATH_SEPARATOR) if path else []
+    return [PATH_SEPARATOR.join(parts[:index]) for index in range(1, len(parts) + 1)]
+
+
+def invalidate_category_chains(category_ids, using=None):
+    """Invalidate the categories of ``category_ids`` and all their ancestors.
+
+    Every cached category payload lists the products of its whole subtree, so a change to a product is stale in the
+    payload of its category and of every ancestor.
+    """
+    using = using or _primary()
+    paths = Category.objects.using(using).filter(pk__in=category_ids).values_list('path', flat=True)
+    prefixes = {prefix for path in paths for prefix in path_prefixes(path)}
+    invalidate_categories(Category.objects.using(using).filter(path__in=prefixes).values_list('pk', flat=True))
+
+
+def invalidate_catalog():
+    """Invalidate every cached catalog payload at once."""
+    _bump(GENERATION_KEY)
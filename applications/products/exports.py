@@ -0,0 +1,21 @@
+from .models import Item
+
+ITEM_EXPORT_COLUMNS = [
+    ('id', 'pk'),
+    ('sku', 'sku'),
+    ('product_id', 'product_id'),
+    ('product_sku', 'product__sku'),
+    ('product', 'product__name'),
+    ('category', 'product__category__path'),
+    ('size', 'size'),
+    ('color', 'color'),
+    ('other_attributes', 'other_attributes'),
+    ('stock', 'stock'),
+    ('price_fake', 'price_fake'),
+    ('price_real', 'price_real'),
+]
+
+
+def item_export_queryset():
+    # Ordenar por pk evita el ordenamiento por defecto, que recorre product -> category
+    return Item.objects.alive().order_by('pk')
@@ -0,0 +1,238 @@
+"""Attribute facets of the catalog.
+
+Items describe their variants with free-form JSON (``other_attributes``) and products list their stores in
+``purchase_urls``. Both are filtered with JSON containment, which PostgreSQL answers from GIN (``jsonb_path_ops``)
+indexes; other backends fall back to one key lookup per attribute::
+
+    Item.objects.with_attributes(material='algodón', voltaje=[110, 220])
+
+Filter sidebars read ``CategoryFacet``: one row per category, attribute and value with the number of alive items of
+that category carrying it. Counts are kept up to date with deltas whenever items or products change, so reading the
+facets of a category (or a whole subtree) never aggregates the Item table.
+"""
+import copy
+import json
+from collections import Counter, defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import F, JSONField, Q, Sum, Value
+from django.db.models.fields.json import KeyTransform, KeyTransformExact
+
+from applications.utils.expressions import case_by_pk
+
+FACET_KEY_LENGTH = 100
+# Solo los valores escalares forman facetas; listas y objetos anidados se ignoran
+FACET_VALUE_TYPES = (str, int, float, bool)
+
+
+def json_containment(field, attributes, using) -> Q:
+    """Condition matching rows whose JSON ``field`` contains every ``key: value`` of ``attributes``.
+
+    A list or tuple value matches any of its elements.
+    """
+    condition = Q()
+    for key, value in attributes.items():
+        options = value if isinstance(value, (list, tuple)) else [value]
+        any_of = Q()
+        for option in options:
+            if connections[using].vendor == 'postgresql':
+                any_of |= Q(**{f'{field}__contains': {key: option}})
+            else:
+                any_of |= Q(KeyTransformExact(KeyTransform(key, field), Value(option, output_field=JSONField())))
+        condition &= any_of
+    return condition
+
+
+def attribute_pairs(attributes) -> list:
+    """Facetable ``(key, value)`` pairs of an ``other_attributes`` value."""
+    if not isinstance(attributes, dict):
+        return []
+    return [
+        (key, value)
+        for key, value in attributes.items()
+        if len(key) <= FACET_KEY_LENGTH and isinstance(value, FACET_VALUE_TYPES)
+    ]
+
+
+def facet_state(item) -> tuple:
+    """``(product_id, attributes, deleted)``, everything that decides the facets an Item counts in."""
+    return item.product_id, copy.deepcopy(item.other_attributes), item._deleted
+
+
+def _facet_value(value):
+    # jsonb compara números por valor: 1.0 se guarda y se lee como 1
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _facet_key(category_id, key, value) -> tuple:
+    # json.dumps distingue 1 de True y de '1', que como llaves de un dict serían iguales o se confundirían
+    return category_id, key, json.dumps(_facet_value(value))
+
+
+def facet_deltas(category_id, attributes, sign=1, deltas=None) -> Counter:
+    """Add ``sign`` to the facets of ``attributes`` under ``category_id``. Uncategorized items have no facets."""
+    deltas = Counter() if deltas is None else deltas
+    if category_id is not None:
+        for key, value in attribute_pairs(attributes):
+            deltas[_facet_key(category_id, key, value)] += sign
+    return deltas
+
+
+def item_facet_deltas(items, sign=1) -> Counter:
+    """Facet deltas of adding (or, with ``sign=-1``, removing) every item of a queryset, read in one query."""
+    deltas = Counter()
+    rows = items.filter(other_attributes__isnull=False).values_list('product__category_id', 'other_attributes')
+    for category_id, attributes in rows.order_by().iterator(chunk_size=2000):
+        facet_deltas(category_id, attributes, sign, deltas)
+    return deltas
+
+
+def apply_facet_deltas(deltas, using=None):
+    """Add per-facet deltas to ``CategoryFacet.count`` with at most three queries.
+
+    Missing facets are first inserted with a count of zero (ignoring conflicts) and every count is then incremented
+    with one UPDATE, so concurrent writers never overwrite each other. Facets that drop to zero are kept and skipped
+    by the readers; ``rebuild_facets`` prunes them.
+
+    Parameters
+    ----------
+    deltas : dict
+        ``(category_id, key, json.dumps(value))`` to signed number of items, as built by ``facet_deltas``
+        (integral floats are keyed as ints, as jsonb compares them).
+    using : str, optional
+        Database alias, defaults to the router's write database for CategoryFacet.
+    """
+    from .models import CategoryFacet
+
+    deltas = {facet: delta for facet, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    using = using or router.db_for_write(CategoryFacet)
+    facets = CategoryFacet.objects.using(using)
+    with transaction.atomic(using=using, savepoint=False):
+        facets.bulk_create(
+            [
+                CategoryFacet(category_id=category_id, key=key, value=json.loads(value), count=0)
+                for (category_id, key, value), delta in deltas.items()
+                if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        rows = facets.filter(
+            category__in={facet[0] for facet in deltas}, key__in={facet[1] for facet in deltas}
+        ).values_list('pk', 'category_id', 'key', 'value')
+        increments = {}
+        for pk, category_id, key, value in rows:
+            facet = _facet_key(category_id, key, value)
+            if facet in deltas:
+                increments[pk] = deltas[facet]
+        if increments:
+            facets.filter(pk__in=increments).update(count=F('count') + case_by_pk(increments))
+
+
+def item_facet_changes(previous, current, using=None, categories=None):
+    """Apply the facet deltas of an item going from the ``previous`` to the ``current`` ``facet_state``.
+
+    Either state may be None (the item was created or deleted). Product categories missing from ``categories``
+    (``{product_id: category_id}``) are read in one query, and only when the change touches any facet.
+    """
+    from .models import Product
+
+    if previous == current:
+        return
+    states = [
+        (state, sign)
+        for state, sign in ((previous, -1), (current, 1))
+        if state is not None and not state[2] and attribute_pairs(state[1])
+    ]
+    if not states:
+        return
+    categories = dict(categories or {})
+    missing = {state[0] for state, _ in states} - set(categories)
+    if missing:
+        categories.update(Product.objects.using(using).filter(pk__in=missing).values_list('pk', 'category_id'))
+
+    deltas = Counter()
+    for (product_id, attributes, _), sign in states:
+        facet_deltas(categories.get(product_id), attributes, sign, deltas)
+    apply_facet_deltas(deltas, using)
+
+
+def move_product_facets(product, previous_category_id, using=None):
+    """Move the facets of the alive items of ``product`` from its previous category to its current one."""
+    from .models import Item
+
+    # Los items de un producto borrado no cuentan en las facetas
+    if previous_category_id == product.category_id or product._deleted:
+        return
+    items = Item.objects.using(using).alive().filter(product=product)
+    deltas = Counter()
+    for attributes in items.filter(other_attributes__isnull=False).values_list('other_attributes', flat=True):
+        facet_deltas(previous_category_id, attributes, -1, deltas)
+        facet_deltas(product.category_id, attributes, 1, deltas)
+    apply_facet_deltas(deltas, using)
+
+
+def rebuild_facets(category_ids=None, using=None) -> int:
+    """Recount the facets of the given categories (all when omitted) from the alive items of their alive products.
+
+    Used after bulk writes that skip the incremental path (imports, raw updates) and to repair drift.
+
+    Returns
+    -------
+    int
+        Number of facets written.
+    """
+    from .models import CategoryFacet, Item
+
+    using = using or router.db_for_write(CategoryFacet)
+    items = Item.objects.using(using).alive().filter(product___deleted=False)
+    facets = CategoryFacet.objects.using(using).all()
+    if category_ids is not None:
+        category_ids = set(category_ids) - {None}
+        if not category_ids:
+            return 0
+        items = items.filter(product__category__in=category_ids)
+        facets = facets.filter(category__in=category_ids)
+
+    counts = item_facet_deltas(items)
+    with transaction.atomic(using=using, savepoint=False):
+        facets.delete()
+        CategoryFacet.objects.using(using).bulk_create(
+            (
+                CategoryFacet(category_id=category_id, key=key, value=json.loads(value), count=count)
+                for (category_id, key, value), count in counts.items()
+                if count > 0
+            ),
+            batch_size=1000,
+        )
+    return len(counts)
+
+
+def category_facets(category, include_descendants=True, using=None) -> dict:
+    """Facets of ``category`` (and by default its subtree) for a filter sidebar, read in one query.
+
+    Returns
+    -------
+    dict
+        ``{key: [(value, count), ...]}`` with the most common values first.
+    """
+    from .models import Category, CategoryFacet
+
+    if include_descendants:
+        condition = Q(category__in=Category.objects.descendants(category, include_self=True).values('pk'))
+    else:
+        condition = Q(category=category)
+    rows = (
+        CategoryFacet.objects.db_manager(using)
+        .filter(condition, count__gt=0)
+        .values('key', 'value')
+        .annotate(total=Sum('count'))
+        .order_by('key', '-total', 'value')
+    )
+    facets = defaultdict(list)
+    for row in rows:
+        facets[row['key']].append((row['value'], row['total']))
+    return dict(facets)
@@ -0,0 +1,265 @@
+"""Streaming importer for supplier catalogs.
+
+Each input row describes one item (variant) together with its product and category, so supplier feeds can be loaded
+as they come::
+
+    category_code, category_name, category_parent,
+    product_sku, product_name, product_description, product_price_real, product_price_fake, purchase_urls,
+    item_sku, size, color, price_real, price_fake, other_attributes
+
+Rows without ``item_sku`` only upsert the product. Rows are read lazily and processed in fixed-size chunks, so memory
+use depends on the chunk size and not on the file size.
+"""
+import csv
+import json
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+
+from django.db import router, transaction
+
+from applications.supply.stock import move_item_stock
+
+from .cache import invalidate_catalog
+from .facets import rebuild_facets
+from .models import Category, Item, Product
+from .pricing import inherit_prices, normalize_prices
+
+PRODUCT_UPDATE_FIELDS = ['category', 'name', 'description', 'purchase_urls', 'price_fake', 'price_real', '_updated_at']
+ITEM_UPDATE_FIELDS = ['product', 'size', 'color', 'other_attributes', 'price_fake', 'price_real', '_updated_at']
+
+
+class CatalogImportError(Exception):
+    """Raised when a catalog row cannot be imported."""
+
+
+@dataclass
+class ImportResult:
+    """Totals of a catalog import.
+
+    Attributes
+    ----------
+    rows : int
+        Rows read from the source.
+    categories : int
+        Categories created.
+    products : int
+        Products inserted or updated.
+    items : int
+        Items inserted or updated.
+    seconds : float
+        Wall time of the import.
+    """
+
+    rows: int = 0
+    categories: int = 0
+    products: int = 0
+    items: int = 0
+    seconds: float = 0
+
+
+def read_rows(source, file_format=None):
+    """Yield catalog rows as dicts from a CSV or JSONL file, one line at a time.
+
+    Parameters
+    ----------
+    source : str or Path
+        Path of the file to read.
+    file_format : str, optional
+        ``'csv'`` or ``'jsonl'``. Guessed from the file extension when omitted.
+    """
+    path = Path(source)
+    file_format = (file_format or path.suffix.lstrip('.')).lower()
+    with path.open(newline='', encoding='utf-8-sig') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+        elif file_format in ('jsonl', 'ndjson'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise CatalogImportError(f'Formato no soportado: "{file_format}".')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _code(value):
+    value = _text(value)
+    return value.upper() if value else None
+
+
+def _decimal(value):
+    value = _text(value)
+    return Decimal(value) if value is not None else None
+
+
+def _json(value):
+    if isinstance(value, str):
+        return json.loads(value) if value.strip() else None
+    return value
+
+
+class CatalogImporter:
+    """Upserts catalog rows chunk by chunk.
+
+    Categories are matched by code and created when missing (existing ones are not modified, so renames and moves
+    keep going through ``Category.save``). Products and items are matched by ``sku`` and written with
+    ``bulk_create(update_conflicts=True)``, applying the same price rules as ``Product.save`` and ``Item.save``.
+    Items moved to another product take their stock with them. The facets of every category touched by the import
+    are recounted once at the end; if an import fails halfway, ``manage.py rebuild_facets`` brings the chunks already
+    committed up to date.
+    """
+
+    def __init__(self, chunk_size=1000, using=None):
+        self.chunk_size = chunk_size
+        self.using = using or router.db_for_write(Product)
+        self.categories = {}
+        self.touched_categories = set()
+
+    def run(self, rows) -> ImportResult:
+        started = time.perf_counter()
+        result = ImportResult()
+        for chunk in chunked(rows, self.chunk_size):
+            with transaction.atomic(using=self.using):
+                self._import_chunk(chunk, result)
+            result.rows += len(chunk)
+        if result.rows:
+            # Los upserts masivos no disparan señales: se invalida todo el catálogo en caché una sola vez
+            invalidate_catalog()
+            rebuild_facets(self.touched_categories, using=self.using)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def _import_chunk(self, rows, result):
+        category_ids = self._resolve_categories(rows, result)
+
+        products = {}
+        for row in rows:
+            sku = _text(row.get('product_sku'))
+            if sku is None:
+                raise CatalogImportError(f'Fila sin product_sku: {row}')
+            price_real = _decimal(row.get('product_price_real'))
+            if price_real is None:
+                raise CatalogImportError(f'El producto "{sku}" no tiene product_price_real.')
+            price_fake, price_real = normalize_prices(_decimal(row.get('product_price_fake')), price_real)
+            products[sku] = Product(
+                sku=sku,
+                category_id=category_ids.get(_code(row.get('category_code'))),
+                name=_text(row.get('product_name')),
+                description=_text(row.get('product_description')),
+                purchase_urls=_json(row.get('purchase_urls')),
+                price_fake=price_fake,
+                price_real=price_real,
+            )
+        # Categorías anteriores de los productos e items, cuyas facetas también cambian si se mueven
+        self.touched_categories.update(
+            Product.objects.using(self.using).filter(sku__in=products).values_list('category_id', flat=True)
+        )
+        self.touched_categories.update(product.category_id for product in products.values())
+        Product.objects.using(self.using).bulk_create(
+            products.values(), update_conflicts=True, unique_fields=['sku'], update_fields=PRODUCT_UPDATE_FIELDS
+        )
+        result.products += len(products)
+        product_ids = dict(Product.objects.using(self.using).filter(sku__in=products).values_list('sku', 'pk'))
+
+        items = {}
+        for row in rows:
+            sku = _text(row.get('item_sku'))
+            if sku is None:
+                continue
+            product = products[_text(row['product_sku'])]
+            price_fake, price_real = inherit_prices(
+                _decimal(row.get('price_fake')), _decimal(row.get('price_real')), product.price_fake, product.price_real
+            )
+            items[sku] = Item(
+                sku=sku,
+                product_id=product_ids[product.sku],
+                size=_text(row.get('size')),
+                color=_text(row.get('color')),
+                other_attributes=_json(row.get('other_attributes')),
+                price_fake=price_fake,
+                price_real=price_real,
+            )
+        if items:
+            existing = Item.objects.using(self.using).filter(sku__in=items)
+            existing = existing.values_list('sku', 'pk', 'product_id', 'stock', 'product__category_id')
+            moves = []
+            for sku, pk, previous_product_id, stock, category_id in existing:
+                self.touched_categories.add(category_id)
+                moves.append((pk, previous_product_id, items[sku].product_id, stock))
+            Item.objects.using(self.using).bulk_create(
+                items.values(), update_conflicts=True, unique_fields=['sku'], update_fields=ITEM_UPDATE_FIELDS
+            )
+            # Items que cambian de producto se llevan su stock al nuevo
+            move_item_stock(moves, self.using)
+        # Los documentos de búsqueda dependen del producto: se reconstruyen los de todos sus items
+        Item.objects.using(self.using).filter(product_id__in=product_ids.values()).refresh_search()
+        result.items += len(items)
+
+    def _resolve_categories(self, rows, result) -> dict:
+        definitions = {}
+        for row in rows:
+            code = _code(row.get('category_code'))
+            if code:
+                definitions.setdefault(code, row)
+
+        missing = [code for code in definitions if code not in self.categories]
+        if missing:
+            existing = Category.objects.using(self.using).filter(code__in=missing)
+            self.categories.update(existing.values_list('code', 'pk'))
+        for code in definitions:
+            self._create_category(code, definitions, result)
+        return self.categories
+
+    def _create_category(self, code, definitions, result, seen=()):
+        # Las categorías nuevas son pocas: se crean con save() para que el path se construya igual que en el admin
+        if code in self.categories:
+            return self.categories[code]
+        if code in seen or code not in definitions:
+            raise CatalogImportError(f'No se puede resolver la categoría "{code}".')
+        row = definitions[code]
+        parent_code = _code(row.get('category_parent'))
+        parent_id = None
+        if parent_code:
+            if parent_code not in self.categories:
+                parent = Category.objects.using(self.using).filter(code=parent_code).values_list('pk', flat=True)
+                self.categories.update({parent_code: pk for pk in parent})
+            parent_id = self._create_category(parent_code, definitions, result, seen + (code,))
+        category = Category(code=code, name=_text(row.get('category_name')) or code, parent_id=parent_id)
+        category.save(using=self.using)
+        self.categories[code] = category.pk
+        result.categories += 1
+        return category.pk
+
+
+def import_catalog(rows, chunk_size=1000, using=None) -> ImportResult:
+    """Upsert an iterable of catalog rows in chunks of ``chunk_size``.
+
+    Parameters
+    ----------
+    rows : iterable of dict
+        Catalog rows, typically from ``read_rows``.
+    chunk_size : int, optional
+        Rows per transaction and per bulk upsert.
+    using : str, optional
+        Database alias, defaults to the router's write database for Product.
+
+    Returns
+    -------
+    ImportResult
+        Totals of the import.
+    """
+    return CatalogImporter(chunk_size=chunk_size, using=using).run(rows)
@@ -0,0 +1,162 @@
+"""Read API listings of the catalog.
+
+Products and items are listed with keyset pagination over their ``Meta.ordering`` (backed by the composite ordering
+indexes), so every page, however deep, costs one query plus one more to resolve the category filter. Supported
+filters, all optional and combinable::
+
+    ?category=<id>              category and its whole subtree
+    ?min_price=...&max_price=...  on price_real
+    ?size=M&size=L&color=Negro  any of the given values
+    ?in_stock=1                 stock above zero
+    ?attr.material=algodón      item attributes, see ``ItemQuerySet.with_attributes``
+    ?limit=50&cursor=...        page size and position
+"""
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Exists, OuterRef
+
+from applications.utils.pagination import KeysetPaginator
+
+from .models import Category, Item, Product
+from .pricing import discount_percentage, price_text
+
+LISTING_PAGE_SIZE = 50
+LISTING_MAX_PAGE_SIZE = 200
+ATTRIBUTE_PREFIX = 'attr.'
+
+PRODUCT_LISTING_FIELDS = ('sku', 'name', 'category_id', 'stock', 'price_fake', 'price_real', '_updated_at')
+ITEM_LISTING_FIELDS = (
+    'sku', 'product_id', 'size', 'color', 'other_attributes', 'stock', 'price_fake', 'price_real', '_updated_at',
+    'product__name', 'product__sku', 'product___updated_at',
+)
+
+
+class ListingError(ValueError):
+    """Raised when the parameters of a listing request are invalid."""
+
+
+def _decimal(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ListingError(f'"{name}" debe ser un número.')
+
+
+def _attribute_value(value):
+    # "110" puede estar guardado como número o como texto: se aceptan ambos
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        return value
+    if isinstance(parsed, (int, float, bool)):
+        return [parsed, value]
+    return value
+
+
+def page_size(params) -> int:
+    try:
+        limit = int(params.get('limit', LISTING_PAGE_SIZE))
+    except ValueError:
+        raise ListingError('"limit" debe ser un entero.')
+    return max(1, min(limit, LISTING_MAX_PAGE_SIZE))
+
+
+def filter_listing(queryset, params):
+    """Apply the listing filters to a Product or Item queryset."""
+    category = params.get('category')
+    if category:
+        try:
+            category = Category.objects.alive().only('pk', 'path').get(pk=int(category))
+        except ValueError:
+            raise ListingError('"category" debe ser un id.')
+        queryset = queryset.in_category(category)
+
+    min_price, max_price = _decimal(params, 'min_price'), _decimal(params, 'max_price')
+    if min_price is not None:
+        queryset = queryset.filter(price_real__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price_real__lte=max_price)
+    if params.get('in_stock') in ('1', 'true'):
+        queryset = queryset.filter(stock__gt=0)
+
+    variants = {}
+    for name in ('size', 'color'):
+        values = [value for value in params.getlist(name) if value]
+        if values:
+            variants[f'{name}__in'] = values
+    attributes = {
+        name[len(ATTRIBUTE_PREFIX):]: _attribute_value(value)
+        for name, value in params.items()
+        if name.startswith(ATTRIBUTE_PREFIX) and len(name) > len(ATTRIBUTE_PREFIX)
+    }
+    if variants or attributes:
+        if queryset.model is Item:
+            queryset = queryset.filter(**variants).with_attributes(attributes)
+        else:
+            # Un producto pasa el filtro si alguno de sus items lo cumple
+            items = Item.objects.alive().filter(product=OuterRef('pk'), **variants).with_attributes(attributes)
+            queryset = queryset.filter(Exists(items))
+    return queryset
+
+
+def listing_etag(rows, *extra) -> str:
+    """Validator of a listing page: changes whenever a listed row is saved or its stock moves.
+
+    Stock roll-ups are set-based UPDATEs that do not touch ``_updated_at``, so the stock is hashed as well.
+    """
+    digest = hashlib.md5(usedforsecurity=False)
+    for value in extra:
+        digest.update(f'{value}|'.encode())
+    for row in rows:
+        digest.update(f'{row.pk}:{row._updated_at.isoformat()}:{row.stock}'.encode())
+        if isinstance(row, Item):
+            digest.update(f':{row.product._updated_at.isoformat()}'.encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def product_row(product) -> dict:
+    return {
+        'id': product.pk,
+        'sku': product.sku,
+        'name': product.name,
+        'category_id': product.category_id,
+        'stock': product.stock,
+        'price_fake': price_text(product.price_fake),
+        'price_real': price_text(product.price_real),
+        'discount_percentage': float(product.discount_percentage),
+    }
+
+
+def item_row(item) -> dict:
+    return {
+        'id': item.pk,
+        'sku': item.sku,
+        'product_id': item.product_id,
+        'product_sku': item.product.sku,
+        'product_name': item.product.name,
+        'size': item.size,
+        'color': item.color,
+        'other_attributes': item.other_attributes,
+        'stock': item.stock,
+        'price_fake': price_text(item.price_fake),
+        'price_real': price_text(item.price_real),
+        'discount_percentage': float(discount_percentage(item.price_fake, item.price_real)),
+    }
+
+
+def product_listing(params):
+    """Page of alive products matching ``params`` (a QueryDict), starting after ``params['cursor']``."""
+    products = filter_listing(Product.objects.alive(), params).only(*PRODUCT_LISTING_FIELDS)
+    return KeysetPaginator(products, page_size(params)).page(params.get('cursor'))
+
+
+def item_listing(params):
+    """Page of alive items matching ``params`` (a QueryDict), with their product in the same query."""
+    items = filter_listing(Item.objects.alive(), params)
+    items = items.select_related('product').only(*ITEM_LISTING_FIELDS)
+    return KeysetPaginator(items, page_size(params)).page(params.get('cursor'))
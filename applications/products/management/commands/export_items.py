@@ -0,0 +1,11 @@
+from applications.products.exports import ITEM_EXPORT_COLUMNS, item_export_queryset
+from applications.utils.commands import ExportCommand
+
+
+class Command(ExportCommand):
+    help = 'Exporta todos los items del catálogo en CSV, JSONL o formato columnar.'
+
+    columns = ITEM_EXPORT_COLUMNS
+
+    def get_queryset(self):
+        return item_export_queryset()
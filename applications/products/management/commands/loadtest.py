@@ -0,0 +1,52 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from applications.products.models import Item
+from applications.utils.loadtest import run_asgi, run_wsgi
+
+
+class Command(BaseCommand):
+    help = 'Compara el rendimiento de los handlers WSGI y ASGI sobre los endpoints de lectura del catálogo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='URLs a consultar. Por defecto los endpoints de lectura.')
+        parser.add_argument('--requests', type=int, default=500, help='Solicitudes por interfaz.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Clientes concurrentes.')
+        parser.add_argument('--interface', choices=['wsgi', 'asgi', 'both'], default='both')
+        parser.add_argument('--host', default='localhost', help='Encabezado Host (debe estar en ALLOWED_HOSTS).')
+        parser.add_argument('--json', action='store_true', help='Imprime los resultados en JSON.')
+
+    def default_urls(self) -> list:
+        item = Item.objects.alive().select_related('product').only('product__name').first()
+        if item is None:
+            raise CommandError('No hay items en el catálogo: indique las URLs a consultar.')
+        term = (item.product.name or '').split(' ')[0]
+        return [
+            reverse('products:product_detail', args=[item.product.pk]),
+            f"{reverse('supply:stock_availability')}?item={item.pk}",
+            f"{reverse('products:search')}?{urlencode({'q': term})}",
+        ]
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or self.default_urls()
+        interfaces = ['wsgi', 'asgi'] if options['interface'] == 'both' else [options['interface']]
+        results = []
+        for interface in interfaces:
+            if interface == 'wsgi':
+                result = run_wsgi(urls, options['requests'], options['concurrency'], options['host'])
+            else:
+                result = asyncio.run(run_asgi(urls, options['requests'], options['concurrency'], options['host']))
+            results.append(result.as_dict())
+
+        if options['json']:
+            self.stdout.write(json.dumps({'urls': urls, 'results': results}, indent=2))
+            return
+        for row in results:
+            self.stdout.write(
+                f"{row['interface']}: {row['requests_per_second']} req/s, p50 {row['p50_ms']} ms, "
+                f"p95 {row['p95_ms']} ms, p99 {row['p99_ms']} ms, errores {row['errors']}"
+            )
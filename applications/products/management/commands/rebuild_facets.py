@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from applications.products.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde los items las facetas de atributos de las categorías.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--category', type=int, action='append', default=None, help='Id de categoría a recalcular (repetible).'
+        )
+        parser.add_argument('--database', default=None, help='Alias de la base de datos.')
+
+    def handle(self, *args, **options):
+        total = rebuild_facets(options['category'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Facetas escritas: {total}.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from applications.products.search import rebuild_search
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los documentos de búsqueda de todos los items del catálogo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Items por transacción.')
+        parser.add_argument('--database', default=None, help='Alias de la base de datos.')
+
+    def handle(self, *args, **options):
+        total = rebuild_search(batch_size=options['batch_size'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Items reindexados: {total}.'))
@@ -0,0 +1,258 @@
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Case, CharField, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Concat, Length, Substr
+from django.utils import timezone
+
+from applications.utils.managers import SoftDeleteQuerySet
+
+from .facets import apply_facet_deltas, attribute_pairs, facet_deltas, facet_state, item_facet_deltas, json_containment
+from .pricing import inherit_prices, normalize_prices
+from .search import refresh_search, search_items
+
+PATH_SEPARATOR = '/'
+# Campos que los payloads en caché no muestran; el stock se invalida con la señal stock_changed
+UNCACHED_FIELDS = frozenset({'stock', 'average_cost', 'search_document', 'search_vector', '_updated_at'})
+
+
+def discount_expression():
+    """SQL version of ``pricing.discount_percentage``: 0 when either price is NULL or zero.
+
+    The same expression backs the functional indexes on Product and Item, so filters and sorts on it can use them.
+    """
+    has_prices = Q(price_fake__isnull=False, price_real__isnull=False) & ~Q(price_fake=0) & ~Q(price_real=0)
+    return Case(
+        When(has_prices, then=Value(1.0) - Cast('price_real', FloatField()) / Cast('price_fake', FloatField())),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+class DiscountQuerySetMixin:
+    def with_discount(self):
+        """Annotate ``discount``, the database-side equivalent of the ``discount_percentage`` property."""
+        return self.annotate(discount=discount_expression())
+
+    def min_discount(self, value):
+        return self.with_discount().filter(discount__gte=value)
+
+    def by_discount(self):
+        """Biggest discounts first."""
+        return self.with_discount().order_by('-discount', 'pk')
+
+
+def invalidate_on_commit(product_ids, category_ids, using):
+    """Invalidate the cached payloads of products and category chains once the transaction on ``using`` commits."""
+    from .cache import invalidate_category_chains, invalidate_products
+
+    product_ids, category_ids = set(product_ids), set(category_ids) - {None}
+
+    def invalidate():
+        invalidate_products(product_ids)
+        if category_ids:
+            invalidate_category_chains(category_ids, using)
+
+    transaction.on_commit(invalidate, using=using)
+
+
+class CategoryQuerySet(SoftDeleteQuerySet):
+    def roots(self):
+        return self.filter(parent__isnull=True)
+
+    def descendants(self, category, include_self=False):
+        """Categories below ``category`` at any depth, in a single query over the indexed path."""
+        condition = Q(path__startswith=f'{category.path}{PATH_SEPARATOR}')
+        if include_self:
+            condition |= Q(pk=category.pk)
+        return self.filter(condition)
+
+    def ancestors(self, category, include_self=False):
+        """Categories above ``category``, from the root down, in a single query.
+
+        Ancestor paths are prefixes of the category path, so no traversal of ``parent`` is needed.
+        """
+        parts = category.path.split(PATH_SEPARATOR)
+        depth = len(parts) if include_self else len(parts) - 1
+        paths = [PATH_SEPARATOR.join(parts[:index]) for index in range(1, depth + 1)]
+        return self.filter(path__in=paths).order_by(Length('path'))
+
+    def repath_subtree(self, old_path: str, new_path: str) -> int:
+        """Rewrite the path prefix of every descendant of ``old_path`` with one set-based UPDATE."""
+        return self.filter(path__startswith=f'{old_path}{PATH_SEPARATOR}').update(
+            path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=CharField()),
+            _updated_at=timezone.now(),
+        )
+
+
+class ProductQuerySet(DiscountQuerySetMixin, SoftDeleteQuerySet):
+    def in_category(self, category, include_descendants=True):
+        """Products of ``category`` and, by default, of its whole subtree in a single query."""
+        condition = Q(category=category)
+        if include_descendants:
+            condition |= Q(category__path__startswith=f'{category.path}{PATH_SEPARATOR}')
+        return self.filter(condition)
+
+    def search(self, query):
+        """Products with at least one item matching ``query``."""
+        from .models import Item
+
+        return self.filter(pk__in=Item.objects.using(self.db).search(query).order_by().values('product'))
+
+    def with_purchase_urls(self, urls=None, **kwargs):
+        """Products whose ``purchase_urls`` contain every given ``store: url`` (a list matches any of its urls)."""
+        return self.filter(json_containment('purchase_urls', {**(urls or {}), **kwargs}, self.db))
+
+    def update(self, **kwargs):
+        """Update the products and, on commit, invalidate their cached payloads and those of their categories.
+
+        ``soft_delete`` and ``restore`` go through here too. Updates of ``UNCACHED_FIELDS`` only skip the query that
+        collects the touched products.
+        """
+        if UNCACHED_FIELDS.issuperset(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            categories = dict(self.order_by().values_list('pk', 'category_id'))
+            count = super().update(**kwargs)
+            category_ids = set(categories.values())
+            if {'category', 'category_id'} & set(kwargs):
+                moved = self.model._default_manager.using(self.db).filter(pk__in=categories)
+                category_ids.update(moved.values_list('category_id', flat=True))
+            invalidate_on_commit(categories, category_ids, self.db)
+        return count
+
+    def _item_facet_deltas(self, sign=1):
+        from .models import Item
+
+        return item_facet_deltas(Item.objects.using(self.db).alive().filter(product__in=self.values('pk')), sign)
+
+    def soft_delete(self) -> int:
+        """Soft delete the products and take their alive items out of the category facets."""
+        with transaction.atomic(using=self.db, savepoint=False):
+            deltas = self.alive()._item_facet_deltas(sign=-1)
+            count = super().soft_delete()
+            apply_facet_deltas(deltas, using=self.db)
+        return count
+
+    def restore(self) -> int:
+        """Restore soft-deleted products and add their alive items back to the category facets."""
+        with transaction.atomic(using=self.db, savepoint=False):
+            deltas = self.dead()._item_facet_deltas()
+            count = super().restore()
+            apply_facet_deltas(deltas, using=self.db)
+        return count
+
+
+class ItemQuerySet(DiscountQuerySetMixin, SoftDeleteQuerySet):
+    def in_category(self, category, include_descendants=True):
+        """Items whose product belongs to ``category`` or, by default, to its subtree."""
+        condition = Q(product__category=category)
+        if include_descendants:
+            condition |= Q(product__category__path__startswith=f'{category.path}{PATH_SEPARATOR}')
+        return self.filter(condition)
+
+    def search(self, query):
+        """Items matching ``query``, annotated with ``rank`` and best matches first."""
+        return search_items(self, query)
+
+    def refresh_search(self) -> int:
+        """Rebuild the search document of these items with one UPDATE."""
+        return refresh_search(self)
+
+    def with_attributes(self, attributes=None, **kwargs):
+        """Items whose ``other_attributes`` contain every given ``key: value`` (a list matches any of its values).
+
+        Attributes whose names are not valid keyword arguments go in the ``attributes`` dict.
+        """
+        return self.filter(json_containment('other_attributes', {**(attributes or {}), **kwargs}, self.db))
+
+    def update(self, **kwargs):
+        """Update the items and, on commit, invalidate the cached payloads of their products.
+
+        ``soft_delete`` and ``restore`` go through here too. Updates of ``UNCACHED_FIELDS`` only skip the query that
+        collects the touched products.
+        """
+        if UNCACHED_FIELDS.issuperset(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            items = dict(self.order_by().values_list('pk', 'product_id'))
+            count = super().update(**kwargs)
+            product_ids = set(items.values())
+            if {'product', 'product_id'} & set(kwargs):
+                moved = self.model._default_manager.using(self.db).filter(pk__in=items)
+                product_ids.update(moved.values_list('product_id', flat=True))
+            invalidate_on_commit(product_ids, (), self.db)
+        return count
+
+    def product_values(self, objs) -> dict:
+        """``{product_id: (price_fake, price_real, category_id)}`` of the products of ``objs``.
+
+        Products already loaded on the items are not read again; the others are read with one narrow query.
+        """
+        values = {}
+        product_field = self.model._meta.get_field('product')
+        for obj in objs:
+            if product_field.is_cached(obj) and obj.product is not None:
+                values[obj.product_id] = (obj.product.price_fake, obj.product.price_real, obj.product.category_id)
+        missing = {obj.product_id for obj in objs} - set(values) - {None}
+        if missing:
+            rows = product_field.related_model._default_manager.using(self.db).filter(pk__in=missing)
+            for pk, *product in rows.values_list('pk', 'price_fake', 'price_real', 'category_id'):
+                values[pk] = tuple(product)
+        return values
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Insert items with the price rules of ``Item.save`` and add them to the category facets.
+
+        Items without prices inherit those of their product. Facet deltas are computed from the objects in memory;
+        products not loaded on the items are read with one query, and only if some item needs their prices or
+        category. Upserts leave the facets to ``rebuild_facets``.
+        """
+        objs = list(objs)
+        track_facets = not (kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'))
+        products = self.product_values(
+            [
+                obj
+                for obj in objs
+                if (not obj.price_fake and not obj.price_real)
+                or (track_facets and not obj._deleted and attribute_pairs(obj.other_attributes))
+            ]
+        )
+        deltas = Counter()
+        for obj in objs:
+            price_fake, price_real, category_id = products.get(obj.product_id, (None, None, None))
+            if not obj.price_fake and not obj.price_real:
+                obj.price_fake, obj.price_real = inherit_prices(obj.price_fake, obj.price_real, price_fake, price_real)
+            else:
+                obj.price_fake, obj.price_real = normalize_prices(obj.price_fake, obj.price_real)
+            if track_facets and not obj._deleted:
+                facet_deltas(category_id, obj.other_attributes, deltas=deltas)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(objs, *args, **kwargs)
+            if track_facets:
+                for obj in created:
+                    obj._loaded_facets = facet_state(obj)
+                apply_facet_deltas(deltas, using=self.db)
+        return created
+
+    def soft_delete(self) -> int:
+        """Soft delete the items and take them out of the category facets (those of dead products are not in them)."""
+        with transaction.atomic(using=self.db, savepoint=False):
+            deltas = item_facet_deltas(self.alive().filter(product___deleted=False), sign=-1)
+            count = super().soft_delete()
+            apply_facet_deltas(deltas, using=self.db)
+        return count
+
+    def restore(self) -> int:
+        """Restore soft-deleted items and add them back to the category facets."""
+        with transaction.atomic(using=self.db, savepoint=False):
+            deltas = item_facet_deltas(self.dead().filter(product___deleted=False))
+            count = super().restore()
+            apply_facet_deltas(deltas, using=self.db)
+        return count
+
+
+CategoryManager = models.Manager.from_queryset(CategoryQuerySet)
+ProductManager = models.Manager.from_queryset(ProductQuerySet)
+ItemManager = models.Manager.from_queryset(ItemQuerySet)
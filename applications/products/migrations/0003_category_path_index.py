@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, editable=False, max_length=255, verbose_name='Path'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_category_path_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='SKU'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='SKU'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_sku'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('_deleted', False)), fields=['product'], name='item_alive_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('_deleted', False)), fields=['category'], name='product_alive_category_idx'),
+        ),
+    ]
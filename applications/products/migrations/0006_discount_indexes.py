@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:46
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(models.Case(models.When(models.Q(('price_fake__isnull', False), ('price_real__isnull', False), models.Q(('price_fake', 0), _negated=True), models.Q(('price_real', 0), _negated=True)), then=django.db.models.expressions.CombinedExpression(models.Value(1.0), '-', django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast('price_real', models.FloatField()), '/', django.db.models.functions.comparison.Cast('price_fake', models.FloatField())))), default=models.Value(0.0), output_field=models.FloatField()), name='item_discount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(models.Case(models.When(models.Q(('price_fake__isnull', False), ('price_real__isnull', False), models.Q(('price_fake', 0), _negated=True), models.Q(('price_real', 0), _negated=True)), then=django.db.models.expressions.CombinedExpression(models.Value(1.0), '-', django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast('price_real', models.FloatField()), '/', django.db.models.functions.comparison.Cast('price_fake', models.FloatField())))), default=models.Value(0.0), output_field=models.FloatField()), name='product_discount_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_discount_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='item',
+            options={'ordering': ['product_id', 'size', 'color', '-price_real'], 'verbose_name': 'Item', 'verbose_name_plural': 'Items'},
+        ),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'ordering': ['category_id', 'name', '-price_real'], 'verbose_name': 'Producto', 'verbose_name_plural': 'Productos'},
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['product', 'size', 'color', '-price_real'], name='item_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name', '-price_real'], name='product_ordering_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:02
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+from applications.utils.operations import PostgreSQLRunSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_item_average_cost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Documento de búsqueda'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        TrigramExtension(),
+        PostgreSQLRunSQL(
+            'CREATE INDEX IF NOT EXISTS item_search_vector_idx ON products_item USING gin (search_vector)',
+            'DROP INDEX IF EXISTS item_search_vector_idx',
+        ),
+        PostgreSQLRunSQL(
+            'CREATE INDEX IF NOT EXISTS item_search_trgm_idx ON products_item USING gin (search_document gin_trgm_ops)',
+            'DROP INDEX IF EXISTS item_search_trgm_idx',
+        ),
+    ]
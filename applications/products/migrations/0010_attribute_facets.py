@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from applications.utils.operations import PostgreSQLRunSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_item_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, verbose_name='Atributo')),
+                ('value', models.JSONField(verbose_name='Valor')),
+                ('count', models.IntegerField(default=0, verbose_name='Items')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='products.category', verbose_name='Categoría')),
+            ],
+            options={
+                'verbose_name': 'Faceta de categoría',
+                'verbose_name_plural': 'Facetas de categoría',
+                'ordering': ['category_id', 'key', '-count'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='categoryfacet',
+            constraint=models.UniqueConstraint(fields=('category', 'key', 'value'), name='categoryfacet_uniq'),
+        ),
+        PostgreSQLRunSQL(
+            'CREATE INDEX IF NOT EXISTS item_attributes_gin_idx '
+            'ON products_item USING gin (other_attributes jsonb_path_ops)',
+            'DROP INDEX IF EXISTS item_attributes_gin_idx',
+        ),
+        PostgreSQLRunSQL(
+            'CREATE INDEX IF NOT EXISTS product_purchase_urls_gin_idx '
+            'ON products_product USING gin (purchase_urls jsonb_path_ops)',
+            'DROP INDEX IF EXISTS product_purchase_urls_gin_idx',
+        ),
+    ]
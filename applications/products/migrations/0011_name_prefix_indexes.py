@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:45
+
+from django.db import migrations
+
+from applications.utils.operations import PostgreSQLRunSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_attribute_facets'),
+    ]
+
+    operations = [
+        # name__istartswith compila a UPPER(name::text) LIKE UPPER(...): solo un índice funcional con
+        # text_pattern_ops sirve para el prefijo con cualquier collation
+        PostgreSQLRunSQL(
+            'CREATE INDEX IF NOT EXISTS category_name_upper_idx ON products_category (UPPER(name) text_pattern_ops)',
+            'DROP INDEX IF EXISTS category_name_upper_idx',
+        ),
+        PostgreSQLRunSQL(
+            'CREATE INDEX IF NOT EXISTS product_name_upper_idx ON products_product (UPPER(name) text_pattern_ops)',
+            'DROP INDEX IF EXISTS product_name_upper_idx',
+        ),
+    ]
@@ -1,8 +1,18 @@
+from itertools import product as cartesian_product
+
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Q
 
 from applications.utils.models import ModelClass
 
+from .facets import facet_state, item_facet_changes, move_product_facets
+from .managers import PATH_SEPARATOR, CategoryManager, ItemManager, ProductManager, discount_expression
+from .pricing import discount_percentage, distinct_values, inherit_prices, normalize_prices
+from .search import ITEM_SEARCH_FIELDS, PRODUCT_SEARCH_FIELDS, SEARCH_COLUMNS, search_state
+
 
 # Create your models here.
 class Category(ModelClass):
@@ -24,26 +34,71 @@ class Category(ModelClass):
     parent : models.ForeignKey
         Optional reference to a parent category, self-referential.
     path : models.CharField
-        Stores the hierarchical path of the category, not editable via admin.
+        Stores the hierarchical path of the category, not editable via admin. Indexed so subtree lookups are prefix
+        scans.
+
+    Custom Methods
+    -------
+    get_ancestors(self, include_self=False) -> QuerySet:
+        Categories above this one, from the root down.
+    get_descendants(self, include_self=False) -> QuerySet:
+        Categories below this one at any depth.
+    get_products(self, include_descendants=True) -> QuerySet:
+        Products of this category and its subtree.
     """
 
     code = models.CharField(max_length=3, unique=True, verbose_name='Código')
     name = models.CharField(max_length=60, unique=True, verbose_name='Nombre')
     description = models.TextField(null=True, blank=True, verbose_name='Descripción')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, verbose_name='Categoría padre')
-    path = models.CharField(max_length=255, editable=False, verbose_name='Path')
+    path = models.CharField(max_length=255, editable=False, db_index=True, verbose_name='Path')
+
+    objects = CategoryManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'path' not in instance.get_deferred_fields():
+            instance._loaded_path = instance.path
+        return instance
+
+    def _parent_path(self, using) -> str:
+        if self._meta.get_field('parent').is_cached(self):
+            return self.parent.path
+        return Category.objects.using(using).filter(pk=self.parent_id).values_list('path', flat=True).get()
 
     def save(self, *args, **kwargs):
-        # Path
-        if self.parent:
-            self.path = f'{self.parent.path}/{self.name}'
+        # Path: el padre solo se consulta si no está cargado en memoria, y en la base donde se escribe (no la réplica)
+        if self.parent_id:
+            using = kwargs.get('using') or router.db_for_write(Category, instance=self)
+            self.path = f'{self._parent_path(using)}{PATH_SEPARATOR}{self.name}'
         else:
             self.path = self.name
 
+        previous_path = getattr(self, '_loaded_path', None)
+        if previous_path and self.path.startswith(f'{previous_path}{PATH_SEPARATOR}'):
+            raise ValidationError('Una categoría no puede moverse dentro de su propio subárbol.')
+
         # Code
         if self.code:
             self.code = self.code.upper()
-        super().save(*args, **kwargs)
+
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if previous_path and previous_path != self.path:
+                # Re-path de todo el subárbol en un solo UPDATE
+                Category.objects.using(self._state.db).repath_subtree(previous_path, self.path)
+                Item.objects.using(self._state.db).in_category(self).refresh_search()
+        self._loaded_path = self.path
+
+    def get_ancestors(self, include_self=False):
+        return Category.objects.ancestors(self, include_self=include_self)
+
+    def get_descendants(self, include_self=False):
+        return Category.objects.descendants(self, include_self=include_self)
+
+    def get_products(self, include_descendants=True):
+        return Product.objects.in_category(self, include_descendants=include_descendants)
 
     def __str__(self) -> str:
         return f'{self.path}'
@@ -68,6 +123,8 @@ class Product(ModelClass):
     ----------
     category : models.ForeignKey
         Category to which the product belongs, can be null.
+    sku : models.CharField
+        Unique external reference used to upsert the product from supplier catalogs, can be null.
     name : models.CharField
         The name of the product, can be blank.
     description : models.TextField
@@ -83,11 +140,16 @@ class Product(ModelClass):
 
     Custom Methods
     -------
+    create_variants(self, sizes=None, colors=None, attrs=None, **fields) -> list:
+        Creates the Items of every size, color and attribute combination with one ``bulk_create``.
+
     discount_percentage(self) -> float:
-        Calculates the discount percentage based on fake and real prices.
+        Calculates the discount percentage based on fake and real prices. ``Product.objects.with_discount()``
+        computes the same value in SQL as the ``discount`` annotation.
     """
 
     category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, verbose_name='Categoría')
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, verbose_name='SKU')
     name = models.CharField(max_length=100, null=True, blank=True, verbose_name='Nombre')
     description = models.TextField(null=True, blank=True, verbose_name='Descripción')
     purchase_urls = models.JSONField(null=True, blank=True, verbose_name='Links de compra')
@@ -97,21 +159,67 @@ class Product(ModelClass):
     )
     price_real = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(100)])
 
+    objects = ProductManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'category_id' not in instance.get_deferred_fields():
+            instance._loaded_category_id = instance.category_id
+        instance._loaded_search = search_state(instance, PRODUCT_SEARCH_FIELDS)
+        return instance
+
     def save(self, *args, **kwargs):
-        if self.price_fake in [None, '']:
-            self.price_fake = self.price_real  # Igualar el precio "falso" al real en caso que no tenga valor.
-        if self.price_real > self.price_fake:
-            self.price_real, self.price_fake = (
-                self.price_fake,
-                self.price_real,
-            )  # Asegurar que el precio "falso" sea siempre mayor.
-        super().save(*args, **kwargs)
+        self.price_fake, self.price_real = normalize_prices(self.price_fake, self.price_real)
+        # Se lee antes de guardar: la señal post_save lo actualiza
+        previous_category_id = getattr(self, '_loaded_category_id', self.category_id)
+        # Un producto nuevo no tiene items; uno existente solo los actualiza si cambió un campo de sus documentos
+        search = search_state(self, PRODUCT_SEARCH_FIELDS)
+        refresh = not self._state.adding and (search is None or search != getattr(self, '_loaded_search', None))
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if refresh:
+                Item.objects.using(self._state.db).filter(product=self).refresh_search()
+            move_product_facets(self, previous_category_id, using=self._state.db)
+        self._loaded_search = search
+
+    def create_variants(self, sizes=None, colors=None, attrs=None, **fields) -> list:
+        """Create one Item per combination of ``sizes``, ``colors`` and ``attrs`` with a single ``bulk_create``.
+
+        ``attrs`` maps attribute names to a value, or to a list of values that is expanded like sizes and colors.
+        Repeated options are dropped (keeping their first position), so every variant is a distinct combination.
+        ``fields`` (prices, ...) are set on every variant; the price rules of ``Item.save`` are applied in memory.
+        Any number of variants costs the INSERT, one UPDATE of their search documents and, when they carry
+        attributes, up to three queries for the facets.
+
+        Returns
+        -------
+        list
+            The created Items.
+        """
+        from .cache import invalidate_products
+
+        options = [
+            [(key, value) for value in distinct_values(values if isinstance(values, (list, tuple)) else [values])]
+            for key, values in (attrs or {}).items()
+        ]
+        combinations = cartesian_product(
+            distinct_values(sizes or [None]), distinct_values(colors or [None]), cartesian_product(*options)
+        )
+        variants = [
+            Item(product=self, size=size, color=color, other_attributes=dict(attributes) or None, **fields)
+            for size, color, attributes in combinations
+        ]
+        using = router.db_for_write(Item, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            created = Item.objects.using(using).bulk_create(variants)
+            Item.objects.using(using).filter(pk__in=[item.pk for item in created]).refresh_search()
+        transaction.on_commit(lambda: invalidate_products([self.pk]), using=using)
+        return created
 
     @property
     def discount_percentage(self) -> float:
-        if self.price_fake and self.price_real:
-            return 1 - (self.price_real / self.price_fake)
-        return 0
+        return discount_percentage(self.price_fake, self.price_real)
 
     def __str__(self) -> str:
         return f'{self.name} ({self.category})'
@@ -119,7 +227,13 @@ class Product(ModelClass):
     class Meta:
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
-        ordering = ['category', 'name', '-price_real']
+        # category_id (y no category) evita el JOIN con el ordenamiento de Category y permite usar el índice
+        ordering = ['category_id', 'name', '-price_real']
+        indexes = [
+            models.Index(fields=['category', 'name', '-price_real'], name='product_ordering_idx'),
+            models.Index(fields=['category'], condition=Q(_deleted=False), name='product_alive_category_idx'),
+            models.Index(discount_expression(), name='product_discount_idx'),
+        ]
 
 
 class Item(ModelClass):
@@ -136,6 +250,8 @@ class Item(ModelClass):
     ----------
     product : models.ForeignKey
         Reference to the associated product.
+    sku : models.CharField
+        Unique external reference used to upsert the item from supplier catalogs, can be null.
     size : models.CharField
         Size of the item, can be null or blank.
     color : models.CharField
@@ -148,17 +264,28 @@ class Item(ModelClass):
         Simulated price before discount, can be null or blank.
     price_real : models.DecimalField
         The actual selling price of the item.
+    average_cost : models.DecimalField
+        Running weighted-average landed cost of the units received, maintained by the supply valuation engine.
+    search_document : models.TextField
+        Text searched by ``Item.objects.search``, rebuilt whenever the item, its product or its category changes.
+    search_vector : SearchVectorField
+        Full-text vector of the search document, only filled in on PostgreSQL.
+
+    ``other_attributes`` is filtered with ``Item.objects.with_attributes`` and its scalar values are counted per
+    category in ``CategoryFacet``.
 
     Custom Methods
     -------
     discount_percentage(self) -> float:
-        Calculates the discount percentage for the item.
+        Calculates the discount percentage for the item. ``Item.objects.with_discount()`` computes the same value in
+        SQL as the ``discount`` annotation.
 
     get_other_attributes_as_string(self) -> str:
         Returns a comma-separated string of other attributes.
     """
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Producto')
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, verbose_name='SKU')
     size = models.CharField(max_length=20, null=True, blank=True, verbose_name='Talla')
     color = models.CharField(max_length=50, null=True, blank=True, verbose_name='Color')
     other_attributes = models.JSONField(null=True, blank=True, verbose_name='Otros atributos')
@@ -169,27 +296,69 @@ class Item(ModelClass):
     price_real = models.DecimalField(
         max_digits=10, decimal_places=2, validators=[MinValueValidator(100)], blank=True, null=True
     )
+    average_cost = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, editable=False, verbose_name='Costo promedio'
+    )
+    search_document = models.TextField(default='', blank=True, editable=False, verbose_name='Documento de búsqueda')
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ItemManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not {'product_id', 'other_attributes', '_deleted'} & instance.get_deferred_fields():
+            instance._loaded_facets = facet_state(instance)
+        if 'product_id' not in instance.get_deferred_fields():
+            instance._loaded_product_id = instance.product_id
+        instance._loaded_search = search_state(instance, ITEM_SEARCH_FIELDS)
+        return instance
+
+    def _cached_categories(self) -> dict:
+        if self._meta.get_field('product').is_cached(self) and self.product is not None:
+            return {self.product_id: self.product.category_id}
+        return {}
 
     def save(self, *args, **kwargs):
+        categories = self._cached_categories()
         if not self.price_fake and not self.price_real:
-            self.price_fake, self.price_real = (
-                self.product.price_fake,
-                self.product.price_real,
-            )  # Heredar los precios del producto padre
-        elif self.price_fake in [None, '']:
-            self.price_fake = self.price_real  # Igualar el precio "falso" al real en caso que no tenga valor.
-        elif self.price_real > self.price_fake:
-            self.price_real, self.price_fake = (
-                self.price_fake,
-                self.price_real,
-            )  # Asegurar que el precio "falso" sea siempre mayor.
-        super().save(*args, **kwargs)
+            # Sin el producto en memoria solo se leen sus precios y su categoría, no la fila completa
+            using = kwargs.get('using') or router.db_for_write(Item, instance=self)
+            values = Item.objects.using(using).product_values([self])
+            price_fake, price_real, category_id = values.get(self.product_id, (None, None, None))
+            self.price_fake, self.price_real = inherit_prices(self.price_fake, self.price_real, price_fake, price_real)
+            categories = {self.product_id: category_id}
+        else:
+            self.price_fake, self.price_real = normalize_prices(self.price_fake, self.price_real)
+        current = facet_state(self)
+        search = search_state(self, ITEM_SEARCH_FIELDS)
+        refresh = search is None or search != getattr(self, '_loaded_search', None)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # El documento en memoria puede estar desactualizado: no se escribe de vuelta
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in SEARCH_COLUMNS and field.attname not in deferred
+            ]
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if refresh:
+                Item.objects.using(self._state.db).filter(pk=self.pk).refresh_search()
+            item_facet_changes(getattr(self, '_loaded_facets', None), current, self._state.db, categories=categories)
+            previous_product_id = getattr(self, '_loaded_product_id', self.product_id)
+            if previous_product_id != self.product_id and self.stock:
+                from applications.supply.stock import move_item_stock
+
+                # El stock del item pasa del producto anterior al nuevo
+                move_item_stock([(self.pk, previous_product_id, self.product_id, self.stock)], self._state.db)
+        self._loaded_facets = current
+        self._loaded_product_id = self.product_id
+        self._loaded_search = search
 
     @property
     def discount_percentage(self) -> float:
-        if self.price_fake and self.price_real:
-            return 1 - (self.price_real / self.price_fake)
-        return 0
+        return discount_percentage(self.price_fake, self.price_real)
 
     def get_other_attributes_as_string(self) -> str:
         if self.other_attributes:
@@ -210,4 +379,44 @@ class Item(ModelClass):
     class Meta:
         verbose_name = 'Item'
         verbose_name_plural = 'Items'
-        ordering = ['product', 'size', 'color', '-price_real']
+        ordering = ['product_id', 'size', 'color', '-price_real']
+        indexes = [
+            models.Index(fields=['product', 'size', 'color', '-price_real'], name='item_ordering_idx'),
+            models.Index(fields=['product'], condition=Q(_deleted=False), name='item_alive_product_idx'),
+            models.Index(discount_expression(), name='item_discount_idx'),
+        ]
+
+
+class CategoryFacet(models.Model):
+    """Number of alive items of a category carrying one attribute value, for filter sidebars.
+
+    Maintained incrementally from ``Item.save``, ``Product.save`` and the Item queryset bulk operations, see
+    ``applications.products.facets``. Counts of a subtree are the sum of the counts of its categories.
+
+    Attributes
+    ----------
+    category : models.ForeignKey
+        Category of the products of the counted items (not of its ancestors).
+    key : models.CharField
+        Attribute name in ``Item.other_attributes``.
+    value : models.JSONField
+        Attribute value, kept as JSON so it can be passed back to ``Item.objects.with_attributes``.
+    count : models.IntegerField
+        Number of alive items with ``key: value``.
+    """
+
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facets', verbose_name='Categoría')
+    key = models.CharField(max_length=100, verbose_name='Atributo')
+    value = models.JSONField(verbose_name='Valor')
+    count = models.IntegerField(default=0, verbose_name='Items')
+
+    def __str__(self) -> str:
+        return f'{self.category_id} {self.key}={self.value} ({self.count})'
+
+    class Meta:
+        verbose_name = 'Faceta de categoría'
+        verbose_name_plural = 'Facetas de categoría'
+        ordering = ['category_id', 'key', '-count']
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'key', 'value'], name='categoryfacet_uniq'),
+        ]
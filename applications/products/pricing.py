@@ -0,0 +1,50 @@
+import json
+
+
+def normalize_prices(price_fake, price_real) -> tuple:
+    """Apply the catalog price rules to a (price_fake, price_real) pair.
+
+    An empty fake price takes the real price, and the fake price is always the higher of the two.
+
+    Returns
+    -------
+    tuple
+        Normalized ``(price_fake, price_real)``.
+    """
+    if price_fake in [None, '']:
+        price_fake = price_real  # Igualar el precio "falso" al real en caso que no tenga valor.
+    if price_real is not None and price_fake is not None and price_real > price_fake:
+        price_real, price_fake = price_fake, price_real  # Asegurar que el precio "falso" sea siempre mayor.
+    return price_fake, price_real
+
+
+def inherit_prices(price_fake, price_real, parent_fake, parent_real) -> tuple:
+    """Item price rules: inherit the product prices when the item has none, otherwise normalize its own."""
+    if not price_fake and not price_real:
+        return parent_fake, parent_real  # Heredar los precios del producto padre
+    return normalize_prices(price_fake, price_real)
+
+
+def discount_percentage(price_fake, price_real):
+    """Discount of the real price over the fake one, 0 when either price is missing or zero."""
+    if price_fake and price_real:
+        return 1 - (price_real / price_fake)
+    return 0
+
+
+def price_text(value):
+    """Price as a string for JSON payloads, keeping its decimals exact."""
+    return str(value) if value is not None else None
+
+
+def distinct_values(values) -> list:
+    """``values`` without repetitions, in their original order."""
+    # json.dumps como llave: admite valores no hashables y distingue 1 de True, como las facetas
+    seen = set()
+    distinct = []
+    for value in values:
+        key = json.dumps(value, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            distinct.append(value)
+    return distinct
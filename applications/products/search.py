@@ -0,0 +1,113 @@
+"""Catalog search over items.
+
+Every Item stores a ``search_document`` with its own SKU, size, color and attributes plus the SKU, name, description,
+category name and category path of its product. On PostgreSQL the document also feeds ``search_vector`` (full-text,
+GIN index) and a trigram GIN index that catches typos; on other backends searching falls back to ``icontains`` over
+the document, which is enough for tests and local development.
+
+Documents are rebuilt in SQL from the related rows, so refreshing one item, one product or a whole category subtree
+is a single UPDATE.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connections, router, transaction
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+
+# Campos de Product e Item de los que depende el documento de búsqueda de los items
+PRODUCT_SEARCH_FIELDS = ('sku', 'name', 'description', 'category_id')
+ITEM_SEARCH_FIELDS = ('product_id', 'sku', 'size', 'color', 'other_attributes')
+# Columnas que solo escribe refresh_search
+SEARCH_COLUMNS = ('search_document', 'search_vector')
+
+
+def search_state(instance, fields):
+    """Copy of the ``fields`` of ``instance`` that feed the search documents, or None when one of them is deferred."""
+    if set(fields) & instance.get_deferred_fields():
+        return None
+    return copy.deepcopy(tuple(getattr(instance, field) for field in fields))
+
+
+def is_postgresql(using) -> bool:
+    return connections[using].vendor == 'postgresql'
+
+
+def _join(*expressions):
+    parts = []
+    for expression in expressions:
+        if parts:
+            parts.append(Value(' '))
+        parts.append(Coalesce(expression, Value(''), output_field=TextField()))
+    return Concat(*parts, output_field=TextField())
+
+
+def _product_value(expression):
+    from .models import Product
+
+    product = Product.objects.filter(pk=OuterRef('product')).annotate(value=expression).values('value')[:1]
+    return Subquery(product, output_field=TextField())
+
+
+def item_document():
+    """Search document of the outer Item as an SQL expression."""
+    product = _product_value(
+        _join(F('sku'), F('name'), F('category__name'), F('category__path'), F('description'))
+    )
+    return _join(F('sku'), product, F('size'), F('color'), Cast('other_attributes', TextField()))
+
+
+def refresh_search(items) -> int:
+    """Rebuild the search document (and vector, on PostgreSQL) of an Item queryset with one UPDATE."""
+    values = {'search_document': item_document()}
+    if is_postgresql(items.db):
+        # El nombre del producto pesa más que el resto del documento en el ranking
+        values['search_vector'] = SearchVector(
+            _product_value(F('name')), weight='A', config=settings.SEARCH_CONFIG
+        ) + SearchVector(item_document(), weight='B', config=settings.SEARCH_CONFIG)
+    return items.update(**values)
+
+
+def rebuild_search(batch_size=5000, using=None) -> int:
+    """Rebuild the search documents of every item, one UPDATE and transaction per ``batch_size`` primary keys.
+
+    Returns
+    -------
+    int
+        Number of refreshed items.
+    """
+    from .models import Item
+
+    using = using or router.db_for_write(Item)
+    items = Item.objects.using(using).order_by('pk')
+    total = 0
+    last_pk = 0
+    while True:
+        pks = list(items.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return total
+        with transaction.atomic(using=using):
+            total += refresh_search(items.filter(pk__gte=pks[0], pk__lte=pks[-1]))
+        last_pk = pks[-1]
+
+
+def search_items(items, query):
+    """Filter an Item queryset by ``query`` and annotate a ``rank`` to order by.
+
+    On PostgreSQL, ``query`` uses web search syntax (quotes, ``or``, ``-``) and matches either the full-text vector
+    or, for typos, trigram word similarity; both conditions are answered by GIN indexes.
+    """
+    query = (query or '').strip()
+    if not query:
+        return items.none()
+
+    if is_postgresql(items.db):
+        search_query = SearchQuery(query, config=settings.SEARCH_CONFIG, search_type='websearch')
+        matches = items.filter(Q(search_vector=search_query) | Q(search_document__trigram_word_similar=query))
+        rank = SearchRank(F('search_vector'), search_query) + TrigramWordSimilarity(query, 'search_document')
+        return matches.annotate(rank=rank).order_by('-rank', 'pk')
+
+    for term in query.split():
+        items = items.filter(search_document__icontains=term)
+    return items.annotate(rank=Value(0.0, output_field=FloatField())).order_by('pk')
@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from applications.supply.stock import stock_changed
+
+from .cache import (
+    invalidate_catalog,
+    invalidate_categories,
+    invalidate_category_chains,
+    invalidate_products,
+    path_prefixes,
+)
+from .facets import facet_state, item_facet_changes
+from .managers import PATH_SEPARATOR
+from .models import Category, Item, Product
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_cached_product(sender, instance, using, **kwargs):
+    # Tras un delete la instancia ya no tiene pk cuando se confirma la transacción: se captura ahora
+    pk = instance.pk
+    category_ids = {instance.category_id, getattr(instance, '_loaded_category_id', None)} - {None}
+
+    def invalidate():
+        invalidate_products([pk])
+        if category_ids:
+            invalidate_category_chains(category_ids, using)
+
+    transaction.on_commit(invalidate, using=using)
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver([post_save, post_delete], sender=Item)
+def invalidate_cached_item(sender, instance, using, **kwargs):
+    product_id = instance.product_id
+    transaction.on_commit(lambda: invalidate_products([product_id]), using=using)
+
+
+@receiver(post_delete, sender=Item)
+def remove_deleted_item_facets(sender, instance, using, **kwargs):
+    item_facet_changes(getattr(instance, '_loaded_facets', None) or facet_state(instance), None, using)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_cached_category(sender, instance, using, **kwargs):
+    pk, path = instance.pk, instance.path
+    paths = set(path_prefixes(path)) | set(path_prefixes(getattr(instance, '_loaded_path', None)))
+
+    def invalidate():
+        subtree = Q(path__in=paths) | Q(path__startswith=f'{path}{PATH_SEPARATOR}') | Q(pk=pk)
+        invalidate_categories(Category.objects.using(using).filter(subtree).values_list('pk', flat=True))
+
+    transaction.on_commit(invalidate, using=using)
+
+
+@receiver(stock_changed)
+def invalidate_cached_stock(sender, product_ids, **kwargs):
+    if product_ids is None:
+        invalidate_catalog()
+    else:
+        invalidate_products(product_ids)
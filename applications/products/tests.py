@@ -1,11 +1,34 @@
-from django.test import TestCase
+import json
+import math
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
 
-from .models import Category, Item, Product
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, connections, router, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from applications.utils.middleware import QueryThresholdExceeded, QueryThresholdWarning
+from applications.utils.pagination import KeysetPaginator
+from applications.utils.testing import IndexUsageMixin, QueryBudgetExceeded, QueryBudgetMixin, query_budget
+
+from . import cache
+
+from .facets import category_facets
+from .importer import import_catalog, read_rows
+from .managers import PATH_SEPARATOR
+from .models import Category, CategoryFacet, Item, Product
 
 # Create your tests here.
 
 
-class ItemTestCase(TestCase):
+class ItemTestCase(QueryBudgetMixin, TestCase):
     def setUp(self) -> None:
         self.category = Category.objects.create(name='Category test')
         self.product = Product.objects.create(name='Test product', price_real=50000)
@@ -26,3 +49,681 @@ class ItemTestCase(TestCase):
             "La propiedad discount_percentage debería corregirse para que represente el verdadero porcentaje de\
             descuento (1 - (price_real/price_Fake))",
         )
+
+    def test_save_query_budget(self):
+        product = Product.objects.get(pk=self.product.pk)
+        with self.assertQueryBudget(4, label='Crear un Item que hereda los precios'):
+            item = Item.objects.create(product=product, size='M', color='Rojo')
+        item.stock = 3
+        with self.assertQueryBudget(3, label='Actualizar un Item'):
+            item.save()
+
+    def test_inherits_prices_without_loading_the_product(self):
+        self.product.category = self.category
+        self.product.save()
+
+        # Precios y categoría del producto en una consulta, más las del Item y sus facetas
+        with self.assertQueryBudget(8, label='Crear un Item con atributos desde product_id'):
+            item = Item.objects.create(product_id=self.product.pk, other_attributes={'material': 'lana'})
+
+        self.assertEqual((item.price_fake, item.price_real), (50000, 50000))
+        self.assertFalse(Item._meta.get_field('product').is_cached(item))
+        self.assertEqual(category_facets(self.category), {'material': [('lana', 1)]})
+
+    def test_bulk_create_applies_price_rules(self):
+        items = Item.objects.bulk_create(
+            [
+                Item(product_id=self.product.pk, color='Rojo'),
+                Item(product_id=self.product.pk, color='Azul', price_fake=30000, price_real=60000),
+                Item(product_id=self.product.pk, color='Verde', price_real=70000),
+            ]
+        )
+
+        prices = Item.objects.filter(pk__in=[item.pk for item in items]).order_by('pk')
+        self.assertEqual(
+            list(prices.values_list('price_fake', 'price_real')), [(50000, 50000), (60000, 30000), (70000, 70000)]
+        )
+
+    def test_create_variants(self):
+        self.product.category = self.category
+        self.product.save()
+        sizes = [f'T{number}' for number in range(10)]
+        colors = [f'Color {number}' for number in range(10)]
+        materials = ['algodón', 'lino', 'seda', 'lana', 'cuero', 'lycra', 'poliéster', 'nylon', 'rayón', 'tweed']
+
+        # Un INSERT (varios en SQLite, que limita los parámetros por consulta), facetas y documentos de búsqueda
+        fields = [field for field in Item._meta.concrete_fields if not field.primary_key]
+        inserts = math.ceil(1000 / connection.ops.bulk_batch_size(fields, range(1000)))
+        with self.assertQueryBudget(inserts + 4, label='Crear 1.000 variantes'):
+            variants = self.product.create_variants(sizes=sizes, colors=colors, attrs={'material': materials})
+
+        self.assertEqual(len(variants), 1000)
+        combinations = {(item.size, item.color, item.other_attributes['material']) for item in variants}
+        self.assertEqual(len(combinations), 1000)
+        self.assertEqual(Item.objects.filter(product=self.product, price_real=50000).count(), 1000)
+        self.assertEqual(Item.objects.search('T7 lino').count(), 10)
+        self.assertEqual(category_facets(self.category)['material'][0], ('algodón', 100))
+
+    def test_create_variants_drops_repeated_options(self):
+        attrs = {'material': ['lino', 'seda', 'lino'], 'voltaje': [110, True, 110]}
+        variants = self.product.create_variants(sizes=['M', 'L', 'M'], colors=['Rojo'], attrs=attrs)
+
+        self.assertEqual(
+            [(item.size, item.other_attributes['material'], item.other_attributes['voltaje']) for item in variants],
+            [
+                ('M', 'lino', 110), ('M', 'lino', True), ('M', 'seda', 110), ('M', 'seda', True),
+                ('L', 'lino', 110), ('L', 'lino', True), ('L', 'seda', 110), ('L', 'seda', True),
+            ],
+        )
+
+    def test_budget_failure_lists_repeated_queries(self):
+        Item.objects.create(product=self.product, color='Rojo')
+        Item.objects.create(product=self.product, color='Azul')
+
+        with self.assertRaises(QueryBudgetExceeded) as context, query_budget(1, label='Items con su producto'):
+            [str(item.product) for item in Item.objects.all()]
+
+        message = str(context.exception)
+        self.assertIn('Items con su producto ejecutó 3 consultas, 2 más que su presupuesto de 1.', message)
+        self.assertRegex(message, r'Consultas repetidas:\n  2x SELECT .* = \? LIMIT \?')
+
+
+class CategoryTreeTestCase(TestCase):
+    def setUp(self) -> None:
+        self.electronics = Category.objects.create(code='ELE', name='Electrónica')
+        self.audio = Category.objects.create(code='AUD', name='Audio', parent=self.electronics)
+        self.headphones = Category.objects.create(code='HEA', name='Audífonos', parent=self.audio)
+        self.clothes = Category.objects.create(code='ROP', name='Ropa')
+
+    def test_descendants_and_ancestors_run_in_one_query(self):
+        with self.assertNumQueries(1):
+            descendants = list(self.electronics.get_descendants())
+        with self.assertNumQueries(1):
+            ancestors = list(self.headphones.get_ancestors())
+
+        self.assertEqual(set(descendants), {self.audio, self.headphones})
+        self.assertEqual(ancestors, [self.electronics, self.audio])
+
+    def test_rename_repaths_subtree(self):
+        self.electronics.name = 'Tecnología'
+        self.electronics.save()
+
+        self.headphones.refresh_from_db()
+        self.assertEqual(self.headphones.path, 'Tecnología/Audio/Audífonos')
+
+    def test_move_repaths_subtree(self):
+        audio = Category.objects.get(pk=self.audio.pk)
+        audio.parent = self.clothes
+        audio.save()
+
+        self.headphones.refresh_from_db()
+        self.assertEqual(self.headphones.path, 'Ropa/Audio/Audífonos')
+        self.assertEqual(set(self.clothes.get_descendants()), {self.audio, self.headphones})
+
+    def test_cannot_move_into_own_subtree(self):
+        electronics = Category.objects.get(pk=self.electronics.pk)
+        electronics.parent = self.headphones
+        with self.assertRaises(ValidationError):
+            electronics.save()
+
+    def test_products_in_subtree(self):
+        headphones = Product.objects.create(category=self.headphones, name='Audífonos', price_real=50000)
+        Product.objects.create(category=self.clothes, name='Camisa', price_real=50000)
+
+        with self.assertNumQueries(1):
+            products = list(self.electronics.get_products())
+        self.assertEqual(products, [headphones])
+
+
+class CatalogImportTestCase(TestCase):
+    rows = [
+        {'category_code': 'ele', 'category_name': 'Electrónica', 'product_sku': 'P1', 'product_name': 'Audífonos',
+         'product_price_real': '90000', 'product_price_fake': '', 'item_sku': 'P1-N', 'color': 'Negro'},
+        {'category_code': 'aud', 'category_name': 'Audio', 'category_parent': 'ele', 'product_sku': 'P2',
+         'product_name': 'Parlante', 'product_price_real': '120000', 'product_price_fake': '100000',
+         'item_sku': 'P2-S', 'size': 'S', 'price_real': '130000', 'price_fake': '110000',
+         'other_attributes': {'voltaje': '110'}},
+    ]
+
+    def write_jsonl(self, rows) -> Path:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'catalog.jsonl'
+        path.write_text('\n'.join(json.dumps(row) for row in rows), encoding='utf-8')
+        return path
+
+    def test_import_applies_price_rules(self):
+        result = import_catalog(read_rows(self.write_jsonl(self.rows)), chunk_size=1)
+
+        self.assertEqual((result.rows, result.categories, result.products, result.items), (2, 2, 2, 2))
+        self.assertEqual(Category.objects.get(code='AUD').path, 'Electrónica/Audio')
+        parlante = Product.objects.get(sku='P2')
+        self.assertEqual((parlante.price_fake, parlante.price_real), (120000, 100000))
+        inherited = Item.objects.get(sku='P1-N')
+        self.assertEqual((inherited.price_fake, inherited.price_real), (90000, 90000))
+        swapped = Item.objects.get(sku='P2-S')
+        self.assertEqual((swapped.price_fake, swapped.price_real), (130000, 110000))
+
+    def test_import_upserts_by_sku(self):
+        import_catalog(self.rows)
+        updated = dict(self.rows[0], product_name='Audífonos inalámbricos', color='Blanco')
+        import_catalog([updated])
+
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Item.objects.get(sku='P1-N').color, 'Blanco')
+        self.assertEqual(Product.objects.get(sku='P1').name, 'Audífonos inalámbricos')
+
+
+    def test_import_moves_item_stock_to_its_new_product(self):
+        import_catalog(self.rows)
+        Item.objects.filter(sku='P1-N').update(stock=4)
+        Product.objects.filter(sku='P1').update(stock=4)
+        import_catalog([dict(self.rows[0], product_sku='P2', product_price_real='120000')])
+
+        self.assertEqual(Item.objects.get(sku='P1-N').product.sku, 'P2')
+        self.assertEqual(dict(Product.objects.values_list('sku', 'stock')), {'P1': 0, 'P2': 4})
+
+class CatalogCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.get_cache().clear()
+        cache.stats.reset()
+        self.category = Category.objects.create(code='ELE', name='Electrónica')
+        self.product = Product.objects.create(category=self.category, name='Audífonos', price_real=50000)
+        self.item = Item.objects.create(product=self.product, color='Negro', price_fake=120000, price_real=90000)
+
+    def test_hot_product_page_runs_no_queries(self):
+        url = reverse('products:product_detail', args=[self.product.pk])
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+
+        self.assertEqual(response.json()['items'][0]['discount_percentage'], 0.25)
+        self.assertEqual(cache.stats.snapshot()['hits'], 1)
+
+    def test_evicted_version_does_not_bring_back_old_payloads(self):
+        cache.get_product_payload(self.product.pk)
+        Product.objects.filter(pk=self.product.pk).update(name='Audífonos inalámbricos')
+        cache.invalidate_products([self.product.pk])
+        cache.get_cache().delete(cache._version_key('product', self.product.pk))
+
+        self.assertEqual(cache.get_product_payload(self.product.pk)['name'], 'Audífonos inalámbricos')
+
+    def test_item_save_invalidates_product(self):
+        cache.get_product_payload(self.product.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.color = 'Blanco'
+            self.item.save()
+
+        self.assertEqual(cache.get_product_payload(self.product.pk)['items'][0]['color'], 'Blanco')
+
+    def test_product_save_invalidates_category_subtree(self):
+        parent = Category.objects.create(code='TEC', name='Tecnología')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.parent = parent
+            self.category.save()
+        self.assertEqual(len(cache.get_category_payload(parent.pk)['products']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Audífonos inalámbricos'
+            self.product.save()
+
+        self.assertEqual(cache.get_category_payload(parent.pk)['products'][0]['name'], 'Audífonos inalámbricos')
+
+    def test_product_delete_invalidates_payloads(self):
+        # Sin items: el borrado en cascada de un item también invalidaría el producto
+        product = Product.objects.create(category=self.category, name='Parlante', price_real=70000)
+        cache.get_product_payload(product.pk)
+        cache.get_category_payload(self.category.pk)
+        pk = product.pk
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+
+        with self.assertRaises(Product.DoesNotExist):
+            cache.get_product_payload(pk)
+        self.assertEqual(len(cache.get_category_payload(self.category.pk)['products']), 1)
+
+    def test_bulk_updates_invalidate_payloads(self):
+        cache.get_product_payload(self.product.pk)
+        cache.get_category_payload(self.category.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.filter(pk=self.item.pk).update(color='Rojo')
+        self.assertEqual(cache.get_product_payload(self.product.pk)['items'][0]['color'], 'Rojo')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.filter(pk=self.item.pk).soft_delete()
+        self.assertEqual(cache.get_product_payload(self.product.pk)['items'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).soft_delete()
+        self.assertEqual(cache.get_category_payload(self.category.pk)['products'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).restore()
+        self.assertEqual(len(cache.get_category_payload(self.category.pk)['products']), 1)
+
+    def test_stock_moves_between_variants_invalidate_product(self):
+        from applications.supply.stock import apply_stock_deltas
+
+        other = Item.objects.create(product=self.product, color='Blanco', price_real=90000)
+        apply_stock_deltas({self.item.pk: 3})
+        cache.get_product_payload(self.product.pk)
+
+        # El stock del producto no cambia, el de sus items sí
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_deltas({self.item.pk: -1, other.pk: 1})
+
+        items = cache.get_product_payload(self.product.pk)['items']
+        self.assertEqual([item['stock'] for item in items], [2, 1])
+
+    def test_missing_product_returns_404(self):
+        response = self.client.get(reverse('products:product_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class DiscountQueryTestCase(TestCase):
+    def setUp(self) -> None:
+        self.product = Product.objects.create(name='Test product', price_real=50000)
+        self.half = Item.objects.create(product=self.product, size='S', price_fake=100000, price_real=50000)
+        self.quarter = Item.objects.create(product=self.product, size='M', price_fake=120000, price_real=90000)
+        self.none = Item.objects.create(product=self.product, size='L', price_fake=80000, price_real=80000)
+        self.without_price = Item.objects.create(product=self.product, size='XL')
+        Item.objects.filter(pk=self.without_price.pk).update(price_fake=None, price_real=None)
+
+    def test_annotation_matches_property(self):
+        for item in Item.objects.with_discount():
+            self.assertAlmostEqual(item.discount, float(item.discount_percentage))
+
+    def test_filter_and_sort_in_sql(self):
+        self.assertEqual(list(Item.objects.min_discount(0.3)), [self.half])
+        self.assertEqual(list(Item.objects.by_discount())[:2], [self.half, self.quarter])
+        self.assertEqual(Product.objects.with_discount().get().discount, 0)
+
+
+class OrderingIndexTestCase(IndexUsageMixin, TestCase):
+    def test_default_ordering_uses_composite_index(self):
+        self.assertUsesIndex(Product.objects.all()[:20], 'product_ordering_idx')
+        self.assertUsesIndex(Item.objects.all()[:20], 'item_ordering_idx')
+
+    def test_variants_of_product_use_composite_index(self):
+        self.assertUsesIndex(Item.objects.filter(product_id=1), 'item_ordering_idx')
+
+    @skipUnless(connection.vendor == 'postgresql', 'Índices funcionales creados solo en PostgreSQL')
+    def test_admin_name_prefix_search_uses_functional_index(self):
+        self.assertUsesIndex(Category.objects.filter(name__istartswith='hog'), 'category_name_upper_idx')
+        self.assertUsesIndex(Product.objects.filter(name__istartswith='lám'), 'product_name_upper_idx')
+
+
+class ItemAdminTestCase(QueryBudgetMixin, TestCase):
+    def test_changelist_search_and_autocomplete(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', password='secret'))
+        product = Product.objects.create(name='Audífonos', sku='AUD-1', price_real=50000)
+        Item.objects.create(product=product, sku='AUD-1-N', color='Negro')
+
+        response = self.client.get(reverse('admin:products_item_changelist'), {'q': 'AUD-1-N'})
+        self.assertContains(response, 'Audífonos')
+        response = self.client.get(
+            reverse('admin:autocomplete'),
+            {'term': 'Aud', 'app_label': 'products', 'model_name': 'item', 'field_name': 'product'},
+        )
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_changelists_query_budget(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', password='secret'))
+        category = Category.objects.create(code='hog', name='Hogar')
+        for number in range(10):
+            product = Product.objects.create(category=category, name=f'Producto {number}', price_real=10000)
+            Item.objects.create(product=product, color='Negro')
+
+        for model in ('item', 'product'):
+            with self.assertQueryBudget(4, label=f'Changelist de {model}'):
+                self.assertEqual(self.client.get(reverse(f'admin:products_{model}_changelist')).status_code, 200)
+
+    def test_autocomplete_query_budget(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', password='secret'))
+        category = Category.objects.create(code='hog', name='Hogar')
+        fields = {
+            'item': {'app_label': 'supply', 'model_name': 'supplyorderdetail', 'field_name': 'item'},
+            'product': {'app_label': 'products', 'model_name': 'item', 'field_name': 'product'},
+        }
+        for rows in (2, 12):
+            for number in range(rows - Product.objects.count()):
+                product = Product.objects.create(category=category, name=f'Lámpara {number}', price_real=10000)
+                Item.objects.create(product=product, color='Negro')
+            for model, params in fields.items():
+                with self.assertQueryBudget(4, label=f'Autocompletado de {model} con {rows} resultados'):
+                    response = self.client.get(reverse('admin:autocomplete'), {'term': '', **params})
+                self.assertEqual(len(response.json()['results']), rows)
+
+
+class ItemSearchTestCase(TestCase):
+    def setUp(self) -> None:
+        self.audio = Category.objects.create(code='AUD', name='Audio')
+        self.headphones = Product.objects.create(
+            category=self.audio, name='Audífonos inalámbricos', sku='AUD-1', price_real=90000
+        )
+        self.black = Item.objects.create(
+            product=self.headphones, sku='AUD-1-N', color='Negro', other_attributes={'conexion': 'bluetooth'}
+        )
+        self.white = Item.objects.create(product=self.headphones, sku='AUD-1-B', color='Blanco')
+        self.shirt = Item.objects.create(
+            product=Product.objects.create(name='Camiseta', sku='ROP-1', price_real=40000), sku='ROP-1-M', size='M'
+        )
+
+    def test_search_by_product_variant_and_attributes(self):
+        self.assertEqual(list(Item.objects.search('audífonos')), [self.black, self.white])
+        self.assertEqual(list(Item.objects.search('audífonos negro')), [self.black])
+        self.assertEqual(list(Item.objects.search('bluetooth')), [self.black])
+        self.assertEqual(list(Item.objects.search('audio')), [self.black, self.white])
+        self.assertEqual(list(Item.objects.search('   ')), [])
+        self.assertEqual(list(Product.objects.search('camiseta')), [self.shirt.product])
+
+    def test_documents_follow_product_and_category_changes(self):
+        self.headphones.name = 'Auriculares'
+        self.headphones.save()
+        self.audio.name = 'Sonido'
+        self.audio.save()
+
+        self.assertEqual(list(Item.objects.search('auriculares sonido')), [self.black, self.white])
+        self.assertFalse(Item.objects.search('audio').exists())
+
+    def test_documents_refresh_only_when_their_fields_change(self):
+        def refreshes(instance):
+            with CaptureQueriesContext(connection) as context:
+                instance.save()
+            return sum('search_document' in query['sql'] for query in context.captured_queries)
+
+        product = Product.objects.get(pk=self.headphones.pk)
+        item = Item.objects.get(pk=self.black.pk)
+        product.price_real = 95000
+        self.assertEqual(refreshes(product), 0)
+        item.price_real = 80000
+        self.assertEqual(refreshes(item), 0)
+
+        product.description = 'Cancelación de ruido'
+        self.assertEqual(refreshes(product), 1)
+        item.other_attributes['conexion'] = 'cable'
+        self.assertEqual(refreshes(item), 1)
+
+        self.assertEqual(list(Item.objects.search('ruido cable')), [self.black])
+        self.assertEqual(list(Item.objects.search('ruido')), [self.black, self.white])
+
+        # Un item cargado antes del cambio no escribe de vuelta su documento viejo
+        stale = Item.objects.get(pk=self.white.pk)
+        product.name = 'Cascos'
+        product.save()
+        stale.price_real = 70000
+        stale.save()
+        self.assertEqual(list(Item.objects.search('cascos')), [self.black, self.white])
+
+    def test_rebuild_search_index(self):
+        Item.objects.update(search_document='')
+        call_command('rebuild_search_index', '--batch-size', '2', stdout=StringIO())
+
+        self.assertEqual(list(Item.objects.search('rop-1-m')), [self.shirt])
+
+
+class AttributeFacetTestCase(TestCase):
+    def setUp(self) -> None:
+        self.clothes = Category.objects.create(code='ROP', name='Ropa')
+        self.shirts = Category.objects.create(code='CAM', name='Camisetas', parent=self.clothes)
+        self.shirt = Product.objects.create(category=self.shirts, name='Camiseta', price_real=40000)
+        self.cotton = Item.objects.create(
+            product=self.shirt, size='M', other_attributes={'material': 'algodón', 'manga': 'corta', 'gramaje': 180}
+        )
+        self.linen = Item.objects.create(product=self.shirt, size='L', other_attributes={'material': 'lino'})
+
+    def test_filter_by_attributes(self):
+        self.assertEqual(list(Item.objects.with_attributes(material='algodón')), [self.cotton])
+        self.assertEqual(list(Item.objects.with_attributes(material=['algodón', 'lino'])), [self.linen, self.cotton])
+        self.assertFalse(Item.objects.with_attributes(material='lino', manga='corta').exists())
+        self.assertEqual(list(Item.objects.with_attributes(gramaje=180)), [self.cotton])
+        self.assertFalse(Item.objects.with_attributes(gramaje='180').exists())
+        Product.objects.filter(pk=self.shirt.pk).update(purchase_urls={'tienda': 'https://tienda.test/camiseta'})
+        self.assertEqual(list(Product.objects.with_purchase_urls(tienda='https://tienda.test/camiseta')), [self.shirt])
+
+    def test_counts_follow_item_changes(self):
+        self.assertEqual(
+            category_facets(self.clothes),
+            {'gramaje': [(180, 1)], 'manga': [('corta', 1)], 'material': [('algodón', 1), ('lino', 1)]},
+        )
+
+        self.linen.other_attributes = {'material': 'algodón'}
+        self.linen.save()
+        Item.objects.filter(pk=self.cotton.pk).soft_delete()
+        self.assertEqual(category_facets(self.shirts), {'material': [('algodón', 1)]})
+
+        Item.objects.restore()
+        self.linen.delete()
+        self.assertEqual(
+            category_facets(self.shirts),
+            {'gramaje': [(180, 1)], 'manga': [('corta', 1)], 'material': [('algodón', 1)]},
+        )
+
+    def test_counts_follow_product_category(self):
+        accessories = Category.objects.create(code='ACC', name='Accesorios')
+        self.shirt.category = accessories
+        self.shirt.save()
+
+        self.assertEqual(category_facets(self.clothes), {})
+        self.assertEqual(category_facets(accessories)['material'], [('algodón', 1), ('lino', 1)])
+
+    def test_counts_follow_product_soft_delete(self):
+        Product.objects.filter(pk=self.shirt.pk).soft_delete()
+        self.assertEqual(category_facets(self.clothes), {})
+
+        # Los items de un producto borrado no cuentan al borrarlos o restaurarlos
+        Item.objects.filter(pk=self.linen.pk).soft_delete()
+        Item.objects.restore()
+        self.assertEqual(category_facets(self.clothes), {})
+
+        Product.objects.restore()
+        expected = sorted(CategoryFacet.objects.filter(count__gt=0).values_list('category', 'key', 'value', 'count'))
+        self.assertEqual(category_facets(self.clothes)['material'], [('algodón', 1), ('lino', 1)])
+
+        Product.objects.filter(pk=self.shirt.pk).soft_delete()
+        call_command('rebuild_facets', stdout=StringIO())
+        self.assertEqual(category_facets(self.clothes), {})
+        Product.objects.restore()
+        self.assertEqual(sorted(CategoryFacet.objects.values_list('category', 'key', 'value', 'count')), expected)
+
+    def test_integral_floats_count_as_the_same_value(self):
+        # jsonb no distingue 180 de 180.0: ambos deltas van a la misma faceta
+        Item.objects.bulk_create(
+            [
+                Item(product=self.shirt, size='S', other_attributes={'gramaje': 180.0}),
+                Item(product=self.shirt, size='XL', other_attributes={'gramaje': 180}),
+            ]
+        )
+        self.assertEqual(category_facets(self.shirts)['gramaje'], [(180, 3)])
+
+        call_command('rebuild_facets', stdout=StringIO())
+        self.assertEqual(category_facets(self.shirts)['gramaje'], [(180, 3)])
+
+    def test_reading_facets_runs_one_query(self):
+        with self.assertNumQueries(1):
+            category_facets(self.clothes)
+
+        response = self.client.get(reverse('products:category_facets', args=[self.clothes.pk]))
+        self.assertEqual(
+            response.json()['facets']['material'], [{'value': 'algodón', 'count': 1}, {'value': 'lino', 'count': 1}]
+        )
+
+    def test_rebuild_matches_incremental_counts(self):
+        expected = sorted(CategoryFacet.objects.filter(count__gt=0).values_list('category', 'key', 'value', 'count'))
+        CategoryFacet.objects.all().delete()
+        call_command('rebuild_facets', stdout=StringIO())
+
+        self.assertEqual(sorted(CategoryFacet.objects.values_list('category', 'key', 'value', 'count')), expected)
+
+
+class CatalogListingTestCase(TestCase):
+    def setUp(self) -> None:
+        self.clothes = Category.objects.create(code='ROP', name='Ropa')
+        self.shirts = Category.objects.create(code='CAM', name='Camisetas', parent=self.clothes)
+        self.shoes = Category.objects.create(code='ZAP', name='Zapatos')
+        self.shirt = Product.objects.create(category=self.shirts, name='Camiseta', price_real=40000)
+        self.boot = Product.objects.create(category=self.shoes, name='Bota', price_real=150000)
+        # Tallas y colores vacíos a propósito: el cursor debe ordenar los NULL igual en toda base de datos
+        self.items = [
+            Item.objects.create(product=self.shirt, size=size, color=color, price_real=price)
+            for size, color, price in [
+                ('M', 'Negro', 40000), ('M', None, 40000), (None, 'Negro', 45000), ('L', 'Blanco', None),
+                ('M', 'Negro', 42000), (None, None, None),
+            ]
+        ]
+        self.items.append(Item.objects.create(product=self.boot, size='40', color='Café'))
+        Item.objects.filter(pk=self.items[0].pk).update(stock=3)
+        Product.objects.filter(pk=self.shirt.pk).update(stock=3)
+
+    def walk(self, url, params):
+        pages, ids = 0, []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            payload = response.json()
+            ids += [row['id'] for row in payload['results']]
+            url, params, pages = payload['next'], None, pages + 1
+        return pages, ids
+
+    def test_pages_follow_default_ordering(self):
+        pages, ids = self.walk(reverse('products:item_list'), {'limit': 2})
+
+        self.assertEqual(pages, 4)
+        ordering = KeysetPaginator(Item.objects.all(), per_page=2)._order_by()
+        self.assertEqual(ids, list(Item.objects.order_by(*ordering).values_list('pk', flat=True)))
+        self.assertEqual(len(set(ids)), len(self.items))
+
+    def test_deep_pages_cost_the_same(self):
+        params = {'category': self.clothes.pk, 'limit': 1}
+        with self.assertNumQueries(2):
+            first = self.client.get(reverse('products:item_list'), params).json()
+        with self.assertNumQueries(2):
+            self.client.get(first['next'])
+
+    def test_filters(self):
+        def ids(url, **params):
+            return {row['id'] for row in self.client.get(url, params).json()['results']}
+
+        items_url, products_url = reverse('products:item_list'), reverse('products:product_list')
+        self.assertEqual(ids(items_url, category=self.clothes.pk), {item.pk for item in self.items[:6]})
+        self.assertEqual(ids(items_url, color='Negro', size='M'), {self.items[0].pk, self.items[4].pk})
+        self.assertEqual(ids(items_url, min_price=41000, max_price=45000), {self.items[2].pk, self.items[4].pk})
+        self.assertEqual(ids(items_url, in_stock=1), {self.items[0].pk})
+        self.assertEqual(ids(products_url, color='Café'), {self.boot.pk})
+        self.assertEqual(ids(products_url, in_stock=1), {self.shirt.pk})
+        self.assertEqual(self.client.get(items_url, {'cursor': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(items_url, {'category': 999}).status_code, 404)
+
+    def test_conditional_get(self):
+        url = reverse('products:product_list')
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.boot.name = 'Bota de cuero'
+        self.boot.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class AsyncReadPathTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.get_cache().clear()
+        self.product = Product.objects.create(name='Audífonos inalámbricos', price_real=90000)
+        self.items = [Item.objects.create(product=self.product, color=color) for color in ('Negro', 'Blanco', 'Rojo')]
+
+    async def test_product_detail_shares_the_sync_cache(self):
+        response = await self.async_client.get(reverse('products:product_detail', args=[self.product.pk]))
+
+        self.assertEqual([item['color'] for item in response.json()['items']], ['Negro', 'Blanco', 'Rojo'])
+        self.assertEqual(await cache.aget_product_payload(self.product.pk), response.json())
+        missing = await self.async_client.get(reverse('products:product_detail', args=[0]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_search_counts_and_limits(self):
+        response = await self.async_client.get(reverse('products:search'), {'q': 'audífonos', 'limit': 2})
+
+        payload = response.json()
+        self.assertEqual(payload['count'], 3)
+        self.assertEqual([row['id'] for row in payload['results']], [item.pk for item in self.items[:2]])
+
+
+@skipUnless('replica' in settings.DATABASES, 'Requiere la réplica de skuhub.settings.test')
+class ReplicaRoutingTestCase(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self) -> None:
+        cache.get_cache().clear()
+        self.product = Product.objects.create(name='Lámpara de escritorio', price_real=120000)
+        Item.objects.create(product=self.product, color='Blanco')
+
+    def test_catalog_reads_go_to_the_replica(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            product = Product.objects.get(pk=self.product.pk)
+            response = self.client.get(reverse('products:item_list'))
+
+        self.assertEqual(product._state.db, 'replica')
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertTrue(replica.captured_queries)
+        self.assertEqual(get_user_model().objects.all().db, 'default')
+
+    def test_writes_and_transactions_use_the_primary(self):
+        product = Product.objects.get(pk=self.product.pk)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            product.name = 'Lámpara de pie'
+            product.save()
+            with transaction.atomic():
+                self.assertEqual(Product.objects.get(pk=product.pk)._state.db, 'default')
+            cache.get_product_payload(product.pk)
+
+        self.assertEqual(product._state.db, 'default')
+        self.assertEqual(replica.captured_queries, [])
+        self.assertFalse(router.allow_migrate('replica', 'products'))
+
+    def test_category_save_reads_the_parent_path_from_the_primary(self):
+        parent = Category.objects.create(code='ILU', name='Iluminación')
+        with CaptureQueriesContext(connections['replica']) as replica:
+            category = Category(code='LAM', name='Lámparas', parent_id=parent.pk)
+            category.save()
+
+        self.assertEqual(replica.captured_queries, [])
+        self.assertEqual(category.path, f'Iluminación{PATH_SEPARATOR}Lámparas')
+
+
+class QueryInstrumentationTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.get_cache().clear()
+        self.product = Product.objects.create(name='Termo de acero', price_real=60000)
+        Item.objects.create(product=self.product, color='Gris')
+
+    def test_reports_queries_in_header_and_log(self):
+        with self.assertLogs('applications.utils.middleware', 'INFO') as logs:
+            response = self.client.get(reverse('products:item_list'))
+
+        self.assertRegex(response['Server-Timing'], r'^db;desc="[1-9]\d* queries";dur=[\d.]+, total;dur=[\d.]+$')
+        record = logs.records[0]
+        self.assertEqual((record.path, record.status), (reverse('products:item_list'), 200))
+        self.assertGreater(record.queries, 0)
+        self.assertLessEqual(len(record.slowest_queries), record.queries)
+
+    async def test_records_async_views(self):
+        response = await self.async_client.get(reverse('products:product_detail', args=[self.product.pk]))
+
+        self.assertRegex(response['Server-Timing'], r'^db;desc="[1-9]\d* queries"')
+
+    def test_thresholds(self):
+        url = reverse('products:item_list')
+        with override_settings(QUERY_COUNT_THRESHOLD=0, QUERY_THRESHOLD_ACTION='raise'):
+            with self.assertRaisesMessage(QueryThresholdExceeded, 'Consultas más lentas'), self.assertLogs(
+                'applications.utils.middleware', 'WARNING'
+            ):
+                self.client.get(url)
+        with override_settings(QUERY_COUNT_THRESHOLD=0, QUERY_THRESHOLD_ACTION='warn'):
+            with self.assertWarns(QueryThresholdWarning), self.assertLogs('applications.utils.middleware', 'WARNING'):
+                self.client.get(url)
+
+    @override_settings(QUERY_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('products:item_list')))
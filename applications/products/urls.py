@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'products'
+
+urlpatterns = [
+    path('products/', views.product_list, name='product_list'),
+    path('products/<int:pk>/', views.product_detail, name='product_detail'),
+    path('items/', views.item_list, name='item_list'),
+    path('search/', views.search, name='search'),
+    path('categories/<int:pk>/', views.category_detail, name='category_detail'),
+    path('categories/<int:pk>/facets/', views.category_facet_counts, name='category_facets'),
+    path('export/items.<str:file_format>', views.export_items, name='export_items'),
+]
@@ -1,3 +1,103 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 
-# Create your views here.
+from applications.utils.exports import RENDERERS, streaming_export_response
+from applications.utils.pagination import InvalidCursor
+
+from .cache import aget_product_payload, get_category_payload
+from .exports import ITEM_EXPORT_COLUMNS, item_export_queryset
+from .facets import category_facets
+from .listing import (
+    ITEM_LISTING_FIELDS,
+    ListingError,
+    item_listing,
+    item_row,
+    listing_etag,
+    page_size,
+    product_listing,
+    product_row,
+)
+from .models import Category, Item
+
+
+async def product_detail(request, pk):
+    try:
+        return JsonResponse(await aget_product_payload(pk))
+    except ObjectDoesNotExist:
+        raise Http404
+
+
+def category_detail(request, pk):
+    try:
+        return JsonResponse(get_category_payload(pk))
+    except ObjectDoesNotExist:
+        raise Http404
+
+
+def category_facet_counts(request, pk):
+    category = get_object_or_404(Category.objects.only('pk', 'path'), pk=pk)
+    facets = category_facets(category)
+    return JsonResponse(
+        {
+            'category': category.pk,
+            'facets': {
+                key: [{'value': value, 'count': count} for value, count in values] for key, values in facets.items()
+            },
+        }
+    )
+
+
+def _listing_response(request, listing, serialize):
+    try:
+        page = listing(request.GET)
+    except (ListingError, InvalidCursor) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    except Category.DoesNotExist:
+        raise Http404
+
+    etag = listing_etag(page.object_list, request.GET.urlencode())
+    # 304 sin serializar la página si el cliente ya la tiene
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    next_url = None
+    if page.has_next:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        next_url = f'{request.path}?{params.urlencode()}'
+    response = JsonResponse({'results': [serialize(row) for row in page.object_list], 'next': next_url})
+    response['ETag'] = etag
+    return response
+
+
+def product_list(request):
+    return _listing_response(request, product_listing, product_row)
+
+
+def item_list(request):
+    return _listing_response(request, item_listing, item_row)
+
+
+async def search(request):
+    query = request.GET.get('q', '')
+    try:
+        limit = page_size(request.GET)
+    except ListingError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    items = Item.objects.alive().search(query).select_related('product').only(*ITEM_LISTING_FIELDS)
+    count = await items.acount()
+    rows = await items[:limit].alist()
+    return JsonResponse(
+        {'query': query, 'count': count, 'results': [{**item_row(item), 'rank': item.rank} for item in rows]}
+    )
+
+
+@staff_member_required
+def export_items(request, file_format):
+    if file_format not in RENDERERS:
+        raise Http404
+    return streaming_export_response(item_export_queryset(), ITEM_EXPORT_COLUMNS, file_format, 'items')
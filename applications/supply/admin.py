@@ -1,10 +1,88 @@
 from django.contrib import admin
 
+from applications.utils.pagination import EstimatedCountPaginator
+
 from . import models
 
+
 # Register your models here.
-admin.site.register(models.SupplyPaymentMethod)
-admin.site.register(models.Supplier)
-admin.site.register(models.SupplyOrder)
-admin.site.register(models.SupplyOrderDetail)
-admin.site.register(models.Inventory)
+@admin.register(models.SupplyPaymentMethod)
+class SupplyPaymentMethodAdmin(admin.ModelAdmin):
+    list_display = ('name', 'type')
+
+
+@admin.register(models.Supplier)
+class SupplierAdmin(admin.ModelAdmin):
+    list_display = ('name', 'main_url')
+    # name__istartswith usa el índice funcional UPPER(name) de PostgreSQL (migración 0013)
+    search_fields = ('name__istartswith',)
+
+
+@admin.register(models.SupplyOrder)
+class SupplyOrderAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'supplier', 'order_date', 'state', 'sub_total', 'total')
+    list_select_related = ('supplier',)
+    list_filter = ('state',)
+    search_fields = ('pk__exact',)
+    autocomplete_fields = ('supplier',)
+    raw_id_fields = ('payment_method',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+@admin.register(models.SupplyOrderDetail)
+class SupplyOrderDetailAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'order', 'item', 'quantity', 'unit_cost', 'total')
+    list_select_related = ('order', 'item__product__category')
+    autocomplete_fields = ('item',)
+    raw_id_fields = ('order',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+@admin.register(models.Inventory)
+class InventoryAdmin(admin.ModelAdmin):
+    list_display = (
+        'batch_code', 'item', 'state', 'entries', 'exits', 'stock', 'reserved', 'unit_cost', 'last_entry_at'
+    )
+    list_select_related = ('item__product__category',)
+    list_filter = ('state',)
+    search_fields = ('batch_code__startswith',)
+    autocomplete_fields = ('item',)
+    raw_id_fields = ('supply_order_detail',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_search_results(self, request, queryset, search_term):
+        # Los códigos de lote se guardan en mayúsculas: la búsqueda sensible a mayúsculas usa el índice único
+        return super().get_search_results(request, queryset, search_term.upper())
+
+
+@admin.register(models.Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('cart_key', 'inventory', 'quantity', 'expires_at')
+    list_select_related = ('inventory',)
+    search_fields = ('cart_key__exact',)
+    raw_id_fields = ('inventory',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+@admin.register(models.InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    list_display = ('moved_at', 'kind', 'quantity', 'inventory', 'item')
+    list_select_related = ('inventory', 'item__product__category')
+    list_filter = ('kind', 'period')
+    raw_id_fields = ('inventory', 'item')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+@admin.register(models.StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('day', 'item', 'entries', 'exits', 'on_hand')
+    list_select_related = ('item__product__category',)
+    list_filter = ('day',)
+    raw_id_fields = ('item',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
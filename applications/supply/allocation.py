@@ -0,0 +1,230 @@
+"""Stock allocation: turns checkout quantities into Inventory exits.
+
+Batches are picked by a policy (FIFO by default) and locked with ``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent
+checkouts of the same item take different batches instead of queueing behind each other. Only as many rows as the
+quantity can need are locked, and every picked batch is written with a single UPDATE.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import router, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from applications.utils.expressions import case_by_pk
+
+from .ledger import append_movements, movement
+from .models import Inventory
+from .stock import RESERVED_STATE, SELLABLE_STATES, apply_stock_deltas, sellable_expression
+
+# Estado de un lote que se quedó sin unidades
+EXHAUSTED_STATE = 'SLD'
+
+# Máximo de lotes bloqueados por consulta
+ALLOCATION_BATCH_SIZE = 20
+
+# Políticas de salida: orden en que se consumen los lotes de un item
+POLICIES = {
+    'fifo': ('last_entry_at', 'pk'),
+    'lifo': ('-last_entry_at', '-pk'),
+    'fefo': (F('expires_at').asc(nulls_last=True), 'last_entry_at', 'pk'),
+}
+
+
+class InsufficientStock(Exception):
+    """Raised when an item does not have enough unlocked sellable units for an allocation."""
+
+    def __init__(self, item_id, requested, available):
+        self.item_id = item_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f'El item {item_id} solo tiene {available} de {requested} unidades disponibles.')
+
+
+@dataclass
+class AllocationLine:
+    inventory_id: int
+    item_id: int
+    quantity: int
+    unit_cost: Decimal
+
+    @property
+    def cost(self) -> Decimal:
+        return self.quantity * self.unit_cost
+
+
+@dataclass
+class Allocation:
+    """Batches consumed by an allocation.
+
+    Attributes
+    ----------
+    lines : list of AllocationLine
+        Units taken from each Inventory batch, in policy order.
+    """
+
+    lines: list = field(default_factory=list)
+
+    @property
+    def quantity(self) -> int:
+        return sum(line.quantity for line in self.lines)
+
+    @property
+    def cost(self) -> Decimal:
+        """Cost of goods of the allocated units."""
+        return sum((line.cost for line in self.lines), Decimal(0))
+
+
+def _ordering(policy):
+    if isinstance(policy, str):
+        try:
+            return POLICIES[policy]
+        except KeyError:
+            raise ValueError(f'Política de asignación desconocida: "{policy}".') from None
+    return tuple(policy)
+
+
+def allocatable(item_id, using=None):
+    """Alive, sellable batches of ``item_id`` with units not held by reservations, annotated with ``available``."""
+    queryset = Inventory.objects.db_manager(using).alive().filter(item_id=item_id, state__in=SELLABLE_STATES)
+    return queryset.annotate(available=sellable_expression()).filter(available__gt=0)
+
+
+def lock_batches(item_id, quantity, policy='fifo', using=None, batch_size=ALLOCATION_BATCH_SIZE) -> list:
+    """Lock, in policy order, the batches needed to cover ``quantity`` units of ``item_id``.
+
+    Rows locked by other transactions are skipped. The first query locks a single row, which covers most checkouts;
+    each further round doubles the limit (up to ``batch_size``) so large quantities still need few queries. Must run
+    inside a transaction.
+
+    Returns
+    -------
+    list of tuple
+        ``(inventory_id, units, unit_cost)`` for the locked batches. Their units may add up to less than
+        ``quantity`` when there is not enough free stock.
+    """
+    ordering = _ordering(policy)
+    batches = []
+    remaining = quantity
+    limit = 1
+    while remaining > 0:
+        limit = min(limit, remaining, batch_size)
+        queryset = allocatable(item_id, using).exclude(pk__in=[row[0] for row in batches]).order_by(*ordering)
+        queryset = queryset.select_for_update(skip_locked=True, of=('self',))
+        rows = list(queryset.values_list('pk', 'available', 'unit_cost')[:limit])
+        for row in rows:
+            if remaining <= 0:
+                break
+            batches.append(row)
+            remaining -= row[1]
+        if len(rows) < limit:
+            # No quedan más lotes libres
+            break
+        limit *= 2
+    return batches
+
+
+def pick_batches(quantities, policy='fifo', using=None) -> list:
+    """Lock the batches that cover ``quantities`` and split the units among them.
+
+    Items are locked in id order so concurrent multi-item checkouts cannot deadlock. Must run inside a transaction.
+
+    Parameters
+    ----------
+    quantities : dict
+        Item id to number of units.
+
+    Returns
+    -------
+    list of AllocationLine
+        Units to take from each batch, in policy order.
+
+    Raises
+    ------
+    InsufficientStock
+        If any item cannot be fully covered.
+    """
+    lines = []
+    for item_id in sorted(quantities):
+        remaining = quantities[item_id]
+        if remaining <= 0:
+            continue
+        for inventory_id, units, unit_cost in lock_batches(item_id, remaining, policy, using):
+            taken = min(units, remaining)
+            lines.append(AllocationLine(inventory_id, item_id, taken, unit_cost))
+            remaining -= taken
+        if remaining > 0:
+            raise InsufficientStock(item_id, quantities[item_id], quantities[item_id] - remaining)
+    return lines
+
+
+def item_quantities(quantities) -> Counter:
+    requested = Counter()
+    for item, quantity in quantities.items():
+        requested[getattr(item, 'pk', item)] += quantity
+    return requested
+
+
+def allocate_items(quantities, policy='fifo', using=None, exited_at=None) -> Allocation:
+    """Allocate several items at once, e.g. a whole cart, in a single transaction.
+
+    Units held by reservations are never taken. All picked batches are written with one UPDATE and the stock roll-up
+    with one ``apply_stock_deltas`` call, issued last to keep the Item and Product rows locked as briefly as possible.
+
+    Parameters
+    ----------
+    quantities : dict
+        Item (or item id) to number of units.
+    policy : str or sequence, optional
+        Name in ``POLICIES`` or an explicit ``order_by`` sequence.
+    using : str, optional
+        Database alias, defaults to the router's write database for Inventory.
+    exited_at : datetime, optional
+        Exit timestamp of the batches, defaults to now.
+
+    Returns
+    -------
+    Allocation
+        Consumed batches and their cost of goods.
+
+    Raises
+    ------
+    InsufficientStock
+        If any item cannot be fully covered. Nothing is written in that case.
+    """
+    using = using or router.db_for_write(Inventory)
+    requested = item_quantities(quantities)
+    with transaction.atomic(using=using):
+        allocation = Allocation(pick_batches(requested, policy, using))
+        if not allocation.lines:
+            return allocation
+
+        taken = case_by_pk({line.inventory_id: line.quantity for line in allocation.lines})
+        exited_at = exited_at or timezone.now()
+        Inventory.objects.using(using).filter(pk__in=[line.inventory_id for line in allocation.lines]).update(
+            exits=F('exits') + taken,
+            stock=F('stock') - taken,
+            state=Case(
+                When(stock=taken, then=Value(EXHAUSTED_STATE)),
+                # Lo que queda del lote está todo reservado
+                When(stock=F('reserved') + taken, then=Value(RESERVED_STATE)),
+                default=F('state'),
+            ),
+            last_exit_at=exited_at,
+            _updated_at=timezone.now(),
+        )
+        append_movements(
+            (movement(line.inventory_id, line.item_id, -line.quantity, 'OUT', exited_at) for line in allocation.lines),
+            using,
+        )
+        apply_stock_deltas({item_id: -quantity for item_id, quantity in requested.items() if quantity > 0}, using)
+    return allocation
+
+
+def allocate(item, quantity, policy='fifo', using=None, exited_at=None) -> Allocation:
+    """Take ``quantity`` units of ``item`` out of inventory following ``policy``.
+
+    See ``allocate_items`` for the parameters and errors.
+    """
+    return allocate_items({item: quantity}, policy=policy, using=using, exited_at=exited_at)
@@ -16,3 +16,10 @@ INVENTORY_STATE = [
     ('SLD', 'Sold'),
     ('NFS', 'Not for Sale'),
 ]
+
+# Inventory movement kinds
+MOVEMENT_KINDS = [
+    ('IN', 'Entrada'),
+    ('OUT', 'Salida'),
+    ('ADJ', 'Ajuste'),
+]
@@ -0,0 +1,22 @@
+from .models import Inventory
+
+INVENTORY_EXPORT_COLUMNS = [
+    ('id', 'pk'),
+    ('batch_code', 'batch_code'),
+    ('item_id', 'item_id'),
+    ('item_sku', 'item__sku'),
+    ('product', 'item__product__name'),
+    ('category', 'item__product__category__path'),
+    ('supply_order_id', 'supply_order_detail__order_id'),
+    ('entries', 'entries'),
+    ('exits', 'exits'),
+    ('stock', 'stock'),
+    ('unit_cost', 'unit_cost'),
+    ('state', 'state'),
+    ('last_entry_at', 'last_entry_at'),
+    ('last_exit_at', 'last_exit_at'),
+]
+
+
+def inventory_export_queryset():
+    return Inventory.objects.alive().order_by('pk')
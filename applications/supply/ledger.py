@@ -0,0 +1,164 @@
+"""Inventory movement ledger and daily stock snapshots.
+
+Every entry, exit and adjustment of units is appended to ``InventoryMovement``. A nightly job rolls each day of the
+ledger up into ``StockSnapshot`` rows (one per item and day with movements), and reports read those rows instead of
+replaying the ledger::
+
+    stock_on_hand(date(2024, 3, 31))                      # units per item at the end of a day
+    movement_report(date(2024, 1, 1), date(2024, 3, 31))  # entries and exits per item and week
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import router, transaction
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from applications.products.models import Item
+
+from .models import InventoryMovement, StockSnapshot
+
+REPORT_BUCKETS = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def month_of(moment):
+    """First day of the (local) month of ``moment``, the ``period`` of a movement."""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def movement(inventory_id, item_id, quantity, kind, moved_at) -> InventoryMovement:
+    """Unsaved ledger row with its ``period`` filled in."""
+    return InventoryMovement(
+        inventory_id=inventory_id,
+        item_id=item_id,
+        kind=kind,
+        quantity=quantity,
+        moved_at=moved_at,
+        period=month_of(moved_at),
+    )
+
+
+def append_movements(movements, using=None) -> list:
+    """Append ledger rows with one INSERT per ``batch_size`` rows, filling in ``period`` where missing."""
+    movements = list(movements)
+    for row in movements:
+        if row.period is None:
+            row.period = month_of(row.moved_at)
+    if not movements:
+        return movements
+    using = using or router.db_for_write(InventoryMovement)
+    return InventoryMovement.objects.using(using).bulk_create(movements, batch_size=1000)
+
+
+def append_adjustments(changes, kind='ADJ', moved_at=None, using=None) -> list:
+    """Append one ``kind`` movement per ``(inventory_id, item_id, quantity)`` change, skipping zero quantities.
+
+    Used for the changes to a batch that are neither receipts nor exits; ``moved_at`` defaults to now.
+    """
+    moved_at = moved_at or timezone.now()
+    return append_movements((movement(*change, kind, moved_at) for change in changes if change[2]), using)
+
+
+def _day_bounds(day) -> tuple:
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _signed_sum(condition):
+    return Coalesce(
+        Sum(Case(When(condition, then='quantity'), default=Value(0), output_field=IntegerField())), Value(0)
+    )
+
+
+def build_stock_snapshots(day, using=None) -> int:
+    """Roll the movements of ``day`` up into one StockSnapshot per item, upserting existing rows.
+
+    The ledger is read with one grouped query restricted to the ``period`` of the day, opening balances come
+    from the previous snapshots in one more query, and the rows are upserted with one ``bulk_create``. Days must be
+    built in order (a rebuilt day does not update the balances of later days).
+
+    Returns
+    -------
+    int
+        Number of snapshots written.
+    """
+    using = using or router.db_for_write(StockSnapshot)
+    start, end = _day_bounds(day)
+    moved = (
+        InventoryMovement.objects.using(using)
+        .filter(period=month_of(start), moved_at__gte=start, moved_at__lt=end)
+        .order_by()
+        .values('item')
+        .annotate(entries=_signed_sum(Q(quantity__gt=0)), exits=_signed_sum(Q(quantity__lt=0)))
+    )
+    moved = {row['item']: row for row in moved}
+    if not moved:
+        return 0
+
+    previous = StockSnapshot.objects.filter(item=OuterRef('pk'), day__lt=day).order_by('-day').values('on_hand')[:1]
+    opening = Item.objects.using(using).filter(pk__in=moved).annotate(
+        opening=Coalesce(Subquery(previous), Value(0))
+    )
+    opening = dict(opening.values_list('pk', 'opening'))
+
+    snapshots = [
+        StockSnapshot(
+            item_id=item_id,
+            day=day,
+            entries=row['entries'],
+            exits=-row['exits'],
+            on_hand=opening.get(item_id, 0) + row['entries'] + row['exits'],
+        )
+        for item_id, row in moved.items()
+    ]
+    with transaction.atomic(using=using, savepoint=False):
+        StockSnapshot.objects.using(using).bulk_create(
+            snapshots,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['item', 'day'],
+            update_fields=['entries', 'exits', 'on_hand'],
+        )
+    return len(snapshots)
+
+
+def stock_on_hand(at, items=None, using=None) -> dict:
+    """Units on hand per item at the end of day ``at``, read from the snapshots in one query.
+
+    Items without snapshots up to ``at`` are left out.
+    """
+    latest = StockSnapshot.objects.filter(item=OuterRef('pk'), day__lte=at).order_by('-day').values('on_hand')[:1]
+    queryset = Item.objects.db_manager(using).all()
+    if items is not None:
+        queryset = queryset.filter(pk__in=[getattr(item, 'pk', item) for item in items])
+    rows = queryset.annotate(on_hand=Subquery(latest)).filter(on_hand__isnull=False)
+    return dict(rows.order_by().values_list('pk', 'on_hand'))
+
+
+def movement_report(start, end, bucket='week', items=None, using=None) -> dict:
+    """Entries and exits per item and week (or month) between ``start`` and ``end``, both days included.
+
+    Returns
+    -------
+    dict
+        ``{item_id: [{'bucket': date, 'entries': int, 'exits': int}, ...]}`` in chronological order.
+    """
+    trunc = REPORT_BUCKETS[bucket]
+    queryset = StockSnapshot.objects.db_manager(using).filter(day__gte=start, day__lte=end)
+    if items is not None:
+        queryset = queryset.filter(item__in=[getattr(item, 'pk', item) for item in items])
+    rows = (
+        queryset.annotate(bucket=trunc('day'))
+        .order_by()
+        .values('item', 'bucket')
+        .annotate(entries=Sum('entries'), exits=Sum('exits'))
+        .order_by('item', 'bucket')
+    )
+    report = defaultdict(list)
+    for row in rows:
+        report[row['item']].append({'bucket': row['bucket'], 'entries': row['entries'], 'exits': row['exits']})
+    return dict(report)
@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from applications.supply.ledger import build_stock_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Consolida los movimientos de inventario de cada día en cortes de inventario por item.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--day', type=date.fromisoformat, default=None, help='Día a consolidar (por defecto ayer).')
+        parser.add_argument(
+            '--since', type=date.fromisoformat, default=None, help='Consolida todos los días desde esta fecha.'
+        )
+        parser.add_argument('--database', default=None, help='Alias de la base de datos.')
+
+    def handle(self, *args, **options):
+        day = options['day'] or timezone.localdate() - timedelta(days=1)
+        current = options['since'] or day
+        total = 0
+        while current <= day:
+            total += build_stock_snapshots(current, using=options['database'])
+            current += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'Cortes de inventario escritos: {total}.'))
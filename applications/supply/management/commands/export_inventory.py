@@ -0,0 +1,11 @@
+from applications.supply.exports import INVENTORY_EXPORT_COLUMNS, inventory_export_queryset
+from applications.utils.commands import ExportCommand
+
+
+class Command(ExportCommand):
+    help = 'Exporta todos los lotes de inventario en CSV, JSONL o formato columnar.'
+
+    columns = INVENTORY_EXPORT_COLUMNS
+
+    def get_queryset(self):
+        return inventory_export_queryset()
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.supply.models import SupplyOrder
+from applications.supply.receiving import OrderAlreadyReceived, OrderNotReceivable, receive_order
+
+
+class Command(BaseCommand):
+    help = 'Recibe órdenes de compra creando los lotes de inventario de todos sus detalles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('order_ids', nargs='+', type=int, help='Ids de las órdenes de compra a recibir.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por INSERT.')
+
+    def handle(self, *args, **options):
+        for order_id in options['order_ids']:
+            try:
+                result = receive_order(order_id, batch_size=options['batch_size'])
+            except SupplyOrder.DoesNotExist:
+                raise CommandError(f'La orden {order_id} no existe.')
+            except (OrderAlreadyReceived, OrderNotReceivable) as error:
+                raise CommandError(str(error))
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Orden {result.order_id}: {result.rows} lotes en {result.seconds:.3f}s '
+                    f'({result.rows_per_second:.0f} filas/s).'
+                )
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from applications.supply.totals import repair_totals
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los totales de los detalles y las órdenes de compra que no coinciden con sus valores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='Alias de la base de datos a corregir.')
+
+    def handle(self, *args, **options):
+        details, orders = repair_totals(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Detalles corregidos: {details}. Órdenes corregidas: {orders}.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from applications.supply.stock import reconcile_stock
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el stock de Items y Productos a partir del inventario disponible.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo reporta las diferencias, sin corregirlas.')
+        parser.add_argument('--database', default=None, help='Alias de la base de datos a reconciliar.')
+
+    def handle(self, *args, **options):
+        items, products = reconcile_stock(dry_run=options['dry_run'], using=options['database'])
+        verb = 'con diferencias' if options['dry_run'] else 'corregidos'
+        self.stdout.write(self.style.SUCCESS(f'Items {verb}: {items}. Productos {verb}: {products}.'))
@@ -0,0 +1,31 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from applications.supply.reservations import RELEASE_BATCH_SIZE, release_expired, run_sweeper
+
+
+class Command(BaseCommand):
+    help = 'Libera las reservas de inventario vencidas y devuelve sus unidades a la venta.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RELEASE_BATCH_SIZE, help='Reservas por transacción.')
+        parser.add_argument('--database', default=None, help='Alias de la base de datos.')
+        parser.add_argument('--loop', action='store_true', help='Sigue liberando periódicamente hasta recibir SIGTERM.')
+        parser.add_argument('--interval', type=int, default=None, help='Segundos entre barridos con --loop.')
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            asyncio.run(self.sweep(options))
+            return
+        released = release_expired(batch_size=options['batch_size'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Reservas liberadas: {released}.'))
+
+    async def sweep(self, options):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        self.stdout.write('Liberando reservas vencidas periódicamente...')
+        await run_sweeper(options['interval'], options['batch_size'], stop=stop, using=options['database'])
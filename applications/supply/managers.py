@@ -0,0 +1,227 @@
+import string
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q
+
+from applications.utils.managers import SoftDeleteQuerySet
+
+from .stock import apply_stock_deltas, sellable_units
+from .totals import detail_totals, recompute_order_totals
+
+# Batch codes look like ``CAT-XXX``: the category code plus a base36 suffix.
+BATCH_CODE_ALPHABET = string.digits + string.ascii_uppercase
+BATCH_CODE_SUFFIX_LENGTH = 3
+BATCH_CODE_CAPACITY = len(BATCH_CODE_ALPHABET) ** BATCH_CODE_SUFFIX_LENGTH
+BATCH_CODE_RETRIES = 3
+
+
+class BatchCodeExhausted(Exception):
+    """Raised when a category prefix has no batch codes left to hand out."""
+
+
+def format_batch_code(prefix: str, value: int) -> str:
+    """Build the batch code for the ``value``-th slot of a prefix sequence.
+
+    Suffixes are fixed-width base36, so codes sort in the same order as their sequence values.
+    """
+    suffix = ''
+    for _ in range(BATCH_CODE_SUFFIX_LENGTH):
+        value, digit = divmod(value, len(BATCH_CODE_ALPHABET))
+        suffix = BATCH_CODE_ALPHABET[digit] + suffix
+    return f'{prefix}-{suffix}'.upper()
+
+
+class BatchCodeSequenceManager(models.Manager):
+    def allocate(self, prefix: str, count: int) -> list:
+        """Reserve ``count`` consecutive batch codes for ``prefix``.
+
+        The sequence row is locked for the duration of the reservation, so concurrent receipts never get the same
+        block.
+
+        Parameters
+        ----------
+        prefix : str
+            Category code the batch codes belong to.
+        count : int
+            Number of codes to reserve.
+
+        Returns
+        -------
+        list
+            The reserved batch codes, in sequence order.
+        """
+        if count <= 0:
+            return []
+        with transaction.atomic(using=self.db, savepoint=False):
+            sequence, _ = self.select_for_update().get_or_create(prefix=prefix)
+            start = sequence.last_value
+            if start + count > BATCH_CODE_CAPACITY:
+                raise BatchCodeExhausted(f'No quedan códigos de lote disponibles para "{prefix}".')
+            self.filter(pk=sequence.pk).update(last_value=F('last_value') + count)
+        return [format_batch_code(prefix, value) for value in range(start, start + count)]
+
+
+def stock_value_expression():
+    """Database-side equivalent of ``Inventory.total_cost``."""
+    return ExpressionWrapper(F('stock') * F('unit_cost'), output_field=DecimalField(max_digits=18, decimal_places=2))
+
+
+class InventoryQuerySet(SoftDeleteQuerySet):
+    def with_stock_value(self):
+        """Annotate ``stock_value``, the SQL version of the ``total_cost`` property."""
+        return self.annotate(stock_value=stock_value_expression())
+
+    def batch_code_prefixes(self, item_ids) -> dict:
+        """Map each item id to the category code used as its batch code prefix, in a single query."""
+        item_model = self.model._meta.get_field('item').related_model
+        rows = item_model._default_manager.using(self.db).filter(pk__in=set(item_ids))
+        return {pk: code or '' for pk, code in rows.values_list('pk', 'product__category__code')}
+
+    def assign_batch_codes(self, objs, prefixes=None):
+        """Fill in ``batch_code`` on every object that does not have one yet.
+
+        Codes are taken in blocks from the per-prefix sequences, so the cost is a constant number of queries per
+        category regardless of how many objects are passed. Codes already used by legacy (random) batches are
+        detected with one range query per round and replaced.
+
+        Parameters
+        ----------
+        objs : iterable of Inventory
+            Unsaved inventory rows.
+        prefixes : dict, optional
+            Item id to category code map. Looked up with one query when omitted.
+        """
+        from .models import BatchCodeSequence
+
+        objs = list(objs)
+        pending = [obj for obj in objs if not obj.batch_code]
+        if pending and prefixes is None:
+            prefixes = self.batch_code_prefixes(obj.item_id for obj in pending)
+        sequences = BatchCodeSequence.objects.db_manager(self.db)
+        while pending:
+            groups = {}
+            for obj in pending:
+                groups.setdefault(prefixes.get(obj.item_id, ''), []).append(obj)
+
+            taken_filter = Q()
+            for prefix, group in groups.items():
+                codes = sequences.allocate(prefix, len(group))
+                for obj, code in zip(group, codes):
+                    obj.batch_code = code
+                taken_filter |= Q(batch_code__range=(codes[0], codes[-1]))
+
+            taken = set(
+                self.model._default_manager.using(self.db)
+                .filter(taken_filter)
+                .values_list('batch_code', flat=True)
+            )
+            for obj in pending:
+                if obj.batch_code in taken:
+                    obj.batch_code = ''
+            pending = [obj for obj in pending if not obj.batch_code]
+        return objs
+
+    def bulk_create(self, objs, *args, batch_code_prefixes=None, movement_kind='ADJ', moved_at=None, **kwargs):
+        """Insert inventory rows, generating their batch codes in bulk.
+
+        If the insert hits a unique-constraint race on a generated code, the generated codes are discarded and the
+        insert is retried with a fresh block. Stock deltas of the new rows are rolled up in aggregate and their units
+        are appended to the ledger as ``movement_kind`` movements (``'IN'`` for receipts), except for
+        conflict-handling inserts where the inserted rows are unknown.
+        """
+        from .ledger import append_adjustments
+
+        objs = list(objs)
+        generated = [obj for obj in objs if not obj.batch_code]
+        if generated and batch_code_prefixes is None:
+            batch_code_prefixes = self.batch_code_prefixes(obj.item_id for obj in generated)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            for attempt in range(BATCH_CODE_RETRIES):
+                self.assign_batch_codes(generated, batch_code_prefixes)
+                try:
+                    with transaction.atomic(using=self.db, savepoint=True):
+                        created = super().bulk_create(objs, *args, **kwargs)
+                    break
+                except IntegrityError:
+                    if not generated or attempt == BATCH_CODE_RETRIES - 1:
+                        raise
+                    for obj in generated:
+                        obj.batch_code = ''
+
+            if not (kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts')):
+                deltas = Counter()
+                for obj in created:
+                    obj._loaded_sellable_units = obj.sellable_units
+                    obj._loaded_on_hand = obj.on_hand
+                    deltas[obj.item_id] += obj.sellable_units
+                apply_stock_deltas(deltas, using=self.db)
+                append_adjustments(
+                    ((obj.pk, obj.item_id, obj.on_hand) for obj in created), movement_kind, moved_at, using=self.db
+                )
+        return created
+
+    def _units(self, sign=1) -> tuple:
+        """Signed sellable units per item and ledger changes per batch of these rows, read in one query."""
+        deltas, changes = Counter(), []
+        rows = self.order_by().values_list('pk', 'item_id', 'stock', 'reserved', 'state')
+        for pk, item_id, stock, reserved, state in rows:
+            deltas[item_id] += sign * sellable_units(stock, reserved, state, False)
+            changes.append((pk, item_id, sign * stock))
+        return deltas, changes
+
+    def soft_delete(self) -> int:
+        """Soft delete the rows, taking their units out of Item and Product stock and off the ledger."""
+        from .ledger import append_adjustments
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            deltas, changes = self.alive()._units(sign=-1)
+            count = super().soft_delete()
+            apply_stock_deltas(deltas, using=self.db)
+            append_adjustments(changes, using=self.db)
+        return count
+
+    def restore(self) -> int:
+        """Restore soft-deleted rows, adding their sellable units back to the stock and their units to the ledger."""
+        from .ledger import append_adjustments
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            deltas, changes = self.dead()._units()
+            count = super().restore()
+            apply_stock_deltas(deltas, using=self.db)
+            append_adjustments(changes, using=self.db)
+        return count
+
+
+class SupplyOrderDetailQuerySet(SoftDeleteQuerySet):
+    def _order_ids(self) -> list:
+        return list(self.order_by().values_list('order_id', flat=True).distinct())
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Insert details with their totals filled in and recompute each affected order once."""
+        objs = list(objs)
+        for obj in objs:
+            obj.sub_total, obj.total = detail_totals(obj.quantity, obj.unit_cost, obj.shipping_fee, obj.taxes)
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(objs, *args, **kwargs)
+            recompute_order_totals({obj.order_id for obj in objs}, using=self.db)
+        return created
+
+    def soft_delete(self) -> int:
+        with transaction.atomic(using=self.db, savepoint=False):
+            order_ids = self._order_ids()
+            count = super().soft_delete()
+            recompute_order_totals(order_ids, using=self.db)
+        return count
+
+    def restore(self) -> int:
+        with transaction.atomic(using=self.db, savepoint=False):
+            order_ids = self._order_ids()
+            count = super().restore()
+            recompute_order_totals(order_ids, using=self.db)
+        return count
+
+
+InventoryManager = models.Manager.from_queryset(InventoryQuerySet)
+SupplyOrderDetailManager = models.Manager.from_queryset(SupplyOrderDetailQuerySet)
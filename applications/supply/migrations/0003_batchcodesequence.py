@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('_deleted', models.BooleanField(default=False, editable=False, verbose_name='Borrado')),
+                ('_created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('prefix', models.CharField(max_length=3, unique=True, verbose_name='Prefijo')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Último valor')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de lotes',
+                'verbose_name_plural': 'Secuencias de lotes',
+                'ordering': ['prefix'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='last_entry_at',
+            field=models.DateTimeField(editable=False, verbose_name='Última entrada'),
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='last_exit_at',
+            field=models.DateTimeField(editable=False, verbose_name='Última salida'),
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12, verbose_name='Costo'),
+        ),
+    ]
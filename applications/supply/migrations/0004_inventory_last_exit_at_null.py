@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0003_batchcodesequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventory',
+            name='last_exit_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Última salida'),
+        ),
+    ]
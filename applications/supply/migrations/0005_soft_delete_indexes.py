@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0004_inventory_last_exit_at_null'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('_deleted', False)), fields=['item', 'state'], name='inventory_alive_item_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplyorderdetail',
+            index=models.Index(condition=models.Q(('_deleted', False)), fields=['order'], name='orderdetail_alive_order_idx'),
+        ),
+    ]
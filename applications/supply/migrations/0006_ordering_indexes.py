@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0005_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='inventory',
+            options={'ordering': ['item_id', 'last_entry_at', 'last_exit_at', '-unit_cost'], 'verbose_name': 'Inventario', 'verbose_name_plural': 'Inventarios'},
+        ),
+        migrations.AlterModelOptions(
+            name='supplyorderdetail',
+            options={'ordering': ['order_id', '-total'], 'verbose_name': 'Detalle orden de compra', 'verbose_name_plural': 'Detalles orden de compra'},
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['item', 'last_entry_at', 'last_exit_at', '-unit_cost'], name='inventory_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('state', 'RFS')), fields=['item', 'last_entry_at'], name='inventory_rfs_item_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplyorder',
+            index=models.Index(fields=['-order_date', '-total'], name='supplyorder_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplyorderdetail',
+            index=models.Index(fields=['order', '-total'], name='orderdetail_ordering_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0006_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha de vencimiento'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('state', 'RFS')), fields=['item', 'expires_at'], name='inventory_rfs_expiry_idx'),
+        ),
+    ]
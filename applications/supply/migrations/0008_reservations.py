@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0007_inventory_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='reserved',
+            field=models.SmallIntegerField(default=0, editable=False, verbose_name='Reservadas'),
+        ),
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('_deleted', models.BooleanField(default=False, editable=False, verbose_name='Borrado')),
+                ('_created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('cart_key', models.CharField(db_index=True, max_length=64, verbose_name='Carrito')),
+                ('quantity', models.PositiveSmallIntegerField(verbose_name='Cantidad')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Vence')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='supply.inventory', verbose_name='Inventario')),
+            ],
+            options={
+                'verbose_name': 'Reserva',
+                'verbose_name_plural': 'Reservas',
+                'ordering': ['expires_at'],
+            },
+        ),
+    ]
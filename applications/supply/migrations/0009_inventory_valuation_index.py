@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0008_reservations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('_deleted', False), ('stock__gt', 0)), fields=['item', 'unit_cost', 'stock'], name='inventory_valuation_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0009_inventory_valuation_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='supplyorder',
+            name='sub_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Sub total'),
+        ),
+        migrations.AlterField(
+            model_name='supplyorder',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Total'),
+        ),
+        migrations.AlterField(
+            model_name='supplyorderdetail',
+            name='sub_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Sub total'),
+        ),
+        migrations.AlterField(
+            model_name='supplyorderdetail',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Costo total'),
+        ),
+    ]
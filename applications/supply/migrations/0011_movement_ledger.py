@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_item_average_cost'),
+        ('supply', '0010_order_totals_defaults'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('IN', 'Entrada'), ('OUT', 'Salida'), ('ADJ', 'Ajuste')], max_length=3, verbose_name='Tipo')),
+                ('quantity', models.IntegerField(verbose_name='Cantidad')),
+                ('moved_at', models.DateTimeField(verbose_name='Fecha')),
+                ('period', models.DateField(verbose_name='Mes')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='supply.inventory', verbose_name='Inventario')),
+                ('item', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='products.item', verbose_name='Item')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de inventario',
+                'verbose_name_plural': 'Movimientos de inventario',
+                'ordering': ['moved_at', 'pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('entries', models.IntegerField(default=0, verbose_name='Entradas')),
+                ('exits', models.IntegerField(default=0, verbose_name='Salidas')),
+                ('on_hand', models.IntegerField(default=0, verbose_name='Inventario al cierre')),
+                ('item', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='products.item', verbose_name='Item')),
+            ],
+            options={
+                'verbose_name': 'Corte de inventario',
+                'verbose_name_plural': 'Cortes de inventario',
+                'ordering': ['item_id', 'day'],
+                'indexes': [models.Index(fields=['day', 'item'], name='stocksnapshot_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('item', 'day'), name='stocksnapshot_item_day_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['period', 'moved_at'], name='movement_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['item', 'moved_at'], name='movement_item_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0011_movement_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorymovement',
+            name='inventory',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='supply.inventory', verbose_name='Inventario'),
+        ),
+    ]
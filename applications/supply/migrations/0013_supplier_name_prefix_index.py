@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:45
+
+from django.db import migrations
+
+from applications.utils.operations import PostgreSQLRunSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supply', '0012_movement_inventory_set_null'),
+    ]
+
+    operations = [
+        # Índice funcional para name__istartswith (UPPER(name::text) LIKE UPPER(...)) en el admin
+        PostgreSQLRunSQL(
+            'CREATE INDEX IF NOT EXISTS supplier_name_upper_idx ON supply_supplier (UPPER(name) text_pattern_ops)',
+            'DROP INDEX IF EXISTS supplier_name_upper_idx',
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_name_prefix_indexes'),
+        ('supply', '0013_supplier_name_prefix_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='inventory',
+            name='inventory_alive_item_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='inventory',
+            name='inventory_ordering_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='inventory',
+            name='inventory_rfs_item_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='inventory',
+            name='inventory_valuation_idx',
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='item',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='products.item', verbose_name='Item'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['item', 'last_entry_at'], name='inventory_ordering_idx'),
+        ),
+    ]
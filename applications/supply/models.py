@@ -1,12 +1,13 @@
-import secrets
-import string
-
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Q
 
 from applications.products.models import Item
-from applications.utils.models import ModelClass
+from applications.utils.models import LightModelClass, ModelClass
 
-from .choices import INVENTORY_STATE, ORDER_STATES, PAYMENT_TYPE_CHOICES
+from .choices import INVENTORY_STATE, MOVEMENT_KINDS, ORDER_STATES, PAYMENT_TYPE_CHOICES
+from .managers import BATCH_CODE_RETRIES, BatchCodeSequenceManager, InventoryManager, SupplyOrderDetailManager
+from .stock import sellable_units
+from .totals import detail_totals, recompute_order_totals
 
 # Create your models here.
 
@@ -35,14 +36,26 @@ class SupplyOrder(ModelClass):
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, verbose_name='Proveedor')
     order_date = models.DateField(verbose_name='Fecha de la orden')
     payment_method = models.ForeignKey(SupplyPaymentMethod, on_delete=models.CASCADE, verbose_name='Método de pago')
-    sub_total = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Sub total', editable=False)
+    sub_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Sub total', editable=False
+    )
     shipping_fee = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Costo de envío')
     taxes = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Impuestos')
-    total = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Total', editable=False)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Total', editable=False)
     related_urls = models.JSONField(null=True, blank=True, verbose_name='Links de compra')
     trm = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, verbose_name='TRM')
     state = models.CharField(max_length=16, choices=ORDER_STATES, verbose_name='Estado')
 
+    def save(self, *args, **kwargs):
+        # sub_total lo mantienen los detalles: la instancia puede estar desactualizada, así que ambos totales se
+        # recalculan en SQL después de guardar
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+            recompute_order_totals([self.pk], using=self._state.db)
+            self.sub_total, self.total = (
+                SupplyOrder.objects.using(self._state.db).filter(pk=self.pk).values_list('sub_total', 'total').get()
+            )
+
     @property
     def taxes_percentage(self) -> float:
         if self.taxes and self.taxes > 0:
@@ -53,6 +66,9 @@ class SupplyOrder(ModelClass):
         verbose_name = 'Orden de compra'
         verbose_name_plural = 'Órdenes de compra'
         ordering = ['-order_date', '-total']
+        indexes = [
+            models.Index(fields=['-order_date', '-total'], name='supplyorder_ordering_idx'),
+        ]
 
 
 class SupplyOrderDetail(ModelClass):
@@ -60,20 +76,42 @@ class SupplyOrderDetail(ModelClass):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, verbose_name='Item')
     quantity = models.SmallIntegerField(verbose_name='Cantidad')
     unit_cost = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Costo unitario')
-    sub_total = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Sub total', editable=False)
+    sub_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Sub total', editable=False
+    )
     shipping_fee = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Costo de envío')
     taxes = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Impuestos')
-    total = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Costo total')
+    total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Costo total', editable=False
+    )
     purchase_url = models.URLField(verbose_name='Link de compra', null=True, blank=True)
 
+    objects = SupplyOrderDetailManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'order_id' not in instance.get_deferred_fields():
+            instance._loaded_order_id = instance.order_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.sub_total, self.total = detail_totals(self.quantity, self.unit_cost, self.shipping_fee, self.taxes)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Detalle orden de compra'
         verbose_name_plural = 'Detalles orden de compra'
-        ordering = ['order', '-total']
+        ordering = ['order_id', '-total']
+        indexes = [
+            models.Index(fields=['order', '-total'], name='orderdetail_ordering_idx'),
+            models.Index(fields=['order'], condition=Q(_deleted=False), name='orderdetail_alive_order_idx'),
+        ]
 
 
 class Inventory(ModelClass):
-    item = models.ForeignKey(Item, on_delete=models.CASCADE, verbose_name='Item')
+    # Las búsquedas por item usan inventory_ordering_idx, que empieza por item
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, db_index=False, verbose_name='Item')
     supply_order_detail = models.ForeignKey(
         SupplyOrderDetail, on_delete=models.CASCADE, verbose_name='Detalle de Orden de Compra'
     )
@@ -81,30 +119,207 @@ class Inventory(ModelClass):
     entries = models.SmallIntegerField(editable=False, verbose_name='Entradas')
     exits = models.SmallIntegerField(editable=False, default=0, verbose_name='Salidas')
     stock = models.SmallIntegerField(editable=False, verbose_name='Inventario Actual')
+    reserved = models.SmallIntegerField(editable=False, default=0, verbose_name='Reservadas')
     unit_cost = models.DecimalField(editable=False, max_digits=12, decimal_places=2, verbose_name='Costo')
     last_entry_at = models.DateTimeField(editable=False, verbose_name='Última entrada')
-    last_exit_at = models.DateTimeField(editable=False, verbose_name='Última salida')
+    last_exit_at = models.DateTimeField(editable=False, null=True, blank=True, verbose_name='Última salida')
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de vencimiento')
     state = models.CharField(max_length=3, choices=INVENTORY_STATE, default='RFS', verbose_name='Estado')
 
+    objects = InventoryManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not {'stock', 'reserved', 'state', '_deleted'} & instance.get_deferred_fields():
+            instance._loaded_sellable_units = instance.sellable_units
+            instance._loaded_on_hand = instance.on_hand
+        return instance
+
+    @property
+    def sellable_units(self) -> int:
+        return sellable_units(self.stock, self.reserved, self.state, self._deleted)
+
+    @property
+    def on_hand(self) -> int:
+        """Units the movement ledger counts in the batch: its stock, reserved or not, until it is soft deleted."""
+        return 0 if self._deleted else self.stock or 0
+
     @property
     def total_cost(self) -> float:
         return self.stock * self.unit_cost
 
-    def _generate_batch_code(self):
-        first_part = self.item.product.category.code
-        second_part = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(3))
-        return f'{first_part}-{second_part}'.upper()
+    def __str__(self) -> str:
+        return self.batch_code
 
     def save(self, *args, **kwargs):
-        if not self.batch_code:
-            # Genera un batch_code único
-            batch_code = self._generate_batch_code()
-            while Inventory.objects.filter(batch_code=batch_code).exists():
-                batch_code = self._generate_batch_code()
-            self.batch_code = batch_code
-        super().save(*args, **kwargs)
+        if self.batch_code:
+            return super().save(*args, **kwargs)
+
+        # Genera un batch_code único a partir de la secuencia de la categoría
+        manager = Inventory.objects.db_manager(kwargs.get('using') or router.db_for_write(Inventory, instance=self))
+        prefixes = manager.batch_code_prefixes([self.item_id])
+        for attempt in range(BATCH_CODE_RETRIES):
+            manager.assign_batch_codes([self], prefixes)
+            try:
+                with transaction.atomic(using=manager.db, savepoint=True):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == BATCH_CODE_RETRIES - 1:
+                    raise
+                self.batch_code = ''
 
     class Meta:
         verbose_name = 'Inventario'
         verbose_name_plural = 'Inventarios'
-        ordering = ['item', 'last_entry_at', 'last_exit_at', '-unit_cost']
+        ordering = ['item_id', 'last_entry_at', 'last_exit_at', '-unit_cost']
+        indexes = [
+            # Prefijo inmutable del ordenamiento: last_exit_at cambia en cada salida y obligaría a reescribir el
+            # índice en cada venta. También sirve a FIFO y a las búsquedas por item
+            models.Index(fields=['item', 'last_entry_at'], name='inventory_ordering_idx'),
+            models.Index(fields=['item', 'expires_at'], condition=Q(state='RFS'), name='inventory_rfs_expiry_idx'),
+        ]
+
+
+class BatchCodeSequence(LightModelClass):
+    """Last batch code suffix handed out for each category code.
+
+    Attributes
+    ----------
+    prefix : models.CharField
+        Category code the sequence belongs to.
+    last_value : models.PositiveIntegerField
+        Number of suffixes already reserved for the prefix.
+    """
+
+    prefix = models.CharField(max_length=3, unique=True, verbose_name='Prefijo')
+    last_value = models.PositiveIntegerField(default=0, verbose_name='Último valor')
+
+    objects = BatchCodeSequenceManager()
+
+    def __str__(self) -> str:
+        return f'{self.prefix} ({self.last_value})'
+
+    class Meta:
+        verbose_name = 'Secuencia de lotes'
+        verbose_name_plural = 'Secuencias de lotes'
+        ordering = ['prefix']
+
+
+class Reservation(LightModelClass):
+    """Units of an Inventory batch held for a cart until they are sold or the reservation expires.
+
+    Reserved units are counted in ``Inventory.reserved`` and left out of Item and Product stock.
+
+    Attributes
+    ----------
+    inventory : models.ForeignKey
+        Batch the units are held from.
+    cart_key : models.CharField
+        Identifier of the cart (or session) holding the units.
+    quantity : models.PositiveSmallIntegerField
+        Units held.
+    expires_at : models.DateTimeField
+        Moment after which the units go back to sale.
+    """
+
+    inventory = models.ForeignKey(
+        Inventory, on_delete=models.CASCADE, related_name='reservations', verbose_name='Inventario'
+    )
+    cart_key = models.CharField(max_length=64, db_index=True, verbose_name='Carrito')
+    quantity = models.PositiveSmallIntegerField(verbose_name='Cantidad')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Vence')
+
+    def __str__(self) -> str:
+        return f'{self.cart_key} ({self.quantity})'
+
+    class Meta:
+        verbose_name = 'Reserva'
+        verbose_name_plural = 'Reservas'
+        ordering = ['expires_at']
+
+
+class InventoryMovement(models.Model):
+    """Append-only ledger of the units that entered or left each Inventory batch.
+
+    Rows are never updated, so the table skips the audit columns of ``ModelClass`` to stay compact. ``period`` (the
+    first day of the month of ``moved_at``) leads the time index, so reads of one month scan a single index range.
+    Receipts are recorded as entries, allocations and fulfilled reservations as exits, and any other change to the
+    units of a batch (manual creation or edits, soft deletes, restores and deletes) as an adjustment, so the ledger
+    always adds up to the stock of the alive batches.
+
+    Attributes
+    ----------
+    inventory : models.ForeignKey
+        Batch that moved. Set to NULL when the batch is deleted, so its history stays in the ledger.
+    item : models.ForeignKey
+        Item of the batch, denormalized so reports do not join Inventory.
+    kind : models.CharField
+        Entry, exit or adjustment.
+    quantity : models.IntegerField
+        Signed number of units: positive for entries, negative for exits.
+    moved_at : models.DateTimeField
+        Moment of the movement.
+    period : models.DateField
+        Month of the movement.
+    """
+
+    inventory = models.ForeignKey(Inventory, on_delete=models.SET_NULL, null=True, verbose_name='Inventario')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, db_index=False, verbose_name='Item')
+    kind = models.CharField(max_length=3, choices=MOVEMENT_KINDS, verbose_name='Tipo')
+    quantity = models.IntegerField(verbose_name='Cantidad')
+    moved_at = models.DateTimeField(verbose_name='Fecha')
+    period = models.DateField(verbose_name='Mes')
+
+    def __str__(self) -> str:
+        return f'{self.kind} {self.quantity:+d} ({self.moved_at:%Y-%m-%d})'
+
+    class Meta:
+        verbose_name = 'Movimiento de inventario'
+        verbose_name_plural = 'Movimientos de inventario'
+        ordering = ['moved_at', 'pk']
+        indexes = [
+            models.Index(fields=['period', 'moved_at'], name='movement_period_idx'),
+            models.Index(fields=['item', 'moved_at'], name='movement_item_idx'),
+        ]
+
+
+class StockSnapshot(models.Model):
+    """Daily per-item roll-up of the movement ledger, written by ``build_stock_snapshots``.
+
+    Only days with movements get a row; the stock on hand at any date is the ``on_hand`` of the latest row on or
+    before it.
+
+    Attributes
+    ----------
+    item : models.ForeignKey
+        Item the snapshot belongs to.
+    day : models.DateField
+        Day summarized.
+    entries : models.IntegerField
+        Units that entered during the day.
+    exits : models.IntegerField
+        Units that left during the day.
+    on_hand : models.IntegerField
+        Units on hand at the end of the day.
+    """
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, db_index=False, verbose_name='Item')
+    day = models.DateField(verbose_name='Día')
+    entries = models.IntegerField(default=0, verbose_name='Entradas')
+    exits = models.IntegerField(default=0, verbose_name='Salidas')
+    on_hand = models.IntegerField(default=0, verbose_name='Inventario al cierre')
+
+    def __str__(self) -> str:
+        return f'{self.item_id} {self.day}: {self.on_hand}'
+
+    class Meta:
+        verbose_name = 'Corte de inventario'
+        verbose_name_plural = 'Cortes de inventario'
+        ordering = ['item_id', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'day'], name='stocksnapshot_item_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'item'], name='stocksnapshot_day_idx'),
+        ]
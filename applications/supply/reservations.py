@@ -0,0 +1,223 @@
+"""Cart reservations on Inventory batches.
+
+Reserving holds units of specific batches for a cart: they are counted in ``Inventory.reserved``, left out of Item and
+Product stock and skipped by the allocation engine. A batch whose remaining units are all held moves to the RSV state.
+Reservations end in one of two ways: ``fulfill`` turns them into exits, ``release`` (or the expiry sweep) gives the
+units back. Every operation costs a fixed number of queries per cart (plus one locking query per reserved item),
+never one per unit.
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from applications.utils.expressions import case_by_pk
+
+from .allocation import EXHAUSTED_STATE, Allocation, AllocationLine, item_quantities, pick_batches
+from .ledger import append_movements, movement
+from .models import Inventory, Reservation
+from .stock import READY_STATE, RESERVED_STATE, SELLABLE_STATES, apply_stock_deltas
+
+logger = logging.getLogger(__name__)
+
+RELEASE_BATCH_SIZE = 1000
+
+_LOCKED_FIELDS = ('pk', 'inventory_id', 'inventory__item_id', 'inventory__state', 'inventory___deleted', 'quantity')
+
+
+def reserve(cart_key, quantities, ttl=None, policy='fifo', using=None) -> list:
+    """Hold units of several items for ``cart_key`` until ``ttl`` seconds from now.
+
+    Batches are picked and locked exactly like an allocation, so reservations follow the same policy as sales.
+
+    Parameters
+    ----------
+    cart_key : str
+        Cart holding the units.
+    quantities : dict
+        Item (or item id) to number of units.
+    ttl : int, optional
+        Lifetime of the reservations in seconds, defaults to ``settings.RESERVATION_TTL``.
+    policy : str or sequence, optional
+        Batch picking policy, see ``allocation.POLICIES``.
+    using : str, optional
+        Database alias, defaults to the router's write database for Reservation.
+
+    Returns
+    -------
+    list of Reservation
+        One reservation per held batch.
+
+    Raises
+    ------
+    InsufficientStock
+        If any item cannot be fully covered. Nothing is held in that case.
+    """
+    using = using or router.db_for_write(Reservation)
+    ttl = settings.RESERVATION_TTL if ttl is None else ttl
+    requested = item_quantities(quantities)
+    with transaction.atomic(using=using):
+        lines = pick_batches(requested, policy, using)
+        if not lines:
+            return []
+
+        held = case_by_pk({line.inventory_id: line.quantity for line in lines})
+        Inventory.objects.using(using).filter(pk__in=[line.inventory_id for line in lines]).update(
+            reserved=F('reserved') + held,
+            state=Case(When(stock=F('reserved') + held, then=Value(RESERVED_STATE)), default=F('state')),
+            _updated_at=timezone.now(),
+        )
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        reservations = Reservation.objects.using(using).bulk_create(
+            Reservation(
+                inventory_id=line.inventory_id, cart_key=cart_key, quantity=line.quantity, expires_at=expires_at
+            )
+            for line in lines
+        )
+        apply_stock_deltas({item_id: -quantity for item_id, quantity in requested.items() if quantity > 0}, using)
+    return reservations
+
+
+def extend(cart_key, ttl=None, using=None) -> int:
+    """Push back the expiry of every live reservation of ``cart_key`` with a single UPDATE."""
+    ttl = settings.RESERVATION_TTL if ttl is None else ttl
+    now = timezone.now()
+    reservations = Reservation.objects.db_manager(using).filter(cart_key=cart_key, expires_at__gt=now)
+    return reservations.update(expires_at=now + timedelta(seconds=ttl), _updated_at=now)
+
+
+def _lock(reservations, limit=None) -> list:
+    rows = reservations.select_for_update(skip_locked=True, of=('self',)).values_list(*_LOCKED_FIELDS)
+    return list(rows[:limit] if limit else rows)
+
+
+def _release(reservations, using, limit=None) -> int:
+    rows = _lock(reservations, limit)
+    if not rows:
+        return 0
+
+    held = Counter()
+    deltas = Counter()
+    for _, inventory_id, item_id, state, deleted, quantity in rows:
+        held[inventory_id] += quantity
+        # Las unidades vuelven al stock solo si el lote sigue a la venta
+        if not deleted and state in SELLABLE_STATES + (RESERVED_STATE,):
+            deltas[item_id] += quantity
+
+    Inventory.objects.using(using).filter(pk__in=held).update(
+        reserved=F('reserved') - case_by_pk(held),
+        state=Case(When(state=RESERVED_STATE, then=Value(READY_STATE)), default=F('state')),
+        _updated_at=timezone.now(),
+    )
+    Reservation.objects.using(using).filter(pk__in=[row[0] for row in rows]).delete()
+    apply_stock_deltas(deltas, using)
+    return len(rows)
+
+
+def release(cart_key, using=None) -> int:
+    """Give every unit held by ``cart_key`` back to sale. Returns the number of released reservations."""
+    using = using or router.db_for_write(Reservation)
+    with transaction.atomic(using=using):
+        return _release(Reservation.objects.using(using).filter(cart_key=cart_key), using)
+
+
+def release_expired(now=None, batch_size=RELEASE_BATCH_SIZE, using=None) -> int:
+    """Release reservations expired at ``now`` in batches of ``batch_size``, one transaction per batch.
+
+    The sweep walks the ``expires_at`` index and skips rows locked by a concurrent sweep or checkout.
+
+    Returns
+    -------
+    int
+        Number of released reservations.
+    """
+    using = using or router.db_for_write(Reservation)
+    now = now or timezone.now()
+    expired = Reservation.objects.using(using).filter(expires_at__lte=now).order_by('expires_at')
+    total = 0
+    while True:
+        with transaction.atomic(using=using):
+            released = _release(expired, using, limit=batch_size)
+        total += released
+        if released < batch_size:
+            return total
+
+
+def fulfill(cart_key, using=None, exited_at=None) -> Allocation:
+    """Turn the live reservations of ``cart_key`` into exits of the held batches.
+
+    The units already left Item and Product stock when they were reserved, so only the batches are written.
+
+    Returns
+    -------
+    Allocation
+        Consumed batches and their cost of goods. Empty when the cart holds nothing.
+    """
+    using = using or router.db_for_write(Reservation)
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        reservations = Reservation.objects.using(using).filter(
+            cart_key=cart_key, expires_at__gt=now, inventory___deleted=False
+        )
+        rows = _lock(reservations)
+        taken = Counter()
+        item_ids = {}
+        for _, inventory_id, item_id, _, _, quantity in rows:
+            taken[inventory_id] += quantity
+            item_ids[inventory_id] = item_id
+        if not taken:
+            return Allocation()
+
+        costs = dict(Inventory.objects.using(using).filter(pk__in=taken).values_list('pk', 'unit_cost'))
+        allocation = Allocation(
+            [AllocationLine(pk, item_ids[pk], quantity, costs[pk]) for pk, quantity in taken.items()]
+        )
+        quantities = case_by_pk(taken)
+        exited_at = exited_at or now
+        Inventory.objects.using(using).filter(pk__in=taken).update(
+            exits=F('exits') + quantities,
+            stock=F('stock') - quantities,
+            reserved=F('reserved') - quantities,
+            state=Case(When(stock=quantities, then=Value(EXHAUSTED_STATE)), default=F('state')),
+            last_exit_at=exited_at,
+            _updated_at=now,
+        )
+        Reservation.objects.using(using).filter(pk__in=[row[0] for row in rows]).delete()
+        append_movements(
+            (movement(line.inventory_id, line.item_id, -line.quantity, 'OUT', exited_at) for line in allocation.lines),
+            using,
+        )
+    return allocation
+
+
+async def run_sweeper(interval=None, batch_size=RELEASE_BATCH_SIZE, stop=None, using=None):
+    """Release expired reservations every ``interval`` seconds until ``stop`` is set.
+
+    Runs inside any asyncio loop (a management command, an ASGI lifespan, ...) without an external broker. The
+    database work runs in the thread used for sync code, so it never blocks the loop. A sweep always runs at least
+    once, even if ``stop`` is already set.
+    """
+    interval = settings.RESERVATION_SWEEP_INTERVAL if interval is None else interval
+    stop = stop or asyncio.Event()
+    sweep = sync_to_async(release_expired, thread_sensitive=True)
+    while True:
+        try:
+            released = await sweep(batch_size=batch_size, using=using)
+        except Exception:
+            logger.exception('Error liberando reservas vencidas')
+        else:
+            if released:
+                logger.info('Reservas vencidas liberadas: %s', released)
+        if stop.is_set():
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+            return
+        except asyncio.TimeoutError:
+            pass
@@ -1,4 +1,68 @@
-from django.db.models.signals import post_save
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import SupplyOrder, SupplyOrderDetail
+from applications.products.models import Category, Item, Product
+
+from .ledger import append_adjustments
+from .models import Inventory, SupplyOrderDetail
+from .stock import apply_stock_deltas
+from .totals import recompute_order_totals
+
+
+@receiver(pre_save, sender=Inventory)
+def load_inventory_sellable_units(sender, instance, raw, using, **kwargs):
+    # Instancias sin estado cargado (p. ej. con campos diferidos): se lee el valor anterior de la BD
+    if raw or instance._state.adding or hasattr(instance, '_loaded_sellable_units'):
+        return
+    previous = sender.objects.using(using).filter(pk=instance.pk).first()
+    instance._loaded_sellable_units = previous.sellable_units if previous else 0
+    instance._loaded_on_hand = previous.on_hand if previous else 0
+
+
+@receiver(post_save, sender=Inventory)
+def roll_up_inventory_stock(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    previous = 0 if created else instance._loaded_sellable_units
+    apply_stock_deltas({instance.item_id: instance.sellable_units - previous}, using=using)
+    instance._loaded_sellable_units = instance.sellable_units
+
+
+@receiver(post_save, sender=Inventory)
+def record_inventory_adjustment(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    previous = 0 if created else instance._loaded_on_hand
+    append_adjustments([(instance.pk, instance.item_id, instance.on_hand - previous)], using=using)
+    instance._loaded_on_hand = instance.on_hand
+
+
+@receiver(post_delete, sender=Inventory)
+def roll_back_inventory_stock(sender, instance, using, **kwargs):
+    units = getattr(instance, '_loaded_sellable_units', instance.sellable_units)
+    apply_stock_deltas({instance.item_id: -units}, using=using)
+
+
+@receiver(post_delete, sender=Inventory)
+def record_inventory_removal(sender, instance, using, origin=None, **kwargs):
+    # Si el borrado viene del catálogo, el item y sus movimientos se borran también
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if issubclass(model, (Category, Product, Item)):
+        return
+    on_hand = getattr(instance, '_loaded_on_hand', instance.on_hand)
+    append_adjustments([(None, instance.item_id, -on_hand)], using=using)
+
+
+@receiver(post_save, sender=SupplyOrderDetail)
+def update_order_totals(sender, instance, raw, using, **kwargs):
+    if raw:
+        return
+    # Si el detalle cambió de orden, la orden anterior también se recalcula
+    recompute_order_totals({instance.order_id, getattr(instance, '_loaded_order_id', None)}, using=using)
+    instance._loaded_order_id = instance.order_id
+
+
+@receiver(post_delete, sender=SupplyOrderDetail)
+def update_order_totals_on_delete(sender, instance, using, **kwargs):
+    recompute_order_totals([instance.order_id], using=using)
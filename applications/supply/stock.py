@@ -0,0 +1,178 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import router, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from applications.products.models import Item, Product
+from applications.utils.expressions import case_by_pk
+
+# Estados de inventario que cuentan como cantidad disponible
+READY_STATE = 'RFS'
+SELLABLE_STATES = (READY_STATE,)
+# Estado de un lote cuyas unidades están todas reservadas
+RESERVED_STATE = 'RSV'
+
+_local = threading.local()
+
+# Se envía al confirmar la transacción con los ids de Items y Productos cuyo stock cambió
+stock_changed = Signal()
+
+
+def sellable_units(stock, reserved, state, deleted) -> int:
+    """Units an Inventory row contributes to its Item stock: its stock minus the units held by reservations."""
+    if deleted or state not in SELLABLE_STATES:
+        return 0
+    return (stock or 0) - (reserved or 0)
+
+
+def sellable_expression():
+    """Database-side equivalent of ``sellable_units`` for rows already filtered on state and ``_deleted``."""
+    return F('stock') - F('reserved')
+
+
+def _nonzero(deltas) -> dict:
+    return {pk: delta for pk, delta in deltas.items() if delta}
+
+
+def _roll_up_products(product_deltas, item_ids, using):
+    # Un producto con cambio neto nulo no se actualiza, pero el stock de sus items sí cambió
+    product_ids = list(product_deltas)
+    product_deltas = _nonzero(product_deltas)
+    if product_deltas:
+        Product.objects.using(using).filter(pk__in=product_deltas).update(stock=F('stock') + case_by_pk(product_deltas))
+    transaction.on_commit(
+        lambda: stock_changed.send(sender=Item, item_ids=item_ids, product_ids=product_ids, using=using),
+        using=using,
+    )
+
+
+def apply_stock_deltas(deltas, using=None):
+    """Add per-item stock deltas to Item.stock and roll them up into Product.stock.
+
+    Every call costs at most three queries regardless of how many items are touched: one UPDATE for the items, one
+    lookup of their products and one UPDATE for the products. Inside ``deferred_stock_updates`` the deltas are only
+    accumulated and written when the block exits. ``stock_changed`` is sent once the transaction commits, with the
+    products of every touched item even when their net change is zero.
+
+    Parameters
+    ----------
+    deltas : dict
+        Item id to signed number of units.
+    using : str, optional
+        Database alias, defaults to the router's write database for Item.
+    """
+    deltas = _nonzero(deltas)
+    if not deltas:
+        return
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(deltas)
+        return
+
+    using = using or router.db_for_write(Item)
+    with transaction.atomic(using=using, savepoint=False):
+        items = Item.objects.using(using).filter(pk__in=deltas)
+        items.update(stock=F('stock') + case_by_pk(deltas))
+
+        product_deltas = Counter()
+        for item_id, product_id in items.order_by().values_list('pk', 'product_id'):
+            product_deltas[product_id] += deltas[item_id]
+        _roll_up_products(product_deltas, list(deltas), using)
+
+
+def move_item_stock(moves, using=None):
+    """Move the stock of items that changed product from their previous product to the current one.
+
+    Item.stock is left as is; only the Product.stock roll-ups change, with one UPDATE.
+
+    Parameters
+    ----------
+    moves : iterable
+        ``(item_id, previous_product_id, product_id, units)`` tuples; items that kept their product or have no
+        units are skipped.
+    using : str, optional
+        Database alias, defaults to the router's write database for Product.
+    """
+    product_deltas = Counter()
+    item_ids = []
+    for item_id, previous_product_id, product_id, units in moves:
+        if previous_product_id == product_id or not units:
+            continue
+        product_deltas[previous_product_id] -= units
+        product_deltas[product_id] += units
+        item_ids.append(item_id)
+    if not item_ids:
+        return
+    using = using or router.db_for_write(Product)
+    with transaction.atomic(using=using, savepoint=False):
+        _roll_up_products(product_deltas, item_ids, using)
+
+
+@contextmanager
+def deferred_stock_updates(using=None):
+    """Collapse every stock delta applied inside the block into a single roll-up on exit.
+
+    Nested blocks join the outermost one. If the block raises, the collected deltas are discarded.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+
+    _local.pending = Counter()
+    try:
+        yield
+    except BaseException:
+        _local.pending = None
+        raise
+    deltas, _local.pending = _local.pending, None
+    apply_stock_deltas(deltas, using)
+
+
+def _expected_item_stock():
+    from .models import Inventory
+
+    sellable = (
+        Inventory.objects.alive()
+        .filter(item=OuterRef('pk'), state__in=SELLABLE_STATES)
+        .order_by()
+        .values('item')
+        .annotate(total=Sum(sellable_expression()))
+        .values('total')
+    )
+    return Coalesce(Subquery(sellable), Value(0))
+
+
+def _expected_product_stock():
+    items = Item.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(total=Sum('stock'))
+    return Coalesce(Subquery(items.values('total')), Value(0))
+
+
+def reconcile_stock(dry_run=False, using=None) -> tuple:
+    """Recount Item and Product stock from Inventory with set-based statements.
+
+    Only rows that drifted from the recount are written. When something was fixed, ``stock_changed`` is sent with
+    ``item_ids=None`` and ``product_ids=None``, meaning "any".
+
+    Returns
+    -------
+    tuple
+        Number of drifted items and products.
+    """
+    using = using or router.db_for_write(Item)
+    with transaction.atomic(using=using, savepoint=False):
+        items = Item.objects.using(using).annotate(expected=_expected_item_stock()).exclude(stock=F('expected'))
+        if dry_run:
+            return items.count(), Product.objects.using(using).annotate(
+                expected=_expected_product_stock()
+            ).exclude(stock=F('expected')).count()
+        item_count = items.update(stock=_expected_item_stock())
+
+        products = Product.objects.using(using).annotate(expected=_expected_product_stock())
+        product_count = products.exclude(stock=F('expected')).update(stock=_expected_product_stock())
+        if item_count or product_count:
+            transaction.on_commit(lambda: stock_changed.send(sender=Item, item_ids=None, product_ids=None, using=using))
+    return item_count, product_count
@@ -1,3 +1,677 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from applications.products.cache import get_cache, get_product_payload
+from applications.products.models import Category, Item, Product
+from applications.utils.testing import IndexUsageMixin, QueryBudgetMixin
+
+from .allocation import POLICIES, InsufficientStock, allocatable, allocate, allocate_items
+from .ledger import build_stock_snapshots, movement_report, stock_on_hand
+from .models import (
+    Inventory,
+    InventoryMovement,
+    Reservation,
+    Supplier,
+    SupplyOrder,
+    SupplyOrderDetail,
+    SupplyPaymentMethod,
+)
+from .receiving import OrderAlreadyReceived, OrderNotReceivable, receive_order
+from .reservations import fulfill, release, release_expired, reserve, run_sweeper
+from .stock import apply_stock_deltas, deferred_stock_updates, reconcile_stock
+from .totals import deferred_totals
+from .valuation import apply_landed_costs, inventory_valuation, update_average_costs
 
 # Create your tests here.
+
+
+class SupplyTestMixin:
+    def setUp(self) -> None:
+        self.category = Category.objects.create(code='ele', name='Electrónica')
+        self.product = Product.objects.create(category=self.category, name='Audífonos', price_real=50000)
+        self.item = Item.objects.create(product=self.product, color='Negro')
+        self.supplier = Supplier.objects.create(name='Proveedor test')
+        self.payment_method = SupplyPaymentMethod.objects.create(name='Transferencia', type='EF')
+        self.order = SupplyOrder.objects.create(
+            supplier=self.supplier,
+            order_date=date(2023, 11, 21),
+            payment_method=self.payment_method,
+            shipping_fee=0,
+            taxes=0,
+            state='on_the_way',
+        )
+        self.detail = SupplyOrderDetail.objects.create(
+            order=self.order, item=self.item, quantity=10, unit_cost=20000, shipping_fee=0, taxes=0
+        )
+
+    def build_inventory(self, **kwargs) -> Inventory:
+        now = timezone.now()
+        values = {
+            'item': self.item,
+            'supply_order_detail': self.detail,
+            'entries': 10,
+            'stock': 10,
+            'unit_cost': 20000,
+            'last_entry_at': now,
+            'last_exit_at': now,
+        }
+        values.update(kwargs)
+        return Inventory(**values)
+
+
+class BatchCodeTestCase(SupplyTestMixin, QueryBudgetMixin, TestCase):
+    def test_batch_codes_follow_category_sequence(self):
+        first = self.build_inventory()
+        first.save()
+        second = self.build_inventory()
+        second.save()
+
+        self.assertEqual(first.batch_code, 'ELE-000')
+        self.assertEqual(second.batch_code, 'ELE-001')
+
+    def test_taken_codes_are_skipped(self):
+        self.build_inventory(batch_code='ELE-000').save()
+
+        inventory = self.build_inventory()
+        inventory.save()
+
+        self.assertEqual(inventory.batch_code, 'ELE-001')
+
+    def test_save_query_budget(self):
+        self.build_inventory().save()  # Crea la secuencia de la categoría
+
+        with self.assertQueryBudget(11, label='Crear un lote de Inventory'):
+            self.build_inventory().save()
+
+    def test_bulk_create_uses_constant_queries(self):
+        def bulk_create_queries(size):
+            with CaptureQueriesContext(connection) as context:
+                Inventory.objects.bulk_create([self.build_inventory() for _ in range(size)])
+            return len(context.captured_queries)
+
+        bulk_create_queries(1)  # Crea la secuencia de la categoría
+        few = bulk_create_queries(5)
+        many = bulk_create_queries(50)
+
+        self.assertEqual(few, many)
+        self.assertEqual(Inventory.objects.values('batch_code').distinct().count(), 56)
+
+
+class StockRollUpTestCase(SupplyTestMixin, TestCase):
+    def assertStock(self, item_stock, product_stock):
+        self.item.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(self.item.stock, item_stock)
+        self.assertEqual(self.product.stock, product_stock)
+
+    def test_inventory_changes_roll_up(self):
+        inventory = self.build_inventory()
+        inventory.save()
+        self.assertStock(10, 10)
+
+        inventory = Inventory.objects.get(pk=inventory.pk)
+        inventory.exits, inventory.stock = 4, 6
+        inventory.save()
+        self.assertStock(6, 6)
+
+        inventory.state = 'NFS'
+        inventory.save()
+        self.assertStock(0, 0)
+
+        inventory.state = 'RFS'
+        inventory.save()
+        inventory.delete()
+        self.assertStock(0, 0)
+
+    def test_bulk_create_rolls_up_in_aggregate(self):
+        other_item = Item.objects.create(product=self.product, color='Blanco')
+        Inventory.objects.bulk_create(
+            [self.build_inventory(), self.build_inventory(stock=3), self.build_inventory(item=other_item, stock=5)]
+        )
+        self.assertStock(13, 18)
+
+    def test_deferred_updates_run_once(self):
+        other_item = Item.objects.create(product=self.product, color='Blanco')
+        with CaptureQueriesContext(connection) as context:
+            with deferred_stock_updates():
+                for _ in range(20):
+                    apply_stock_deltas({self.item.pk: 1, other_item.pk: 2})
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+
+        self.assertEqual(len(updates), 2)
+        self.assertStock(20, 60)
+
+    def test_soft_delete_and_restore_roll_up(self):
+        Inventory.objects.bulk_create([self.build_inventory(), self.build_inventory(stock=4)])
+
+        with self.assertNumQueries(6):
+            self.assertEqual(Inventory.objects.filter(stock=4).soft_delete(), 1)
+        self.assertEqual(Inventory.objects.alive().count(), 1)
+        self.assertStock(10, 10)
+
+        Inventory.objects.restore()
+        self.assertEqual(Inventory.objects.dead().count(), 0)
+        self.assertStock(14, 14)
+
+    def test_moving_an_item_moves_its_stock(self):
+        self.build_inventory().save()
+        other_product = Product.objects.create(category=self.category, name='Parlante', price_real=80000)
+
+        item = Item.objects.get(pk=self.item.pk)
+        item.product = other_product
+        item.save()
+
+        self.assertStock(10, 0)
+        other_product.refresh_from_db()
+        self.assertEqual(other_product.stock, 10)
+        self.assertEqual(reconcile_stock(dry_run=True), (0, 0))
+
+    def test_stock_changes_invalidate_cached_product(self):
+        get_cache().clear()
+        self.assertEqual(get_product_payload(self.product.pk)['stock'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.build_inventory().save()
+
+        self.assertEqual(get_product_payload(self.product.pk)['stock'], 10)
+
+    def test_reconcile_stock_repairs_drift(self):
+        self.build_inventory().save()
+        Item.objects.filter(pk=self.item.pk).update(stock=99)
+        Product.objects.filter(pk=self.product.pk).update(stock=-5)
+
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+
+        self.assertIn('Items corregidos: 1', out.getvalue())
+        self.assertStock(10, 10)
+
+
+class ReceiveOrderTestCase(SupplyTestMixin, QueryBudgetMixin, TestCase):
+    def add_details(self, count):
+        SupplyOrderDetail.objects.bulk_create(
+            SupplyOrderDetail(
+                order=self.order, item=self.item, quantity=2, unit_cost=1000, shipping_fee=0, taxes=0
+            )
+            for _ in range(count)
+        )
+
+    def test_receive_order_creates_batches_and_stock(self):
+        self.add_details(3)
+
+        result = receive_order(self.order)
+
+        self.assertEqual(result.rows, 4)
+        self.assertEqual(Inventory.objects.filter(supply_order_detail__order=self.order).count(), 4)
+        self.item.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.item.stock, 16)
+        self.assertEqual(self.order.state, 'finished')
+
+    def test_receive_order_query_count_is_constant(self):
+        def receive_queries(details, max_queries=17):
+            order = SupplyOrder.objects.get(pk=self.order.pk)
+            order.pk = None
+            order.save()
+            SupplyOrderDetail.objects.bulk_create(
+                SupplyOrderDetail(
+                    order=order, item=self.item, quantity=1, unit_cost=1000, shipping_fee=0, taxes=0
+                )
+                for _ in range(details)
+            )
+            with self.assertQueryBudget(max_queries, label=f'Recibir una orden de {details} detalles') as budget:
+                receive_order(order)
+            return len(budget.queries)
+
+        receive_queries(1, max_queries=20)  # Crea la secuencia de la categoría
+        self.assertEqual(receive_queries(1), receive_queries(40))
+
+    def test_order_cannot_be_received_twice(self):
+        receive_order(self.order)
+        with self.assertRaises(OrderAlreadyReceived):
+            receive_order(self.order)
+
+    def test_only_orders_on_the_way_are_received(self):
+        for state in ('draft', 'cancelled', 'finished'):
+            SupplyOrder.objects.filter(pk=self.order.pk).update(state=state)
+            with self.assertRaises(OrderNotReceivable):
+                receive_order(self.order)
+            with self.assertRaisesMessage(CommandError, 'no está en camino'):
+                call_command('receive_supply_order', self.order.pk, stdout=StringIO())
+
+        self.assertFalse(Inventory.objects.exists())
+        self.assertFalse(InventoryMovement.objects.exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 0)
+
+
+class AllocationTestCase(SupplyTestMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        now = timezone.now()
+        self.old = self.build_inventory(stock=3, unit_cost=1000, last_entry_at=now - timedelta(days=2))
+        self.new = self.build_inventory(stock=5, unit_cost=2000, last_entry_at=now, expires_at=now + timedelta(days=5))
+        Inventory.objects.bulk_create([self.new, self.old])
+
+    def test_fifo_consumes_oldest_batches_first(self):
+        allocation = allocate(self.item, 4)
+
+        self.assertEqual([line.inventory_id for line in allocation.lines], [self.old.pk, self.new.pk])
+        self.assertEqual(allocation.cost, 3 * 1000 + 2000)
+        self.old.refresh_from_db()
+        self.new.refresh_from_db()
+        self.assertEqual((self.old.stock, self.old.exits, self.old.state), (0, 3, 'SLD'))
+        self.assertEqual((self.new.stock, self.new.exits, self.new.state), (4, 1, 'RFS'))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 4)
+
+    def test_fefo_consumes_expiring_batches_first(self):
+        allocation = allocate(self.item, 2, policy='fefo')
+
+        self.assertEqual(allocation.lines[0].inventory_id, self.new.pk)
+        self.assertEqual(allocation.cost, 4000)
+
+    def test_insufficient_stock_writes_nothing(self):
+        with self.assertRaises(InsufficientStock) as context:
+            allocate(self.item, 9)
+
+        self.assertEqual(context.exception.available, 8)
+        self.assertEqual(Inventory.objects.filter(exits=0).count(), 2)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 8)
+
+    def test_query_count_does_not_grow_with_batches(self):
+        other_item = Item.objects.create(product=self.product, color='Blanco')
+        Inventory.objects.bulk_create([self.build_inventory(item=other_item, stock=1) for _ in range(8)])
+
+        with CaptureQueriesContext(connection) as context:
+            allocate_items({self.item: 1, other_item: 8})
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+
+        # Un UPDATE de inventario y el roll-up de Item y Product
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(Inventory.objects.filter(item=other_item, state='SLD').count(), 8)
+
+
+class ReservationTestCase(SupplyTestMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        now = timezone.now()
+        self.old = self.build_inventory(stock=3, unit_cost=1000, last_entry_at=now - timedelta(days=2))
+        self.new = self.build_inventory(stock=5, unit_cost=2000, last_entry_at=now)
+        Inventory.objects.bulk_create([self.new, self.old])
+
+    def assertItemStock(self, stock):
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, stock)
+
+    def test_reserve_holds_units_and_release_gives_them_back(self):
+        reservations = reserve('cart-1', {self.item: 4})
+
+        self.assertEqual([reservation.quantity for reservation in reservations], [3, 1])
+        self.old.refresh_from_db()
+        self.assertEqual((self.old.reserved, self.old.state), (3, 'RSV'))
+        self.assertItemStock(4)
+        with self.assertRaises(InsufficientStock):
+            allocate(self.item, 5)
+
+        self.assertEqual(release('cart-1'), 2)
+        self.old.refresh_from_db()
+        self.assertEqual((self.old.reserved, self.old.state), (0, 'RFS'))
+        self.assertItemStock(8)
+
+    def test_fulfill_consumes_reserved_units(self):
+        reserve('cart-1', {self.item: 4})
+
+        allocation = fulfill('cart-1')
+
+        self.assertEqual(allocation.cost, 3 * 1000 + 2000)
+        self.old.refresh_from_db()
+        self.new.refresh_from_db()
+        self.assertEqual((self.old.stock, self.old.reserved, self.old.state), (0, 0, 'SLD'))
+        self.assertEqual((self.new.stock, self.new.reserved, self.new.exits), (4, 0, 1))
+        self.assertFalse(Reservation.objects.exists())
+        self.assertItemStock(4)
+
+    def test_release_expired_in_batches(self):
+        reserve('cart-1', {self.item: 4}, ttl=-1)
+        reserve('cart-2', {self.item: 1})
+
+        self.assertEqual(release_expired(batch_size=1), 2)
+        self.assertEqual(list(Reservation.objects.values_list('cart_key', flat=True)), ['cart-2'])
+        self.assertItemStock(7)
+        out = StringIO()
+        call_command('reconcile_stock', dry_run=True, stdout=out)
+        self.assertIn('Items con diferencias: 0', out.getvalue())
+
+    def test_query_count_does_not_grow_with_units(self):
+        def cart_queries(cart_key, units):
+            with CaptureQueriesContext(connection) as context:
+                reserve(cart_key, {self.item: units})
+                release(cart_key)
+            return len(context.captured_queries)
+
+        self.assertEqual(cart_queries('cart-1', 1), cart_queries('cart-2', 3))
+
+    def test_sweeper_and_command_release_expired(self):
+        reserve('cart-1', {self.item: 1}, ttl=-1)
+        stop = asyncio.Event()
+        stop.set()
+        async_to_sync(run_sweeper)(interval=0, stop=stop)
+        self.assertFalse(Reservation.objects.exists())
+
+        reserve('cart-2', {self.item: 1}, ttl=-1)
+        out = StringIO()
+        call_command('release_reservations', stdout=out)
+        self.assertIn('Reservas liberadas: 1', out.getvalue())
+
+
+class ValuationTestCase(SupplyTestMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        SupplyOrder.objects.filter(pk=self.order.pk).update(shipping_fee=1000, taxes=500, trm=2)
+        self.other_item = Item.objects.create(product=self.product, color='Blanco')
+        self.other_detail = SupplyOrderDetail.objects.create(
+            order=self.order,
+            item=self.other_item,
+            quantity=3,
+            unit_cost=10000,
+            shipping_fee=300,
+            taxes=0,
+        )
+
+    def test_receiving_uses_landed_cost(self):
+        receive_order(self.order)
+
+        # Goods 200000 + 30000: the 1500 of order charges are split 200000 / 30000
+        costs = dict(Inventory.objects.values_list('item', 'unit_cost'))
+        self.assertEqual(costs[self.item.pk], Decimal('40260.87'))
+        self.assertEqual(costs[self.other_item.pk], Decimal('20330.43'))
+        self.other_item.refresh_from_db()
+        self.assertEqual(self.other_item.average_cost, Decimal('20330.43'))
+
+    def test_apply_landed_costs_revalues_received_batches(self):
+        receive_order(self.order)
+        SupplyOrder.objects.filter(pk=self.order.pk).update(shipping_fee=0, taxes=0, trm=None)
+
+        self.assertEqual(apply_landed_costs([self.order.pk]), 2)
+        self.assertEqual(Inventory.objects.get(item=self.item).unit_cost, Decimal('20000'))
+
+    def test_weighted_average_cost(self):
+        update_average_costs({self.item.pk: (10, Decimal('100000'))})
+        Inventory.objects.bulk_create([self.build_inventory(stock=10)])
+        update_average_costs({self.item.pk: (30, Decimal('450000'))})
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.average_cost, Decimal('13750'))
+
+    def test_reserved_units_count_as_on_hand(self):
+        update_average_costs({self.item.pk: (10, Decimal('100000'))})
+        Inventory.objects.bulk_create([self.build_inventory(stock=10)])
+        reserve('cart-1', {self.item: 4})
+        update_average_costs({self.item.pk: (30, Decimal('450000'))})
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 6)
+        self.assertEqual(self.item.average_cost, Decimal('13750'))
+
+    def test_inventory_valuation_is_one_query(self):
+        Inventory.objects.bulk_create([self.build_inventory(stock=2), self.build_inventory(item=self.other_item)])
+
+        with self.assertNumQueries(1):
+            valuation = inventory_valuation()
+        self.assertEqual(valuation, {'units': 12, 'value': Decimal('240000')})
+        by_item = {row['item']: row['value'] for row in inventory_valuation(group_by=['item'])}
+        self.assertEqual(by_item[self.item.pk], Decimal('40000'))
+
+
+class OrderTotalsTestCase(SupplyTestMixin, TestCase):
+    def assertOrderTotals(self, sub_total, total, order=None):
+        order = order or self.order
+        order.refresh_from_db()
+        self.assertEqual((order.sub_total, order.total), (Decimal(sub_total), Decimal(total)))
+
+    def build_detail(self, **kwargs) -> SupplyOrderDetail:
+        values = {
+            'order': self.order,
+            'item': self.item,
+            'quantity': 2,
+            'unit_cost': 1000,
+            'shipping_fee': 100,
+            'taxes': 0,
+        }
+        values.update(kwargs)
+        return SupplyOrderDetail(**values)
+
+    def test_detail_changes_update_order_totals(self):
+        self.assertOrderTotals(200000, 200000)
+        SupplyOrder.objects.filter(pk=self.order.pk).update(shipping_fee=500)
+        detail = self.build_detail()
+        detail.save()
+
+        self.assertEqual((detail.sub_total, detail.total), (2000, 2100))
+        self.assertOrderTotals(202100, 202600)
+
+        other_order = SupplyOrder.objects.get(pk=self.order.pk)
+        other_order.pk = None
+        other_order.save()
+        detail = SupplyOrderDetail.objects.get(pk=detail.pk)
+        detail.order = other_order
+        detail.save()
+        self.assertOrderTotals(200000, 200500)
+        self.assertOrderTotals(2100, 2600, order=other_order)
+
+        SupplyOrderDetail.objects.filter(pk=self.detail.pk).soft_delete()
+        self.assertOrderTotals(0, 500)
+
+    def test_saving_a_stale_order_keeps_detail_totals(self):
+        order = SupplyOrder.objects.get(pk=self.order.pk)
+        self.build_detail(quantity=1, unit_cost=20, shipping_fee=0).save()
+
+        order.taxes = 5
+        order.save()
+
+        self.assertEqual((order.sub_total, order.total), (Decimal('200020'), Decimal('200025')))
+        self.assertOrderTotals(200020, 200025)
+
+    def test_bulk_and_deferred_inserts_recompute_once(self):
+        with CaptureQueriesContext(connection) as context:
+            SupplyOrderDetail.objects.bulk_create([self.build_detail() for _ in range(20)])
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertOrderTotals(242000, 242000)
+
+        with CaptureQueriesContext(connection) as context:
+            with deferred_totals():
+                for _ in range(5):
+                    self.build_detail().save()
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertOrderTotals(252500, 252500)
+
+    def test_command_repairs_historical_totals(self):
+        SupplyOrderDetail.objects.filter(pk=self.detail.pk).update(sub_total=0, total=0)
+        SupplyOrder.objects.filter(pk=self.order.pk).update(sub_total=0, total=1)
+
+        out = StringIO()
+        call_command('recompute_order_totals', stdout=out)
+
+        self.assertIn('Detalles corregidos: 1. Órdenes corregidas: 1.', out.getvalue())
+        self.assertOrderTotals(200000, 200000)
+
+
+class MovementLedgerTestCase(SupplyTestMixin, TestCase):
+    def at(self, day) -> datetime:
+        return timezone.make_aware(datetime(2024, 3, day, 12))
+
+    def test_receiving_and_exits_append_to_ledger(self):
+        receive_order(self.order, received_at=self.at(4))
+        allocate(self.item, 3, exited_at=self.at(5))
+        reserve('cart-1', {self.item: 2})
+        fulfill('cart-1', exited_at=self.at(12))
+
+        ledger = list(InventoryMovement.objects.values_list('kind', 'quantity', 'period'))
+        self.assertEqual(
+            ledger, [('IN', 10, date(2024, 3, 1)), ('OUT', -3, date(2024, 3, 1)), ('OUT', -2, date(2024, 3, 1))]
+        )
+
+    def test_snapshots_answer_point_in_time_and_weekly_reports(self):
+        receive_order(self.order, received_at=self.at(4))
+        allocate(self.item, 3, exited_at=self.at(5))
+        allocate(self.item, 1, exited_at=self.at(12))
+        out = StringIO()
+        call_command('build_stock_snapshots', since=date(2024, 3, 1), day=date(2024, 3, 31), stdout=out)
+        self.assertIn('Cortes de inventario escritos: 3.', out.getvalue())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(stock_on_hand(date(2024, 3, 4)), {self.item.pk: 10})
+        self.assertEqual(stock_on_hand(date(2024, 3, 10)), {self.item.pk: 7})
+        self.assertEqual(stock_on_hand(date(2024, 3, 1)), {})
+
+        report = movement_report(date(2024, 3, 1), date(2024, 3, 31))[self.item.pk]
+        self.assertEqual(
+            report,
+            [
+                {'bucket': date(2024, 3, 4), 'entries': 10, 'exits': 3},
+                {'bucket': date(2024, 3, 11), 'entries': 0, 'exits': 1},
+            ],
+        )
+
+    def test_manual_changes_are_adjustments(self):
+        receive_order(self.order, received_at=self.at(4))
+        received = Inventory.objects.get(item=self.item)
+        received.exits, received.stock = 2, 8
+        received.save()
+        manual = self.build_inventory(stock=3)
+        manual.save()
+        Inventory.objects.bulk_create([self.build_inventory(stock=5)])
+        Inventory.objects.filter(stock=5).soft_delete()
+        Inventory.objects.restore()
+        manual.delete()
+
+        kinds = list(InventoryMovement.objects.values_list('kind', 'quantity'))
+        self.assertEqual(kinds, [('IN', 10), ('ADJ', -2), ('ADJ', 3), ('ADJ', 5), ('ADJ', -5), ('ADJ', 5), ('ADJ', -3)])
+
+        today = timezone.localdate()
+        build_stock_snapshots(date(2024, 3, 4))
+        build_stock_snapshots(today)
+        self.item.refresh_from_db()
+        self.assertEqual(stock_on_hand(today), {self.item.pk: self.item.stock})
+        self.assertEqual(self.item.stock, 13)
+
+    def test_rebuilding_a_day_upserts(self):
+        receive_order(self.order, received_at=self.at(4))
+        self.assertEqual(build_stock_snapshots(date(2024, 3, 4)), 1)
+        self.assertEqual(build_stock_snapshots(date(2024, 3, 4)), 1)
+        self.assertEqual(stock_on_hand(date(2024, 3, 4)), {self.item.pk: 10})
+
+
+class InventoryExportTestCase(SupplyTestMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        Inventory.objects.bulk_create([self.build_inventory() for _ in range(3)])
+
+    def test_export_view_streams_csv(self):
+        staff = get_user_model().objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse('supply:export_inventory', args=['csv']))
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('id,batch_code,item_id'))
+        self.assertIn('Electrónica', lines[1])
+
+    def test_export_view_requires_staff(self):
+        response = self.client.get(reverse('supply:export_inventory', args=['csv']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_command_columnar(self):
+        out = StringIO()
+        call_command('export_inventory', format='columnar', chunk_size=2, stdout=out)
+
+        row_groups = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([group['num_rows'] for group in row_groups], [2, 1])
+        self.assertEqual(row_groups[0]['columns']['stock'], [10, 10])
+
+
+class InventoryAdminTestCase(SupplyTestMixin, QueryBudgetMixin, TestCase):
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        admin_user = get_user_model().objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin_user)
+        url = reverse('admin:supply_inventory_changelist')
+
+        def changelist_queries(rows):
+            other_item = Item.objects.create(product=self.product, color=f'Color {rows}')
+            Inventory.objects.bulk_create([self.build_inventory(item=other_item) for _ in range(rows)])
+            with self.assertQueryBudget(4, label=f'Changelist de Inventory con {rows} lotes más') as budget:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(budget.queries)
+
+        self.assertEqual(changelist_queries(1), changelist_queries(20))
+
+    def test_order_changelists_query_budget(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', password='secret'))
+        SupplyOrderDetail.objects.bulk_create(
+            SupplyOrderDetail(order=self.order, item=self.item, quantity=1, unit_cost=1000, shipping_fee=0, taxes=0)
+            for _ in range(10)
+        )
+
+        for model in ('supplyorder', 'supplyorderdetail'):
+            with self.assertQueryBudget(4, label=f'Changelist de {model}'):
+                self.assertEqual(self.client.get(reverse(f'admin:supply_{model}_changelist')).status_code, 200)
+
+
+class OrderingIndexTestCase(IndexUsageMixin, TestCase):
+    def test_default_ordering_uses_composite_index(self):
+        self.assertUsesIndex(Inventory.objects.all()[:20], 'inventory_ordering_idx')
+        self.assertUsesIndex(SupplyOrder.objects.all()[:20], 'supplyorder_ordering_idx')
+        self.assertUsesIndex(SupplyOrderDetail.objects.filter(order_id=1), 'orderdetail_ordering_idx')
+
+    def test_fifo_batches_of_item_use_ordering_index(self):
+        queryset = allocatable(1).order_by(*POLICIES['fifo'])[:1]
+        self.assertUsesIndex(queryset, 'inventory_ordering_idx')
+
+    # SQLite ordena los NULL primero en orden ascendente: no puede leer NULLS LAST del índice
+    @skipUnless(connection.vendor == 'postgresql', 'FEFO ordena con NULLS LAST')
+    def test_fefo_batches_of_item_use_expiry_index(self):
+        queryset = allocatable(1).order_by(*POLICIES['fefo'])[:1]
+        self.assertUsesIndex(queryset, 'inventory_rfs_expiry_idx')
+
+    @skipUnless(connection.vendor == 'postgresql', 'Índice funcional creado solo en PostgreSQL')
+    def test_admin_supplier_search_uses_functional_index(self):
+        self.assertUsesIndex(Supplier.objects.filter(name__istartswith='prov'), 'supplier_name_upper_idx')
+
+
+class StockAvailabilityTestCase(SupplyTestMixin, TestCase):
+    async def test_availability_of_several_items(self):
+        other = await Item.objects.acreate(product=self.product, color='Blanco')
+        expires_at = timezone.now() + timedelta(days=30)
+        await Inventory.objects.abulk_create(
+            [self.build_inventory(stock=4, expires_at=expires_at), self.build_inventory(stock=6)]
+        )
+        await sync_to_async(reserve)('cart-1', {self.item: 5})
+
+        response = await self.async_client.get(
+            reverse('supply:stock_availability'), {'item': [self.item.pk, other.pk]}
+        )
+
+        rows = {row['id']: row for row in response.json()['items']}
+        self.assertEqual((rows[self.item.pk]['available'], rows[self.item.pk]['reserved']), (5, 5))
+        self.assertEqual(rows[self.item.pk]['batches'], 2)
+        self.assertEqual(
+            rows[other.pk], {'id': other.pk, 'available': 0, 'reserved': 0, 'batches': 0, 'next_expiry': None}
+        )
+        invalid = await self.async_client.get(reverse('supply:stock_availability'), {'item': 'x'})
+        self.assertEqual(invalid.status_code, 400)
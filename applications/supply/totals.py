@@ -0,0 +1,124 @@
+"""Supply order totals.
+
+A detail costs ``quantity * unit_cost`` (its ``sub_total``) plus its own shipping and taxes (its ``total``). An order
+adds up the totals of its alive details (its ``sub_total``) plus its own shipping and taxes (its ``total``). Detail
+totals are set when the detail is saved; order totals are rewritten with one aggregate UPDATE whenever details change.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import router, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+TOTAL = DecimalField(max_digits=12, decimal_places=2)
+
+_local = threading.local()
+
+
+def detail_totals(quantity, unit_cost, shipping_fee, taxes) -> tuple:
+    """``(sub_total, total)`` of a SupplyOrderDetail."""
+    sub_total = (quantity or 0) * (unit_cost or 0)
+    return sub_total, sub_total + (shipping_fee or 0) + (taxes or 0)
+
+
+def detail_sub_total_expression():
+    return ExpressionWrapper(F('quantity') * F('unit_cost'), output_field=TOTAL)
+
+
+def detail_total_expression():
+    return ExpressionWrapper(F('quantity') * F('unit_cost') + F('shipping_fee') + F('taxes'), output_field=TOTAL)
+
+
+def order_sub_total_expression():
+    """Sum of the alive detail totals of the outer SupplyOrder."""
+    from .models import SupplyOrderDetail
+
+    details = SupplyOrderDetail.objects.alive().filter(order=OuterRef('pk')).order_by().values('order')
+    details = details.annotate(amount=Sum('total')).values('amount')
+    return Coalesce(Subquery(details, output_field=TOTAL), Value(Decimal(0)), output_field=TOTAL)
+
+
+def _order_totals() -> dict:
+    sub_total = order_sub_total_expression()
+    return {
+        'sub_total': sub_total,
+        'total': ExpressionWrapper(sub_total + F('shipping_fee') + F('taxes'), output_field=TOTAL),
+        '_updated_at': timezone.now(),
+    }
+
+
+def recompute_order_totals(order_ids=None, using=None) -> int:
+    """Rewrite ``sub_total`` and ``total`` of the given orders (all orders when omitted) with one UPDATE.
+
+    Inside ``deferred_totals`` the ids are only collected and the UPDATE runs once when the block exits.
+
+    Returns
+    -------
+    int
+        Number of updated orders, 0 while deferred.
+    """
+    from .models import SupplyOrder
+
+    if order_ids is not None:
+        order_ids = {order_id for order_id in order_ids if order_id is not None}
+        if not order_ids:
+            return 0
+        pending = getattr(_local, 'pending', None)
+        if pending is not None:
+            pending.update(order_ids)
+            return 0
+
+    using = using or router.db_for_write(SupplyOrder)
+    orders = SupplyOrder.objects.using(using).all()
+    if order_ids is not None:
+        orders = orders.filter(pk__in=order_ids)
+    return orders.update(**_order_totals())
+
+
+@contextmanager
+def deferred_totals(using=None):
+    """Recompute the totals of every order touched inside the block once, when it exits.
+
+    Nested blocks join the outermost one. If the block raises, nothing is recomputed.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+
+    _local.pending = set()
+    try:
+        yield
+    except BaseException:
+        _local.pending = None
+        raise
+    order_ids, _local.pending = _local.pending, None
+    recompute_order_totals(order_ids, using)
+
+
+def repair_totals(using=None) -> tuple:
+    """Fix the stored totals of every detail and order that drifted, with set-based statements.
+
+    Returns
+    -------
+    tuple
+        Number of corrected details and orders.
+    """
+    from .models import SupplyOrder, SupplyOrderDetail
+
+    using = using or router.db_for_write(SupplyOrder)
+    with transaction.atomic(using=using, savepoint=False):
+        details = SupplyOrderDetail.objects.using(using).annotate(
+            expected_sub_total=detail_sub_total_expression(), expected_total=detail_total_expression()
+        )
+        detail_count = details.exclude(sub_total=F('expected_sub_total'), total=F('expected_total')).update(
+            sub_total=detail_sub_total_expression(), total=detail_total_expression(), _updated_at=timezone.now()
+        )
+
+        expected = _order_totals()
+        orders = SupplyOrder.objects.using(using).annotate(expected_sub_total=expected['sub_total'])
+        orders = orders.annotate(expected_total=expected['total'])
+        order_count = orders.exclude(sub_total=F('expected_sub_total'), total=F('expected_total')).update(**expected)
+    return detail_count, order_count
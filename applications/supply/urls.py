@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'supply'
+
+urlpatterns = [
+    path('stock/', views.stock_availability, name='stock_availability'),
+    path('export/inventory.<str:file_format>', views.export_inventory, name='export_inventory'),
+]
@@ -0,0 +1,157 @@
+"""Inventory valuation.
+
+The landed cost of a received unit is its purchase price plus its share of every charge paid to bring it in, converted
+to local currency::
+
+    landed = (unit_cost * quantity + detail shipping + detail taxes + prorated order charges) / quantity * trm
+
+Order-level shipping and taxes are prorated across the details by the value of their goods. Everything is computed
+in SQL, so re-valuing an order, or every order, is a single UPDATE.
+"""
+from decimal import Decimal
+
+from django.db import router
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Func, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, NullIf, Round
+from django.utils import timezone
+
+from applications.products.models import Item
+from applications.utils.expressions import case_by_pk
+
+from .managers import stock_value_expression
+from .models import Inventory, SupplyOrderDetail
+
+AMOUNT = DecimalField(max_digits=18, decimal_places=6)
+COST = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _amount(expression):
+    return ExpressionWrapper(expression, output_field=AMOUNT)
+
+
+class Divide(Func):
+    """Decimal division that never truncates.
+
+    SQLite stores whole numbers of numeric columns as INTEGER and divides them as integers, so the dividend is
+    turned into REAL there. Other backends divide numerics exactly.
+    """
+
+    arity = 2
+    arg_joiner = ' / '
+    template = '(%(expressions)s)'
+    output_field = AMOUNT
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        dividend, divisor = self.get_source_expressions()
+        dividend_sql, dividend_params = compiler.compile(dividend)
+        divisor_sql, divisor_params = compiler.compile(divisor)
+        return f'(CAST({dividend_sql} AS REAL) / {divisor_sql})', (*dividend_params, *divisor_params)
+
+
+def order_goods_value():
+    """Value of the goods of every alive detail in the order of the outer SupplyOrderDetail."""
+    details = SupplyOrderDetail.objects.alive().filter(order=OuterRef('order')).order_by().values('order')
+    details = details.annotate(total=Sum(_amount(F('unit_cost') * F('quantity'))))
+    return Subquery(details.values('total'), output_field=AMOUNT)
+
+
+def landed_unit_cost():
+    """Landed cost per unit of a SupplyOrderDetail, in local currency, as an expression.
+
+    Details of an order without goods value get no share of the order charges; orders without TRM are taken as
+    already being in local currency.
+    """
+    goods = _amount(F('unit_cost') * F('quantity'))
+    order_charges = _amount(F('order__shipping_fee') + F('order__taxes'))
+    prorated = Coalesce(Divide(order_charges * goods, NullIf(order_goods_value(), Value(0))), Value(Decimal(0)))
+    landed = _amount(
+        Divide(goods + F('shipping_fee') + F('taxes') + prorated, NullIf(F('quantity'), Value(0)))
+        * Coalesce(F('order__trm'), Value(Decimal(1)))
+    )
+    return Round(landed, 2, output_field=COST)
+
+
+def with_landed_cost(details):
+    """Annotate ``landed_unit_cost`` on a SupplyOrderDetail queryset."""
+    return details.annotate(landed_unit_cost=landed_unit_cost())
+
+
+def apply_landed_costs(order_ids=None, using=None) -> int:
+    """Re-value the Inventory batches of ``order_ids`` (all orders when omitted) with one set-based UPDATE.
+
+    Use it after changing the charges or the TRM of orders that were already received.
+
+    Returns
+    -------
+    int
+        Number of updated batches.
+    """
+    using = using or router.db_for_write(Inventory)
+    details = SupplyOrderDetail.objects.using(using).filter(pk=OuterRef('supply_order_detail'))
+    batches = Inventory.objects.using(using).all()
+    if order_ids is not None:
+        batches = batches.filter(supply_order_detail__order_id__in=order_ids)
+    return batches.update(
+        unit_cost=Subquery(with_landed_cost(details).values('landed_unit_cost')[:1]), _updated_at=timezone.now()
+    )
+
+
+def update_average_costs(receipts, using=None) -> int:
+    """Fold received units into the weighted-average cost of their items with a single UPDATE.
+
+    Must run before the received batches are inserted. The units already on hand are the stock of the alive Inventory
+    batches of the item, reserved units included (``Item.stock`` leaves those out)::
+
+        average = (average * on_hand + received value) / (on_hand + received units)
+
+    Parameters
+    ----------
+    receipts : dict
+        Item id to ``(units, value)`` received, where value is the total landed cost of those units.
+    using : str, optional
+        Database alias, defaults to the router's write database for Item.
+
+    Returns
+    -------
+    int
+        Number of updated items.
+    """
+    receipts = {pk: (units, value) for pk, (units, value) in receipts.items() if units > 0}
+    if not receipts:
+        return 0
+    using = using or router.db_for_write(Item)
+    units = case_by_pk({pk: units for pk, (units, _) in receipts.items()})
+    value = case_by_pk({pk: value for pk, (_, value) in receipts.items()}, output_field=AMOUNT)
+    batches = Inventory.objects.alive().filter(item=OuterRef('pk')).order_by().values('item')
+    on_hand = Greatest(Coalesce(Subquery(batches.annotate(units=Sum('stock')).values('units')), Value(0)), Value(0))
+    average = Case(
+        # Items sin costo previo (p. ej. stock cargado antes de existir la valorización) toman el costo recibido
+        When(average_cost__isnull=True, then=Divide(value, units)),
+        default=Divide(F('average_cost') * on_hand + value, on_hand + units),
+    )
+    return Item.objects.using(using).filter(pk__in=receipts).update(average_cost=Round(average, 2, output_field=COST))
+
+
+def inventory_valuation(group_by=None, using=None):
+    """Units and value of the alive inventory in one aggregate query.
+
+    Parameters
+    ----------
+    group_by : sequence of str, optional
+        Lookups to group by (e.g. ``['item']`` or ``['item__product__category']``). Without it a single total is
+        returned.
+    using : str, optional
+        Database alias.
+
+    Returns
+    -------
+    dict or QuerySet
+        ``{'units': ..., 'value': ...}``, or one such row per group.
+    """
+    batches = Inventory.objects.db_manager(using).alive().filter(stock__gt=0).order_by()
+    value = Sum(stock_value_expression())
+    if group_by:
+        return batches.values(*group_by).annotate(units=Sum('stock'), value=value)
+    return batches.aggregate(
+        units=Coalesce(Sum('stock'), Value(0)), value=Coalesce(value, Value(Decimal(0)), output_field=AMOUNT)
+    )
@@ -1,3 +1,46 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Count, Min, Sum
+from django.http import Http404, JsonResponse
 
-# Create your views here.
+from applications.products.models import Item
+from applications.utils.exports import RENDERERS, streaming_export_response
+
+from .exports import INVENTORY_EXPORT_COLUMNS, inventory_export_queryset
+from .models import Inventory
+from .stock import RESERVED_STATE, SELLABLE_STATES
+
+# Tope de items por consulta de disponibilidad
+AVAILABILITY_MAX_ITEMS = 100
+
+
+async def stock_availability(request):
+    try:
+        item_ids = sorted({int(value) for value in request.GET.getlist('item')})
+    except ValueError:
+        return JsonResponse({'error': '"item" debe ser un id.'}, status=400)
+    if not item_ids or len(item_ids) > AVAILABILITY_MAX_ITEMS:
+        return JsonResponse({'error': f'Indique entre 1 y {AVAILABILITY_MAX_ITEMS} items.'}, status=400)
+
+    # values() y no values_list(): en Django 4.2 aiterator no admite values_list con varios campos
+    items = Item.objects.alive().filter(pk__in=item_ids).values('pk', 'stock')
+    batches = (
+        Inventory.objects.alive()
+        .filter(item__in=item_ids, state__in=SELLABLE_STATES + (RESERVED_STATE,))
+        .order_by()
+        .values('item')
+        .annotate(reserved=Sum('reserved'), batches=Count('pk'), next_expiry=Min('expires_at'))
+    )
+    items = await items.alist()
+    batches = await batches.alist()
+    batches = {row.pop('item'): row for row in batches}
+    empty = {'reserved': 0, 'batches': 0, 'next_expiry': None}
+    return JsonResponse(
+        {'items': [{'id': row['pk'], 'available': row['stock'], **batches.get(row['pk'], empty)} for row in items]}
+    )
+
+
+@staff_member_required
+def export_inventory(request, file_format):
+    if file_format not in RENDERERS:
+        raise Http404
+    return streaming_export_response(inventory_export_queryset(), INVENTORY_EXPORT_COLUMNS, file_format, 'inventory')
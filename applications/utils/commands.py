@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from .exports import EXPORT_CHUNK_SIZE, RENDERERS, ExportFormatError, iter_export
+
+
+class ExportCommand(BaseCommand):
+    """Base command that streams a table export to a file or to stdout.
+
+    Subclasses define ``columns`` and ``get_queryset``.
+    """
+
+    columns = []
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(RENDERERS), default='csv', help='Formato de salida.')
+        parser.add_argument('--output', default=None, help='Archivo de salida. Por defecto stdout.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Filas por lectura.')
+
+    def handle(self, *args, **options):
+        try:
+            chunks = iter_export(self.get_queryset(), self.columns, options['format'], options['chunk_size'])
+        except ExportFormatError as error:
+            raise CommandError(str(error))
+
+        if options['output'] is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+            file.writelines(chunks)
@@ -0,0 +1,107 @@
+"""Streaming table exports.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)``, which uses named server-side cursors on PostgreSQL,
+and rendered lazily, so memory stays flat no matter how many rows the table has. Related columns are declared as
+lookups (``product__category__path``) and resolved by the same JOIN ``select_related`` would use, without building
+model instances.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'columnar': 'application/x-ndjson',
+}
+
+
+class ExportFormatError(ValueError):
+    """Raised when an export format is not supported."""
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the value, so ``csv.writer`` can be used as a generator."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def render_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def render_jsonl(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def render_columnar(headers, rows, row_group_size=EXPORT_CHUNK_SIZE):
+    """Parquet-like output: one JSON line per row group, holding one array per column."""
+    group = []
+    index = 0
+    for row in rows:
+        group.append(row)
+        if len(group) == row_group_size:
+            yield _row_group(headers, group, index)
+            group, index = [], index + 1
+    if group:
+        yield _row_group(headers, group, index)
+
+
+def _row_group(headers, rows, index):
+    columns = {header: list(values) for header, values in zip(headers, zip(*rows))}
+    data = {'row_group': index, 'num_rows': len(rows), 'columns': columns}
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'jsonl': render_jsonl,
+    'columnar': render_columnar,
+}
+
+
+def iter_export(queryset, columns, file_format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the rendered export of ``queryset`` chunk by chunk.
+
+    Parameters
+    ----------
+    queryset : QuerySet
+        Rows to export. Should be ordered by an indexed column (usually ``pk``).
+    columns : list of tuple
+        ``(header, lookup)`` pairs.
+    file_format : str, optional
+        ``'csv'``, ``'jsonl'`` or ``'columnar'``.
+    chunk_size : int, optional
+        Rows fetched per round trip from the server-side cursor, also used as the columnar row group size.
+    """
+    if file_format not in RENDERERS:
+        raise ExportFormatError(f'Formato de exportación no soportado: "{file_format}".')
+    headers = [header for header, _ in columns]
+    rows = queryset.values_list(*(lookup for _, lookup in columns)).iterator(chunk_size=chunk_size)
+    if file_format == 'columnar':
+        return render_columnar(headers, rows, row_group_size=chunk_size)
+    return RENDERERS[file_format](headers, rows)
+
+
+def streaming_export_response(queryset, columns, file_format, filename, chunk_size=EXPORT_CHUNK_SIZE):
+    response = StreamingHttpResponse(
+        iter_export(queryset, columns, file_format, chunk_size), content_type=CONTENT_TYPES[file_format]
+    )
+    extension = 'jsonl' if file_format == 'columnar' else file_format
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
@@ -0,0 +1,11 @@
+from django.db.models import Case, IntegerField, Value, When
+
+
+def case_by_pk(values: dict, output_field=None) -> Case:
+    """CASE expression mapping each primary key to its value (0 for any other row), for batched UPDATEs."""
+    output_field = output_field or IntegerField()
+    return Case(
+        *(When(pk=pk, then=Value(value, output_field=output_field)) for pk, value in values.items()),
+        default=Value(0, output_field=output_field),
+        output_field=output_field,
+    )
@@ -0,0 +1,151 @@
+"""In-process load tests of the WSGI and ASGI handlers.
+
+Drives Django's own ``WSGIHandler`` from a pool of threads and its ``ASGIHandler`` from concurrent asyncio tasks,
+with the same URLs and the same number of concurrent clients, so both stacks can be compared on one machine without
+running servers or installing HTTP clients. Sync views under ASGI and async views under WSGI pay the adapter cost
+they would pay in production, which is exactly what the comparison is meant to show.
+"""
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import cycle, islice
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+
+
+@dataclass
+class LoadResult:
+    """Timings of one load test run."""
+
+    interface: str
+    requests: int
+    concurrency: int
+    seconds: float = 0
+    errors: int = 0
+    latencies: list = field(default_factory=list, repr=False)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0
+
+    def percentile(self, percent) -> float:
+        """Latency in milliseconds below which ``percent`` of the requests finished."""
+        if not self.latencies:
+            return 0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index] * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            'interface': self.interface,
+            'requests': self.requests,
+            'concurrency': self.concurrency,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'requests_per_second': round(self.throughput, 1),
+            'p50_ms': round(self.percentile(50), 2),
+            'p95_ms': round(self.percentile(95), 2),
+            'p99_ms': round(self.percentile(99), 2),
+        }
+
+
+def _succeeded(status) -> bool:
+    return status is not None and status < 400
+
+
+def _wsgi_environ(url, host) -> dict:
+    parts = urlsplit(url)
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+
+
+def run_wsgi(urls, requests, concurrency, host='localhost') -> LoadResult:
+    """Send ``requests`` GETs over ``urls`` (round robin) to the WSGI handler from ``concurrency`` threads."""
+    handler = WSGIHandler()
+    result = LoadResult('wsgi', requests, concurrency)
+
+    def call(url):
+        started = time.perf_counter()
+        status = []
+        body = handler(_wsgi_environ(url, host), lambda line, headers, exc_info=None: status.append(int(line[:3])))
+        b''.join(body)
+        body.close()
+        return time.perf_counter() - started, status[0] if status else None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(call, islice(cycle(urls), requests)))
+    result.seconds = time.perf_counter() - started
+    result.latencies = [elapsed for elapsed, _ in timings]
+    result.errors = sum(not _succeeded(status) for _, status in timings)
+    return result
+
+
+async def _asgi_call(handler, url, host):
+    parts = urlsplit(url)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': parts.path,
+        'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(),
+        'headers': [(b'host', host.encode())],
+        'server': (host, 80),
+        'client': ('127.0.0.1', 0),
+    }
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    status = None
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # El cliente nunca se desconecta: la espera termina cuando el handler cancela la tarea
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await handler(scope, receive, send)
+    return status
+
+
+async def run_asgi(urls, requests, concurrency, host='localhost') -> LoadResult:
+    """Send ``requests`` GETs over ``urls`` (round robin) to the ASGI handler from ``concurrency`` tasks."""
+    handler = ASGIHandler()
+    result = LoadResult('asgi', requests, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(url):
+        async with semaphore:
+            started = time.perf_counter()
+            status = await _asgi_call(handler, url, host)
+            return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    timings = await asyncio.gather(*(call(url) for url in islice(cycle(urls), requests)))
+    result.seconds = time.perf_counter() - started
+    result.latencies = [elapsed for elapsed, _ in timings]
+    result.errors = sum(not _succeeded(status) for _, status in timings)
+    return result
@@ -0,0 +1,28 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """QuerySet aware of the ``_deleted`` flag of the project base models.
+
+    ``soft_delete`` and ``restore`` are single UPDATE statements over the whole queryset.
+    """
+
+    def alive(self):
+        return self.filter(_deleted=False)
+
+    def dead(self):
+        return self.filter(_deleted=True)
+
+    def soft_delete(self) -> int:
+        return self.alive().update(_deleted=True, _updated_at=timezone.now())
+
+    def restore(self) -> int:
+        return self.dead().update(_deleted=False, _updated_at=timezone.now())
+
+    async def alist(self) -> list:
+        """Evaluate the queryset from async code, streaming its rows with ``aiterator``."""
+        return [row async for row in self.aiterator()]
+
+
+SoftDeleteManager = models.Manager.from_queryset(SoftDeleteQuerySet)
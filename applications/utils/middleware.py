@@ -0,0 +1,209 @@
+"""Per-request SQL instrumentation.
+
+``QueryInstrumentationMiddleware`` wraps every database connection with a ``QueryRecorder`` (through
+``connection.execute_wrapper``) while a request is handled, and reports the number of queries, the time spent in the
+database and the slowest statements:
+
+- as a ``Server-Timing`` header, which browsers show next to the request in their network panel;
+- as a structured log record on the ``applications.utils.middleware`` logger, with the figures in ``extra``;
+- against the thresholds of the settings, logging, warning or raising when a request exceeds them.
+
+Settings (see ``skuhub.settings.base``)::
+
+    QUERY_SAMPLE_RATE        fraction of the requests that are recorded, 0 disables the middleware
+    QUERY_SERVER_TIMING      whether recorded responses get the Server-Timing header
+    QUERY_COUNT_THRESHOLD    queries per request above which the threshold action runs (None: no limit)
+    QUERY_TIME_THRESHOLD     database milliseconds per request above which the threshold action runs (None: no limit)
+    QUERY_THRESHOLD_ACTION   'log', 'warn' (QueryThresholdWarning) or 'raise' (QueryThresholdExceeded, for tests)
+"""
+import heapq
+import logging
+import random
+import time
+import warnings
+from contextlib import contextmanager
+from itertools import count
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_QUERIES = 5
+THRESHOLD_ACTIONS = ('log', 'warn', 'raise')
+
+
+class QueryThresholdWarning(RuntimeWarning):
+    """Warned when a request runs more queries, or spends more time in the database, than configured."""
+
+
+class QueryThresholdExceeded(AssertionError):
+    """Raised instead of ``QueryThresholdWarning`` when ``QUERY_THRESHOLD_ACTION`` is ``'raise'``."""
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts and times the queries it wraps and keeps the slowest ones.
+
+    One recorder can wrap several connections at once::
+
+        recorder = QueryRecorder()
+        with recorder.record():
+            ...
+        recorder.count, recorder.duration, recorder.slowest_queries()
+    """
+
+    def __init__(self, slowest=SLOWEST_QUERIES):
+        self.count = 0
+        self.duration = 0.0
+        self._slowest_size = slowest
+        # Min-heap de (segundos, orden, alias, sql): la cima es la más rápida de las guardadas
+        self._slowest = []
+        self._order = count()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._add(time.perf_counter() - started, context['connection'].alias, sql)
+
+    def _add(self, elapsed, alias, sql):
+        self.count += 1
+        self.duration += elapsed
+        if not self._slowest_size:
+            return
+        entry = (elapsed, next(self._order), alias, sql)
+        if len(self._slowest) < self._slowest_size:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def slowest_queries(self) -> list:
+        """``[{'alias', 'sql', 'ms'}, ...]`` of the slowest recorded queries, slowest first."""
+        return [
+            {'alias': alias, 'sql': sql, 'ms': round(elapsed * 1000, 2)}
+            for elapsed, _, alias, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    def install(self, aliases=None):
+        """Start wrapping the current thread's connections. Prefer ``record()`` unless the calls must be split."""
+        for alias in aliases or connections:
+            connections[alias].execute_wrappers.append(self)
+
+    def uninstall(self, aliases=None):
+        for alias in aliases or connections:
+            wrappers = connections[alias].execute_wrappers
+            if self in wrappers:
+                wrappers.remove(self)
+
+    @contextmanager
+    def record(self, aliases=None):
+        """Record the queries run on ``aliases`` (every configured database by default) inside the block."""
+        self.install(aliases)
+        try:
+            yield self
+        finally:
+            self.uninstall(aliases)
+
+
+def server_timing(recorder, total) -> str:
+    """``Server-Timing`` value with the database time and query count of ``recorder`` and the ``total`` seconds."""
+    return (
+        f'db;desc="{recorder.count} queries";dur={recorder.duration * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}'
+    )
+
+
+def _exceeded(recorder) -> list:
+    problems = []
+    count_threshold = settings.QUERY_COUNT_THRESHOLD
+    time_threshold = settings.QUERY_TIME_THRESHOLD
+    if count_threshold is not None and recorder.count > count_threshold:
+        problems.append(f'{recorder.count} consultas (máximo {count_threshold})')
+    if time_threshold is not None and recorder.duration * 1000 > time_threshold:
+        problems.append(f'{recorder.duration * 1000:.1f} ms en la base de datos (máximo {time_threshold} ms)')
+    return problems
+
+
+class QueryInstrumentationMiddleware:
+    """Record the SQL of a sample of requests; see the module docstring for the settings."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if settings.QUERY_THRESHOLD_ACTION not in THRESHOLD_ACTIONS:
+            raise ValueError(f'QUERY_THRESHOLD_ACTION debe ser uno de {THRESHOLD_ACTIONS}.')
+
+    def _sampled(self) -> bool:
+        rate = settings.QUERY_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        self.report(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        # Las consultas de las vistas async corren en el hilo de sync_to_async: el recorder se instala en ese hilo
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        await sync_to_async(recorder.install)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.uninstall)()
+        self.report(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    def report(self, request, response, recorder, total):
+        if settings.QUERY_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(recorder, total)
+
+        figures = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'slowest_queries': recorder.slowest_queries(),
+        }
+        problems = _exceeded(recorder)
+        if not problems:
+            logger.info(
+                '%s %s: %s consultas en %.1f ms',
+                request.method,
+                request.path,
+                recorder.count,
+                recorder.duration * 1000,
+                extra=figures,
+            )
+            return
+
+        message = f'{request.method} {request.path} excede los umbrales de consultas: {", ".join(problems)}'
+        logger.warning(message, extra=figures)
+        action = settings.QUERY_THRESHOLD_ACTION
+        if action == 'raise':
+            slowest = '\n'.join(
+                f'  {query["ms"]} ms [{query["alias"]}] {query["sql"]}' for query in figures['slowest_queries']
+            )
+            raise QueryThresholdExceeded(f'{message}\nConsultas más lentas:\n{slowest}')
+        if action == 'warn':
+            warnings.warn(message, QueryThresholdWarning, stacklevel=2)
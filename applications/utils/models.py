@@ -1,6 +1,8 @@
 from django.db import models
 from django_userforeignkey.models.fields import UserForeignKey
 
+from .managers import SoftDeleteManager
+
 
 class LightModelClass(models.Model):
     """
@@ -14,6 +16,8 @@ class LightModelClass(models.Model):
     _created_at = models.DateTimeField(verbose_name="Fecha de creación", auto_now_add=True, editable=False)
     _updated_at = models.DateTimeField(verbose_name="Fecha de actualización", auto_now=True, editable=False)
 
+    objects = SoftDeleteManager()
+
     class Meta:
         abstract = True
 
@@ -33,5 +37,7 @@ class ModelClass(models.Model):
     _created_by = UserForeignKey(verbose_name="Creado por", auto_user_add=True, related_name="+", editable=False)
     _updated_by = UserForeignKey(verbose_name="Actualizado por", auto_user=True, related_name="+", editable=False)
 
+    objects = SoftDeleteManager()
+
     class Meta:
         abstract = True
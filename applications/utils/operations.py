@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class PostgreSQLRunSQL(migrations.RunSQL):
+    """``RunSQL`` that only runs on PostgreSQL.
+
+    For indexes and other objects that only PostgreSQL can build (GIN, trigram operator classes, ...). On other
+    backends the operation is a no-op, so the same migrations keep working with the SQLite settings used in tests.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,141 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.utils.functional import cached_property
+
+# Por debajo de este tamaño el COUNT(*) exacto es barato
+ESTIMATE_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids ``COUNT(*)`` over large unfiltered PostgreSQL tables.
+
+    For an unfiltered queryset the planner's row estimate (``pg_class.reltuples``) is used when it is above
+    ``ESTIMATE_THRESHOLD``. Filtered querysets, small tables and other databases fall back to an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table]
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] > ESTIMATE_THRESHOLD:
+                    return int(row[0])
+        return super().count
+
+
+class InvalidCursor(ValueError):
+    """Raised when a keyset pagination cursor cannot be decoded."""
+
+
+@dataclass
+class KeysetPage:
+    """One page of a ``KeysetPaginator``; ``next_cursor`` is None on the last page."""
+
+    object_list: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """Seek (keyset) pagination over the ordering of a queryset.
+
+    Instead of skipping rows with OFFSET, each page asks for the rows that sort after the last row of the previous
+    page, so with an index on the ordering columns a deep page costs the same as the first one. The cursor is an
+    opaque, URL-safe encoding of the ordering values of that last row.
+
+    The ordering defaults to ``Meta.ordering`` and always gets the primary key appended as a tiebreaker. NULLs sort
+    last in ascending columns and first in descending ones on every backend, which is the PostgreSQL default and
+    matches its B-tree indexes.
+
+    Parameters
+    ----------
+    queryset : QuerySet
+        Rows to paginate. Any ordering it has is replaced.
+    per_page : int
+        Rows per page.
+    ordering : sequence of str, optional
+        Field names (``-`` prefix for descending), e.g. ``['product_id', 'size', '-price_real']``.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        ordering = list(ordering or queryset.model._meta.ordering)
+        if not {'pk', '-pk'} & set(ordering):
+            ordering.append('pk')
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def _nullable(self, name) -> bool:
+        if name == 'pk':
+            return False
+        try:
+            return self.queryset.model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            return True
+
+    def _order_by(self) -> list:
+        return [F(name).desc(nulls_first=True) if desc else F(name).asc(nulls_last=True) for name, desc in self.fields]
+
+    def encode_cursor(self, obj) -> str:
+        values = [getattr(obj, name) for name, _ in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+    def decode_cursor(self, cursor) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, binascii.Error) as error:
+            raise InvalidCursor('Cursor de paginación inválido.') from error
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor('Cursor de paginación inválido.')
+        return values
+
+    def _after(self, values) -> Q:
+        """Rows sorting after ``values``: ``a > x OR (a = x AND b > y) OR ...`` with the NULL placement above."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, desc), value in zip(self.fields, values):
+            if value is None:
+                after = Q(**{f'{name}__isnull': False}) if desc else None
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f'{name}__lt' if desc else f'{name}__gt': value})
+                if not desc and self._nullable(name):
+                    after |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            if after is not None:
+                condition |= equal & after
+            equal &= same
+
+        # Cota explícita sobre la primera columna para que el índice arranque la búsqueda en el cursor
+        name, desc = self.fields[0]
+        if values[0] is not None and not self._nullable(name):
+            condition &= Q(**{f'{name}__lte' if desc else f'{name}__gte': values[0]})
+        return condition
+
+    def page(self, cursor=None) -> KeysetPage:
+        """Rows after ``cursor`` (the first page when omitted), fetched with a single query."""
+        queryset = self.queryset.order_by(*self._order_by())
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        rows = list(queryset[: self.per_page + 1])
+        if len(rows) > self.per_page:
+            rows = rows[: self.per_page]
+            return KeysetPage(rows, self.encode_cursor(rows[-1]))
+        return KeysetPage(rows)
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+
+class PrimaryReplicaRouter:
+    """Send reads of the catalog to the read replica and everything else to the primary.
+
+    Only models of the apps listed in ``settings.REPLICA_APP_LABELS`` are read from the replica, and only outside of a
+    transaction on the primary: services that read and then write inside ``transaction.atomic`` (stock roll-ups,
+    allocations, imports) always see their own writes. Related objects are read from the database their instance
+    came from. Writes and migrations go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if REPLICA_DB_ALIAS not in settings.DATABASES:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in getattr(settings, 'REPLICA_APP_LABELS', ()):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplica tienen los mismos datos: las relaciones entre ambos son válidas
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
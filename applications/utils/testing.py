@@ -0,0 +1,117 @@
+import re
+from collections import Counter
+from contextlib import ContextDecorator, ExitStack, contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.test.utils import CaptureQueriesContext
+
+# Literales de una consulta: se reemplazan para agrupar las que solo difieren en sus parámetros
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+@contextmanager
+def _prefer_indexes(using):
+    # Con tablas de prueba casi vacías PostgreSQL siempre prefiere un seq scan; se desactiva solo para el EXPLAIN
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SET enable_seqscan = off')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+
+class IndexUsageMixin:
+    """TestCase mixin to check query plans against the indexes declared in ``Meta.indexes``."""
+
+    def assertUsesIndex(self, queryset, index_name):
+        using = queryset.db or router.db_for_read(queryset.model)
+        with _prefer_indexes(using):
+            plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=f'El plan no usa "{index_name}":\n{plan}')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block runs more queries than its budget."""
+
+
+def _sql_shape(sql) -> str:
+    return _SQL_LITERALS.sub('?', sql)
+
+
+class query_budget(ContextDecorator):
+    """Fail when the wrapped block or function runs more than ``max_queries`` queries.
+
+    Unlike ``assertNumQueries`` the budget is an upper bound, so operations can get cheaper without touching the
+    tests. The failure lists every query and, first, the statements repeated with different parameters, which is
+    how an N+1 shows up::
+
+        with query_budget(3, label='Guardar un Item'):
+            item.save()
+
+        @query_budget(5, using=('default', 'replica'))
+        def test_...(self):
+
+    Parameters
+    ----------
+    max_queries : int
+        Maximum number of queries.
+    using : str or iterable of str, optional
+        Database aliases to count, ``'default'`` by default.
+    label : str, optional
+        Name of the operation in the failure message.
+    """
+
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS, label=None):
+        self.max_queries = max_queries
+        self.aliases = [using] if isinstance(using, str) else list(using)
+        self.label = label
+        self.captured = {}
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        self.captured = {
+            alias: self._stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in self.aliases
+        }
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stack.close()
+        if exc_type is None and len(self.queries) > self.max_queries:
+            raise QueryBudgetExceeded(self.report())
+        return False
+
+    @property
+    def queries(self) -> list:
+        """``[(alias, sql), ...]`` of the captured queries, per alias in the order they ran."""
+        return [(alias, query['sql']) for alias, context in self.captured.items() for query in context]
+
+    def report(self) -> str:
+        queries = self.queries
+        lines = [
+            f'{self.label or "El bloque"} ejecutó {len(queries)} consultas, '
+            f'{len(queries) - self.max_queries} más que su presupuesto de {self.max_queries}.'
+        ]
+        repeated = Counter(_sql_shape(sql) for _, sql in queries)
+        repeated = [(shape, times) for shape, times in repeated.most_common() if times > 1]
+        if repeated:
+            lines.append('Consultas repetidas:')
+            lines.extend(f'  {times}x {shape}' for shape, times in repeated)
+        lines.append('Consultas:')
+        lines.extend(f'  {number}. [{alias}] {sql}' for number, (alias, sql) in enumerate(queries, start=1))
+        return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """TestCase mixin with ``assertQueryBudget``, the upper-bound counterpart of ``assertNumQueries``."""
+
+    def assertQueryBudget(self, max_queries, func=None, *args, using=DEFAULT_DB_ALIAS, label=None, **kwargs):
+        budget = query_budget(max_queries, using=using, label=label)
+        if func is None:
+            return budget
+        with budget:
+            func(*args, **kwargs)
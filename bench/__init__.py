@@ -0,0 +1,11 @@
+"""Benchmarks of SkuHub's hot paths over deterministic synthetic data.
+
+Run from the repository root; the settings are picked like in ``manage.py`` (``SETTINGS_FILE``)::
+
+    SETTINGS_FILE=skuhub.settings.test python -m bench --scale small --output before.json
+    python -m bench --scale medium --compare before.json      # local PostgreSQL (skuhub.settings.local)
+
+Every run creates a throwaway test database, fills it with ``bench.generator.generate`` and times the scenarios of
+``bench.scenarios``. Results are JSON (median, mean, min and max milliseconds, operations and queries per scenario,
+plus the commit and database they were taken on), so runs of two commits can be compared with ``--compare``.
+"""
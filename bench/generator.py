@@ -0,0 +1,255 @@
+"""Deterministic synthetic catalog and supply data.
+
+The same scale and seed always produce the same rows (names, SKUs, prices, tree shape, quantities, dates), so
+timings of two commits are taken over identical data. Rows are written through the bulk paths the application itself
+uses: ``Item.objects.bulk_create`` keeps the facets, ``SupplyOrderDetail.objects.bulk_create`` the order totals and
+``receive_order`` creates the inventory batches, their codes, the stock roll-ups and the ledger.
+"""
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import router, transaction
+from django.utils import timezone
+
+from applications.products.managers import PATH_SEPARATOR
+from applications.products.models import Category, Item, Product
+from applications.products.pricing import inherit_prices, normalize_prices
+from applications.products.search import rebuild_search
+from applications.supply.managers import BATCH_CODE_ALPHABET, BATCH_CODE_CAPACITY
+from applications.supply.models import Supplier, SupplyOrder, SupplyOrderDetail, SupplyPaymentMethod
+from applications.supply.receiving import receive_order
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL']
+COLORS = ['Negro', 'Blanco', 'Rojo', 'Azul', 'Verde', 'Gris', 'Beige']
+MATERIALS = ['algodón', 'poliéster', 'cuero', 'acero', 'madera']
+VOLTAGES = [110, 220]
+START = datetime(2024, 1, 1, 9)
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Size of a generated dataset.
+
+    Attributes
+    ----------
+    categories : int
+        Number of categories, spread over ``roots`` trees at most ``depth`` levels deep.
+    products : int
+        Number of products.
+    items_per_product : int
+        Variants (Items) per product.
+    orders : int
+        Supply orders, each with ``details_per_order`` details.
+    received_ratio : float
+        Fraction of the orders that are received, turning their details into inventory batches.
+    """
+
+    categories: int
+    products: int
+    items_per_product: int
+    orders: int
+    details_per_order: int
+    roots: int = 4
+    depth: int = 8
+    received_ratio: float = 0.8
+
+
+SCALES = {
+    'tiny': Scale(categories=12, products=30, items_per_product=3, orders=4, details_per_order=5, roots=2, depth=4),
+    'small': Scale(categories=60, products=500, items_per_product=4, orders=20, details_per_order=25),
+    'medium': Scale(categories=250, products=5000, items_per_product=5, orders=100, details_per_order=50, depth=10),
+    'large': Scale(categories=1000, products=50000, items_per_product=5, orders=500, details_per_order=100, depth=12),
+}
+
+
+@dataclass
+class Dataset:
+    """What ``generate`` wrote, with the handles the scenarios start from."""
+
+    scale: dict
+    seed: int
+    counts: dict = field(default_factory=dict)
+    # Raíz con el subárbol más grande y la categoría más profunda
+    deepest_root_id: int = None
+    deepest_category_id: int = None
+
+
+def _code(index) -> str:
+    # Código de 3 caracteres en base36, único por índice
+    code = ''
+    for _ in range(3):
+        index, digit = divmod(index, len(BATCH_CODE_ALPHABET))
+        code = BATCH_CODE_ALPHABET[digit] + code
+    return code
+
+
+def _price(rng, low=10_000, high=500_000) -> Decimal:
+    return Decimal(rng.randrange(low, high, 100))
+
+
+def _category_parents(scale, rng) -> list:
+    """Parent index (or None) of every category: random recursive trees capped at ``scale.depth`` levels."""
+    parents, depths = [], []
+    for index in range(scale.categories):
+        if index < scale.roots:
+            parents.append(None)
+            depths.append(0)
+            continue
+        parent = rng.randrange(index)
+        # Un padre en el último nivel se reemplaza por su propio padre
+        while depths[parent] >= scale.depth - 1:
+            parent = parents[parent]
+        parents.append(parent)
+        depths.append(depths[parent] + 1)
+    return parents
+
+
+def generate_categories(scale, rng, using) -> list:
+    """Insert the category trees level by level (one INSERT per level) with their paths computed in memory."""
+    parents = _category_parents(scale, rng)
+    categories = [
+        Category(code=_code(index), name=f'Categoría {index:04d}', description=f'Categoría sintética {index}')
+        for index in range(scale.categories)
+    ]
+    pending = list(range(scale.categories))
+    while pending:
+        level = [index for index in pending if parents[index] is None or categories[parents[index]].pk]
+        for index in level:
+            category = categories[index]
+            parent = categories[parents[index]] if parents[index] is not None else None
+            category.parent = parent
+            category.path = f'{parent.path}{PATH_SEPARATOR}{category.name}' if parent else category.name
+        Category.objects.using(using).bulk_create([categories[index] for index in level])
+        pending = [index for index in pending if not categories[index].pk]
+    return categories
+
+
+def generate_products(scale, rng, categories, using) -> list:
+    products = []
+    for index in range(scale.products):
+        price_real = _price(rng)
+        price_fake = price_real + _price(rng, 0, 100_000) if rng.random() < 0.6 else None
+        price_fake, price_real = normalize_prices(price_fake, price_real)
+        products.append(
+            Product(
+                category=rng.choice(categories),
+                sku=f'P{index:07d}',
+                name=f'Producto {index}',
+                description=f'Producto sintético {index} {rng.choice(MATERIALS)}',
+                purchase_urls={'tienda': f'https://tienda.example.com/p/{index}'},
+                price_fake=price_fake,
+                price_real=price_real,
+            )
+        )
+    return Product.objects.using(using).bulk_create(products, batch_size=1000)
+
+
+def generate_items(scale, rng, products, using) -> list:
+    """Variants of every product; half of them inherit the product prices, the others normalize their own."""
+    items = []
+    for product in products:
+        for variant in range(scale.items_per_product):
+            own_price = rng.random() < 0.5
+            price_fake, price_real = inherit_prices(
+                _price(rng) if own_price else None,
+                _price(rng) if own_price else None,
+                product.price_fake,
+                product.price_real,
+            )
+            attributes = {'material': rng.choice(MATERIALS)}
+            if rng.random() < 0.3:
+                attributes['voltaje'] = rng.choice(VOLTAGES)
+            items.append(
+                Item(
+                    product=product,
+                    sku=f'{product.sku}-{variant:02d}',
+                    size=SIZES[variant % len(SIZES)],
+                    color=rng.choice(COLORS),
+                    other_attributes=attributes,
+                    price_fake=price_fake,
+                    price_real=price_real,
+                )
+            )
+    return Item.objects.using(using).bulk_create(items, batch_size=1000)
+
+
+def generate_supply(scale, rng, items, using) -> int:
+    """Supply orders with their details; ``received_ratio`` of them are received into inventory batches."""
+    suppliers = Supplier.objects.using(using).bulk_create(
+        Supplier(name=f'Proveedor {index}', main_url=f'https://proveedor{index}.example.com') for index in range(3)
+    )
+    payment_methods = SupplyPaymentMethod.objects.using(using).bulk_create(
+        [SupplyPaymentMethod(name='Transferencia', type='EF'), SupplyPaymentMethod(name='Crédito', type='CR')]
+    )
+    received = int(scale.orders * scale.received_ratio)
+    orders = []
+    for index in range(scale.orders):
+        shipping_fee, taxes = _price(rng, 0, 50_000), _price(rng, 0, 100_000)
+        orders.append(
+            SupplyOrder(
+                supplier=rng.choice(suppliers),
+                payment_method=rng.choice(payment_methods),
+                order_date=(START + timedelta(days=index)).date(),
+                shipping_fee=shipping_fee,
+                taxes=taxes,
+                total=shipping_fee + taxes,
+                state='on_the_way' if index < received else 'draft',
+            )
+        )
+    orders = SupplyOrder.objects.using(using).bulk_create(orders)
+    SupplyOrderDetail.objects.using(using).bulk_create(
+        (
+            SupplyOrderDetail(
+                order=order,
+                item=rng.choice(items),
+                quantity=rng.randint(1, 20),
+                unit_cost=_price(rng, 5_000, 200_000),
+                shipping_fee=_price(rng, 0, 5_000),
+                taxes=_price(rng, 0, 10_000),
+            )
+            for order in orders
+            for _ in range(scale.details_per_order)
+        ),
+        batch_size=1000,
+    )
+    for index, order in enumerate(orders[:received]):
+        received_at = timezone.make_aware(START + timedelta(days=index + rng.randint(1, 10)))
+        receive_order(order, received_at=received_at)
+    return received
+
+
+def fill_batch_codes(category, ratio=0.9, using=None):
+    """Move the batch code sequence of ``category`` to ``ratio`` of its capacity, as after years of receipts."""
+    from applications.supply.models import BatchCodeSequence
+
+    sequences = BatchCodeSequence.objects.db_manager(using)
+    sequence, _ = sequences.get_or_create(prefix=category.code)
+    sequences.filter(pk=sequence.pk).update(last_value=max(sequence.last_value, int(BATCH_CODE_CAPACITY * ratio)))
+
+
+def generate(scale, seed=0, using=None) -> Dataset:
+    """Fill an empty database with a synthetic catalog and supply history of the given ``scale``."""
+    rng = random.Random(seed)
+    using = using or router.db_for_write(Item)
+    dataset = Dataset(scale=asdict(scale), seed=seed)
+    with transaction.atomic(using=using):
+        categories = generate_categories(scale, rng, using)
+        products = generate_products(scale, rng, categories, using)
+        items = generate_items(scale, rng, products, using)
+    rebuild_search(using=using)
+    received = generate_supply(scale, rng, items, using)
+
+    deepest = max(categories, key=lambda category: (category.path.count(PATH_SEPARATOR), -category.pk))
+    dataset.deepest_category_id = deepest.pk
+    dataset.deepest_root_id = Category.objects.using(using).ancestors(deepest, include_self=True).first().pk
+    dataset.counts = {
+        'categories': len(categories),
+        'products': len(products),
+        'items': len(items),
+        'orders': scale.orders,
+        'received_orders': received,
+        'details': scale.orders * scale.details_per_order,
+    }
+    return dataset
@@ -0,0 +1,137 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import django
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+
+from applications.utils.middleware import QueryRecorder
+
+from .generator import SCALES, generate
+from .scenarios import SCENARIOS
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _ms(seconds) -> float:
+    return round(seconds * 1000, 3)
+
+
+def run_scenario(name, dataset, using=DEFAULT_DB_ALIAS, repeat=5, warmup=1) -> dict:
+    """Time ``repeat`` runs of a scenario after ``warmup`` untimed ones.
+
+    Returns
+    -------
+    dict
+        Wall-time statistics in milliseconds, operations per run and queries of the last run.
+    """
+    scenario = SCENARIOS[name]
+    step = scenario.prepare(dataset, using)
+    for iteration in range(warmup):
+        step(iteration)
+
+    timings = []
+    for iteration in range(warmup, warmup + repeat):
+        recorder = QueryRecorder(slowest=0)
+        # Todas las conexiones: con réplica configurada las lecturas del catálogo no pasan por ``using``
+        with recorder.record():
+            started = time.perf_counter()
+            operations = step(iteration)
+            timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return {
+        'description': scenario.description,
+        'repeat': repeat,
+        'operations': operations,
+        'queries': recorder.count,
+        'min_ms': _ms(min(timings)),
+        'median_ms': _ms(median),
+        'mean_ms': _ms(statistics.fmean(timings)),
+        'max_ms': _ms(max(timings)),
+        'median_ms_per_operation': _ms(median / operations) if operations else None,
+    }
+
+
+def run(scale_name='small', seed=0, repeat=5, scenarios=None, using=DEFAULT_DB_ALIAS) -> dict:
+    """Generate a dataset in the current database and run the scenarios (all by default) over it."""
+    started = time.perf_counter()
+    dataset = generate(SCALES[scale_name], seed=seed, using=using)
+    generation = time.perf_counter() - started
+
+    return {
+        'meta': {
+            'commit': _commit(),
+            'created_at': timezone.now().isoformat(),
+            'scale': scale_name,
+            'seed': seed,
+            'database': connections[using].vendor,
+            'settings': settings.SETTINGS_MODULE,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'dataset': {**dataset.counts, 'generation_ms': _ms(generation)},
+        'scenarios': {name: run_scenario(name, dataset, using, repeat) for name in scenarios or SCENARIOS},
+    }
+
+
+def compare(results, baseline) -> list:
+    """Lines comparing the median time and queries of every scenario with a previous run."""
+    lines = [f'{"escenario":<24} {"base ms":>10} {"actual ms":>10} {"cambio":>8} {"consultas":>12}']
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            lines.append(f'{name:<24} {"-":>10} {current["median_ms"]:>10.1f} {"nuevo":>8} {current["queries"]:>12}')
+            continue
+        change = (current['median_ms'] / previous['median_ms'] - 1) * 100 if previous['median_ms'] else 0
+        queries = f'{previous["queries"]} → {current["queries"]}'
+        lines.append(
+            f'{name:<24} {previous["median_ms"]:>10.1f} {current["median_ms"]:>10.1f} {change:>+7.1f}% {queries:>12}'
+        )
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m bench', description='Benchmarks de SkuHub sobre datos sintéticos.'
+    )
+    parser.add_argument('--scale', choices=SCALES, default='small', help='Tamaño del dataset generado.')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla del generador.')
+    parser.add_argument('--repeat', type=int, default=5, help='Corridas medidas por escenario.')
+    parser.add_argument(
+        '--scenario', action='append', choices=SCENARIOS, dest='scenarios', help='Escenario a correr (repetible).'
+    )
+    parser.add_argument('--output', help='Archivo JSON de resultados. Por defecto stdout.')
+    parser.add_argument('--compare', help='JSON de una corrida anterior para comparar.')
+    options = parser.parse_args(argv)
+
+    # Base de datos desechable (test_<NAME>), como la de la suite: nunca toca los datos del entorno
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}, serialized_aliases=set())
+    try:
+        results = run(options.scale, options.seed, options.repeat, options.scenarios)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        sys.stderr.write('\n'.join(compare(results, baseline)) + '\n')
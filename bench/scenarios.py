@@ -0,0 +1,141 @@
+"""Timed benchmark scenarios.
+
+A scenario is a function that receives the generated ``Dataset`` and the database alias, does its (untimed)
+preparation and returns the step to time. Each call of the step gets the iteration number, so repeated runs can vary
+their input (names, colors) instead of hitting unique constraints, and returns the number of operations it ran.
+"""
+from dataclasses import dataclass
+
+from django.db.models import Sum
+from django.http import QueryDict
+from django.utils import timezone
+
+from applications.products.listing import item_listing, product_listing
+from applications.products.models import Category, Item, Product
+from applications.supply.models import Inventory, SupplyOrderDetail
+from applications.supply.stock import reconcile_stock
+from applications.supply.valuation import inventory_valuation
+
+from .generator import fill_batch_codes
+
+ITEM_SAVES = 100
+INVENTORY_SAVES = 50
+VARIANT_SIZES = 10
+VARIANT_COLORS = 100
+LISTING_PAGES = 5
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    description: str
+    prepare: callable
+
+
+SCENARIOS = {}
+
+
+def scenario(name, description):
+    def register(prepare):
+        SCENARIOS[name] = Scenario(name, description, prepare)
+        return prepare
+
+    return register
+
+
+@scenario('category_repath', 'Renombrar la raíz del árbol más profundo (re-path del subárbol y sus documentos)')
+def category_repath(dataset, using):
+    root = Category.objects.using(using).get(pk=dataset.deepest_root_id)
+    name = root.name
+
+    def step(iteration):
+        root.name = f'{name} {iteration}'
+        root.save(using=using)
+        return 1
+
+    return step
+
+
+@scenario('item_save_inheritance', f'Crear un Item sin precios por producto (hasta {ITEM_SAVES}), que hereda los suyos')
+def item_save_inheritance(dataset, using):
+    product_ids = list(Product.objects.using(using).order_by('pk').values_list('pk', flat=True)[:ITEM_SAVES])
+
+    def step(iteration):
+        for product_id in product_ids:
+            Item(product_id=product_id, color=f'Bench {iteration}').save(using=using)
+        return len(product_ids)
+
+    return step
+
+
+@scenario('create_variants', f'Crear {VARIANT_SIZES * VARIANT_COLORS} variantes con Product.create_variants')
+def create_variants(dataset, using):
+    product = Product.objects.using(using).exclude(category=None).order_by('pk').first()
+    sizes = [f'T{number}' for number in range(VARIANT_SIZES)]
+
+    def step(iteration):
+        colors = [f'Bench {iteration}-{number}' for number in range(VARIANT_COLORS)]
+        return len(product.create_variants(sizes=sizes, colors=colors, attrs={'material': 'bench'}))
+
+    return step
+
+
+@scenario('inventory_batch_codes', f'Guardar {INVENTORY_SAVES} lotes en una categoría con la secuencia al 90 %')
+def inventory_batch_codes(dataset, using):
+    detail = SupplyOrderDetail.objects.using(using).select_related('item__product__category').filter(
+        item__product__category__isnull=False
+    ).first()
+    fill_batch_codes(detail.item.product.category, using=using)
+
+    def step(iteration):
+        now = timezone.now()
+        for _ in range(INVENTORY_SAVES):
+            Inventory(
+                item_id=detail.item_id,
+                supply_order_detail=detail,
+                entries=1,
+                stock=1,
+                unit_cost=detail.unit_cost,
+                last_entry_at=now,
+            ).save(using=using)
+        return INVENTORY_SAVES
+
+    return step
+
+
+@scenario('catalog_listing', f'Listados de productos e items: {LISTING_PAGES} páginas, categoría y atributos')
+def catalog_listing(dataset, using):
+    requests = [
+        QueryDict(''),
+        QueryDict(f'category={dataset.deepest_root_id}'),
+        QueryDict('in_stock=1&min_price=50000'),
+        QueryDict('attr.material=algodón&size=M'),
+    ]
+
+    def step(iteration):
+        pages = 0
+        for params in requests:
+            product_listing(params)
+            item_listing(params)
+            pages += 2
+        params = QueryDict(mutable=True)
+        for _ in range(LISTING_PAGES):
+            page = item_listing(params)
+            pages += 1
+            if not page.next_cursor:
+                break
+            params['cursor'] = page.next_cursor
+        return pages
+
+    return step
+
+
+@scenario('stock_aggregation', 'Recuento de stock, valorización por categoría y stock por categoría')
+def stock_aggregation(dataset, using):
+    def step(iteration):
+        reconcile_stock(dry_run=True, using=using)
+        list(inventory_valuation(group_by=['item__product__category'], using=using))
+        list(Product.objects.using(using).order_by().values('category').annotate(units=Sum('stock')))
+        return 3
+
+    return step
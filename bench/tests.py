@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from applications.products.models import Category, Item
+from applications.supply.models import Inventory
+
+from .generator import SCALES, generate
+from .runner import compare, run_scenario
+from .scenarios import SCENARIOS
+
+
+class BenchTestCase(TestCase):
+    def catalog(self) -> tuple:
+        items = Item.objects.order_by('sku').values_list('sku', 'color', 'other_attributes', 'price_fake', 'price_real')
+        return list(Category.objects.order_by('code').values_list('path', flat=True)), list(items)
+
+    def test_generation_is_deterministic(self):
+        dataset = generate(SCALES['tiny'], seed=7)
+        first = self.catalog()
+
+        Category.objects.all().delete()
+        generate(SCALES['tiny'], seed=7)
+
+        self.assertEqual(dataset.counts['items'], 90)
+        self.assertEqual(self.catalog(), first)
+        self.assertTrue(Inventory.objects.exists())
+
+    def test_scenarios_run_and_compare(self):
+        dataset = generate(SCALES['tiny'])
+
+        results = {'scenarios': {name: run_scenario(name, dataset, repeat=1) for name in SCENARIOS}}
+
+        for name, result in results['scenarios'].items():
+            self.assertGreater(result['operations'], 0, name)
+            self.assertGreater(result['queries'], 0, name)
+        self.assertEqual(len(compare(results, results)), len(SCENARIOS) + 1)
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third Party Apps
     'django_userforeignkey',
     # Own apps
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'applications.utils.middleware.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -108,6 +110,40 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'skuhub',
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    # Requiere el paquete redis (redis-py)
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL'),
+    }
+
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 60 * 15))
+
+# Búsqueda: configuración de texto de PostgreSQL para los vectores de búsqueda
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'spanish')
+
+# Reservas de inventario (carritos)
+RESERVATION_TTL = int(os.environ.get('RESERVATION_TTL', 60 * 15))
+RESERVATION_SWEEP_INTERVAL = int(os.environ.get('RESERVATION_SWEEP_INTERVAL', 30))
+
+# Instrumentación de consultas por request (applications.utils.middleware)
+QUERY_SAMPLE_RATE = float(os.environ.get('QUERY_SAMPLE_RATE', 1))
+QUERY_SERVER_TIMING = os.environ.get('QUERY_SERVER_TIMING', '1') == '1'
+QUERY_COUNT_THRESHOLD = int(os.environ['QUERY_COUNT_THRESHOLD']) if os.environ.get('QUERY_COUNT_THRESHOLD') else None
+QUERY_TIME_THRESHOLD = float(os.environ['QUERY_TIME_THRESHOLD']) if os.environ.get('QUERY_TIME_THRESHOLD') else None
+QUERY_THRESHOLD_ACTION = os.environ.get('QUERY_THRESHOLD_ACTION', 'log')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,64 @@
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host]
+CSRF_TRUSTED_ORIGINS = [origin for origin in os.environ.get('CSRF_TRUSTED_ORIGINS', '').split(',') if origin]
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# Database
+# https://docs.djangoproject.com/en/4.2/ref/databases/#persistent-connections
+
+# Segundos que se reutiliza una conexión (0 la cierra al final de cada request, None nunca la cierra)
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', 600))
+
+# Pool de conexiones: '' (solo conexiones persistentes) o 'pgbouncer' (PgBouncer en modo transaction delante de
+# PostgreSQL)
+DB_POOL = os.environ.get('DB_POOL', '')
+
+
+def postgresql(host, port) -> dict:
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB'),
+        'USER': os.environ.get('POSTGRES_USER'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        # Verifica la conexión reutilizada al inicio de cada request en vez de fallar en la primera consulta
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'connect_timeout': int(os.environ.get('POSTGRES_CONNECT_TIMEOUT', 5))},
+    }
+    if DB_POOL == 'pgbouncer':
+        # En modo transaction PgBouncer no conserva los cursores con nombre que usa QuerySet.iterator()
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+    elif DB_POOL:
+        raise ImproperlyConfigured(f'DB_POOL desconocido: {DB_POOL}')
+    return database
+
+
+DATABASES = {
+    'default': postgresql(os.environ.get('POSTGRES_HOST', 'localhost'), os.environ.get('POSTGRES_PORT', '5432')),
+}
+
+# Réplica de lectura: las lecturas del catálogo van a la réplica, las escrituras al primario
+if os.environ.get('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = postgresql(
+        os.environ.get('POSTGRES_REPLICA_HOST'), os.environ.get('POSTGRES_REPLICA_PORT', '5432')
+    )
+    DATABASE_ROUTERS = ['applications.utils.routers.PrimaryReplicaRouter']
+REPLICA_APP_LABELS = ['products']
+
+# Instrumentación de consultas: solo se mide una muestra de los requests
+QUERY_SAMPLE_RATE = float(os.environ.get('QUERY_SAMPLE_RATE', 0.05))
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/4.2/howto/static-files/
+
+STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR.child('staticfiles')
@@ -0,0 +1,34 @@
+from .base import *
+
+# Settings de la suite de pruebas: SQLite y una réplica que refleja a default, para ejercitar el router
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'skuhub-tests')
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['testserver', 'localhost']
+
+# Database
+# https://docs.djangoproject.com/en/4.2/topics/testing/advanced/#testing-primary-replica-configurations
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR.child('db.sqlite3'),
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR.child('db.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['applications.utils.routers.PrimaryReplicaRouter']
+REPLICA_APP_LABELS = ['products']
+
+# Un request que se dispare en consultas hace fallar la prueba que lo ejecuta
+QUERY_COUNT_THRESHOLD = 50
+QUERY_THRESHOLD_ACTION = 'raise'
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+STATIC_URL = 'static/'